@@ -0,0 +1,129 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from procinfo import available_memory_bytes
+
+
+class Overloaded(Exception):
+    """Sem capacidade para aceitar a postagem; retry_after é a espera sugerida em segundos"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limita quantas postagens (cada uma com o seu Chrome) rodam ao mesmo tempo.
+    A capacidade é o menor valor entre max_concurrent e o que cabe na memória
+    disponível (mb_per_slot por postagem) e na CPU (load average abaixo de
+    max_load_per_cpu por núcleo). Quem não cabe espera numa fila de até
+    max_queue requisições; com a fila cheia, slot() levanta Overloaded com uma
+    estimativa de Retry-After baseada na duração das últimas postagens.
+    """
+
+    def __init__(self, max_concurrent=2, max_queue=10, queue_timeout=300, mb_per_slot=600,
+                 max_load_per_cpu=1.5, default_job_seconds=60, history=50):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.slot_bytes = mb_per_slot * 1024 * 1024
+        self.max_load_per_cpu = max_load_per_cpu
+        self.default_job_seconds = default_job_seconds
+
+        self._running = 0
+        self._waiting = 0
+        self._durations = deque(maxlen=history)
+        self._cond = threading.Condition()
+        self._capacity = None  # (instante, capacidade) da última leitura de CPU/RAM
+
+        self.admitted = 0
+        self.rejected = 0
+
+    def _resource_slots(self):
+        """Quantas postagens cabem contando as que já rodam (memória e CPU)"""
+        slots = {}
+        available = available_memory_bytes()
+        if available is not None and self.slot_bytes:
+            slots['memory'] = self._running + available // self.slot_bytes
+        if hasattr(os, 'getloadavg') and self.max_load_per_cpu:
+            headroom = (os.cpu_count() or 1) * self.max_load_per_cpu - os.getloadavg()[0]
+            slots['cpu'] = self._running + max(int(headroom), 0)
+        return slots
+
+    def capacity(self):
+        """Capacidade atual (chamar com o lock); a leitura de CPU/RAM vale por 1s"""
+        now = time.monotonic()
+        if self._capacity and now - self._capacity[0] < 1:
+            return self._capacity[1]
+        # Sempre permite uma postagem para a fila não travar com o servidor ocioso
+        capacity = max(min([self.max_concurrent] + list(self._resource_slots().values())), 1)
+        self._capacity = (now, capacity)
+        return capacity
+
+    def _average_seconds(self):
+        if not self._durations:
+            return self.default_job_seconds
+        return sum(self._durations) / len(self._durations)
+
+    def retry_after(self, ahead=None):
+        """Segundos estimados até abrir vaga para quem tem `ahead` requisições na frente"""
+        with self._cond:
+            return self._retry_after(self._waiting if ahead is None else ahead)
+
+    def _retry_after(self, ahead):
+        rounds = math.ceil((ahead + 1) / self.capacity())
+        return max(int(math.ceil(self._average_seconds() * rounds)), 1)
+
+    @contextmanager
+    def slot(self, bounded=True):
+        """
+        Reserva uma vaga para a postagem, esperando na fila se necessário.
+        bounded=False ignora o limite e o timeout da fila (ex: workers de uma
+        fila de jobs que já é limitada e não tem cliente esperando a resposta).
+        """
+        deadline = time.monotonic() + self.queue_timeout if bounded else None
+        with self._cond:
+            if self._running >= self.capacity() and bounded and self._waiting >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded("Server is at capacity, try again later", self._retry_after(self._waiting))
+
+            self._waiting += 1
+            try:
+                while self._running >= self.capacity():
+                    remaining = deadline - time.monotonic() if deadline else 1
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise Overloaded("Timed out waiting for capacity", self._retry_after(self._waiting))
+                    # Acorda periodicamente para reler a CPU e a memória livres
+                    self._cond.wait(min(remaining, 1))
+            finally:
+                self._waiting -= 1
+            self._running += 1
+            self.admitted += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._durations.append(time.monotonic() - start)
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'capacity': self.capacity(),
+                'max_concurrent': self.max_concurrent,
+                'resource_slots': self._resource_slots(),
+                'running': self._running,
+                'waiting': self._waiting,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'avg_job_seconds': self._average_seconds()
+            }
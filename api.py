@@ -1,140 +1,927 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
+from datetime import datetime, timezone
 from flask_cors import CORS
-from tiktok_bot import TikTokBot
+from tiktok_bot import TikTokBot, create_driver, prefetch_video, release_prefetched_video, hashtag_cache, music_cache, \
+    locators, CHROME_VERSION_MAIN, STEP_DEADLINES
+from browser_pool import BrowserPool
+from contexts import ContextPool
+from jobs import JobQueue
+from admission import AdmissionController, Overloaded
+from video_cache import VideoCache
+from spool import VideoSpool, default_spool_dir
+from downloader import RangedDownloader
+from sessions import SessionStore
+from scheduler import Scheduler
+from idempotency import IdempotencyStore, IdempotencyConflict, derive_key
+from driver_cache import prepare_driver, driver_cache_stats
+from procinfo import find_processes
+from watchdog import watchdog
+from slim import page_weights
+from preflight import PreflightError
+import preflight
+import metrics
+import tracing
+import waits
+import os
+import re
 import json
+import math
 import time
 import random
-from functools import wraps
 
 app = Flask(__name__)
 CORS(app)
 
-def retry_with_backoff(max_retries=3, initial_delay=1):
-    """Decorator para implementar retry com backoff exponencial"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    if attempt == max_retries - 1:
-                        raise e
-                        
-                    delay = initial_delay * (2 ** attempt) + random.uniform(0, 1)
-                    print(f"⚠️ Tentativa {attempt + 1} falhou, tentando novamente em {delay:.2f}s")
-                    print(f"Erro: {str(e)}")
-                    time.sleep(delay)
-            
-            raise last_exception
-        return wrapper
-    return decorator
+# Chromedriver baixado e patcheado uma vez no boot e compartilhado (somente
+# leitura) por todos os navegadores; CHROMEDRIVER_CACHE=0 volta ao patch por
+# instância do undetected_chromedriver. CHROMEDRIVER_SOURCE usa um binário local.
+if os.environ.get('CHROMEDRIVER_CACHE', '1') == '1':
+    try:
+        prepare_driver(os.environ.get('CHROMEDRIVER_CACHE_DIR', '/tmp/tiktok-chromedriver'), CHROME_VERSION_MAIN,
+                       source=os.environ.get('CHROMEDRIVER_SOURCE') or None)
+    except Exception as e:
+        print(f"⚠️ Não foi possível preparar o chromedriver em cache: {e}")
+
+# Modo leve: bloqueia imagens, fontes e analytics e limita a memória dos renderers.
+# Uma fração SLIM_CONTROL_RATIO dos navegadores roda completa como grupo de
+# controle para medir quantos bytes o modo leve economiza
+BROWSER_SLIM = os.environ.get('BROWSER_SLIM', '0') == '1'
+SLIM_CONTROL_RATIO = float(os.environ.get('SLIM_CONTROL_RATIO', 0.1))
+SLIM_MAX_HEAP_MB = int(os.environ.get('SLIM_MAX_HEAP_MB', 512))
+
+def driver_factory():
+    """Cria o Chrome no modo configurado (leve ou completo)"""
+    slim = BROWSER_SLIM and random.random() >= SLIM_CONTROL_RATIO
+    return create_driver(slim=slim, max_heap_mb=SLIM_MAX_HEAP_MB)
+
+# Pool de navegadores aquecidos (BROWSER_POOL_SIZE=0 desativa o pool).
+# Com BROWSER_CONTEXTS > 0 as contas rodam em contextos isolados de um único
+# Chrome compartilhado em vez de um Chrome por postagem
+BROWSER_POOL_SIZE = int(os.environ.get('BROWSER_POOL_SIZE', 2))
+BROWSER_CONTEXTS = int(os.environ.get('BROWSER_CONTEXTS', 0))
+browser_pool = None
+if BROWSER_CONTEXTS > 0:
+    browser_pool = ContextPool(
+        size=BROWSER_CONTEXTS,
+        max_uses=int(os.environ.get('BROWSER_CONTEXT_MAX_USES', 50)),
+        acquire_timeout=int(os.environ.get('BROWSER_POOL_ACQUIRE_TIMEOUT', 120)),
+        driver_factory=driver_factory
+    )
+elif BROWSER_POOL_SIZE > 0:
+    browser_pool = BrowserPool(
+        size=BROWSER_POOL_SIZE,
+        max_uses=int(os.environ.get('BROWSER_POOL_MAX_USES', 20)),
+        max_rss_mb=int(os.environ.get('BROWSER_POOL_MAX_RSS_MB', 1500)),
+        acquire_timeout=int(os.environ.get('BROWSER_POOL_ACQUIRE_TIMEOUT', 120)),
+        driver_factory=driver_factory
+    )
+
+# Downloader com Range em paralelo, retomada de arquivos parciais e limites
+downloader = RangedDownloader(
+    segments=int(os.environ.get('DOWNLOAD_SEGMENTS', 4)),
+    max_bytes=int(os.environ.get('DOWNLOAD_MAX_MB', 4096)) * 1024 * 1024,
+    timeout=int(os.environ.get('DOWNLOAD_TIMEOUT', 300))
+)
+
+# Cache local de vídeos por URL (VIDEO_CACHE_MAX_MB=0 desativa o cache)
+VIDEO_CACHE_MAX_MB = int(os.environ.get('VIDEO_CACHE_MAX_MB', 2048))
+video_cache = None
+if VIDEO_CACHE_MAX_MB > 0:
+    video_cache = VideoCache(
+        os.environ.get('VIDEO_CACHE_DIR', '/tmp/tiktok-video-cache'),
+        max_bytes=VIDEO_CACHE_MAX_MB * 1024 * 1024,
+        fresh_for=int(os.environ.get('VIDEO_CACHE_FRESH_SECONDS', 300)),
+        downloader=downloader
+    )
+
+# Sem cache (VIDEO_CACHE_MAX_MB=0), os vídeos baixados ficam num spool (tmpfs
+# quando há espaço) com quota e referências; cada arquivo é apagado quando o
+# último job o libera. Com o cache ligado (padrão) os vídeos ficam no diretório
+# do cache, limitado pelo LRU, e o spool e as métricas dele não são criados
+spool = None
+if not video_cache:
+    spool = VideoSpool(
+        os.environ.get('SPOOL_DIR') or default_spool_dir(),
+        max_bytes=int(os.environ.get('SPOOL_MAX_MB', 4096)) * 1024 * 1024,
+        downloader=downloader,
+        wait_timeout=int(os.environ.get('SPOOL_WAIT_TIMEOUT', 60))
+    )
+
+# Onde o bot reserva o arquivo do vídeo: o cache ou o spool
+video_store = video_cache or spool
+
+# Sessões validadas recentemente pulam a injeção de cookies e o teste de login
+# (SESSION_TTL=0 desativa)
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 1800))
+session_store = None
+if SESSION_TTL > 0:
+    session_store = SessionStore(os.environ.get('SESSION_STORE_DIR', '/tmp/tiktok-sessions'), ttl=SESSION_TTL)
+
+# Controle de admissão: limita as postagens simultâneas pela configuração e
+# pela CPU/RAM livres; excedentes esperam numa fila limitada e depois recebem 429
+admission = AdmissionController(
+    max_concurrent=int(os.environ.get('MAX_CONCURRENT_POSTS', max(BROWSER_CONTEXTS or BROWSER_POOL_SIZE, 1))),
+    max_queue=int(os.environ.get('ADMISSION_QUEUE_SIZE', 10)),
+    queue_timeout=int(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 300)),
+    mb_per_slot=int(os.environ.get('ADMISSION_MB_PER_POST', 600)),
+    max_load_per_cpu=float(os.environ.get('ADMISSION_MAX_LOAD_PER_CPU', 1.5))
+)
+
+def publish_uncertain(error):
+    """Falha na publicação sem confirmação: o post pode ter saído, então não deve ser repetido"""
+    return getattr(error, 'step', None) == 'published' and 'not confirmed' in (getattr(error, 'reason', None) or '')
+
+# Resultados por Idempotency-Key (ou por session_id + video_url + legenda, com
+# IDEMPOTENCY_DERIVE=1): duplicatas esperam a postagem em andamento ou recebem
+# o resultado guardado por IDEMPOTENCY_TTL segundos sem abrir o navegador
+IDEMPOTENCY_DERIVE = os.environ.get('IDEMPOTENCY_DERIVE', '1') == '1'
+idempotency = IdempotencyStore(
+    ttl=int(os.environ.get('IDEMPOTENCY_TTL', 24 * 60 * 60)),
+    max_entries=int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000)),
+    cache_error=publish_uncertain
+)
+
+# Jobs aguardando na fila assíncrona além deste limite também recebem 429
+JOB_MAX_QUEUED = int(os.environ.get('JOB_MAX_QUEUED', 100))
+
+# Métricas no formato do Prometheus (servidas em /metrics)
+CHROME_PROCESS_NAMES = ('chrome', 'chromium', 'chromium-browse')
+JOBS_IN_FLIGHT = metrics.Gauge('tiktok_api_jobs_in_flight', 'Postagens em execução (rota síncrona e workers)')
+JOBS_IN_FLIGHT.set(0)
+metrics.Gauge('tiktok_api_jobs_queued', 'Jobs aguardando na fila',
+              func=lambda: job_queue.stats().get('queued', 0))
+metrics.Gauge('tiktok_api_admission_capacity', 'Postagens simultâneas permitidas agora',
+              func=lambda: admission.stats()['capacity'])
+metrics.Gauge('tiktok_api_admission_waiting', 'Requisições aguardando vaga',
+              func=lambda: admission.stats()['waiting'])
+metrics.Counter('tiktok_api_admission_rejected_total', 'Requisições recusadas com 429',
+                func=lambda: admission.stats()['rejected'])
+metrics.Gauge('tiktok_api_chrome_processes', 'Processos do Chrome vivos (navegador e renderers)',
+              func=lambda: len(find_processes(CHROME_PROCESS_NAMES)))
+metrics.Gauge('tiktok_api_chromedriver_processes', 'Processos do chromedriver vivos',
+              func=lambda: len(find_processes(('chromedriver', 'undetected_chromedriver'))))
+if browser_pool:
+    metrics.Gauge('tiktok_api_browser_pool_idle', 'Navegadores livres no pool',
+                  func=lambda: browser_pool.stats()['idle'])
+    metrics.Gauge('tiktok_api_browser_pool_in_use', 'Navegadores emprestados do pool',
+                  func=lambda: browser_pool.stats()['in_use'])
+    metrics.Counter('tiktok_api_browser_pool_recycled_total', 'Navegadores reciclados pelo pool',
+                    func=lambda: browser_pool.stats()['recycled'])
+if video_cache:
+    metrics.Counter('tiktok_api_video_cache_hits_total', 'Vídeos servidos do cache',
+                    func=lambda: video_cache.stats()['hits'])
+    metrics.Counter('tiktok_api_video_cache_misses_total', 'Vídeos baixados por falta no cache',
+                    func=lambda: video_cache.stats()['misses'])
+    metrics.Gauge('tiktok_api_video_cache_bytes', 'Bytes ocupados pelo cache de vídeos',
+                  func=lambda: video_cache.stats()['bytes'])
+if spool:
+    metrics.Gauge('tiktok_api_spool_bytes', 'Bytes ocupados ou reservados no spool de vídeos',
+                  func=lambda: spool.stats()['bytes'])
+    metrics.Gauge('tiktok_api_spool_max_bytes', 'Quota do spool de vídeos',
+                  func=lambda: spool.stats()['max_bytes'])
+    metrics.Gauge('tiktok_api_spool_files', 'Vídeos no spool',
+                  func=lambda: spool.stats()['files'])
+    metrics.Counter('tiktok_api_spool_rejected_total', 'Downloads recusados por falta de espaço no spool',
+                    func=lambda: spool.stats()['rejected'])
+metrics.Counter('tiktok_api_hashtag_cache_hits_total', 'Hashtags inseridas sem esperar o dropdown',
+                func=lambda: hashtag_cache.stats()['hits'])
+metrics.Counter('tiktok_api_hashtag_cache_misses_total', 'Hashtags resolvidas pelo dropdown de sugestões',
+                func=lambda: hashtag_cache.stats()['misses'])
+metrics.Counter('tiktok_api_music_cache_hits_total', 'Músicas selecionadas direto pelo card conhecido',
+                func=lambda: music_cache.stats()['hits'])
+metrics.Counter('tiktok_api_music_cache_misses_total', 'Músicas resolvidas pelo fluxo completo de busca',
+                func=lambda: music_cache.stats()['misses'])
+metrics.Counter('tiktok_api_music_cache_saved_seconds_total', 'Segundos economizados por acertos no cache de músicas',
+                func=lambda: music_cache.stats()['saved_seconds_total'])
+metrics.Counter('tiktok_api_locator_fallbacks_total', 'Elementos encontrados só por uma estratégia alternativa (interface mudou)',
+                func=lambda: sum(stats['fallbacks'] for stats in locators.stats().values()))
+metrics.Counter('tiktok_api_locator_timeouts_total', 'Elementos não encontrados por nenhuma estratégia',
+                func=lambda: sum(stats['timeouts'] for stats in locators.stats().values()))
+metrics.Counter('tiktok_api_idempotent_replays_total', 'Postagens duplicadas respondidas sem abrir o navegador',
+                func=lambda: idempotency.stats()['replayed'] + idempotency.stats()['joined'])
+metrics.Counter('tiktok_api_download_bytes_total', 'Bytes baixados de vídeos de origem',
+                func=lambda: downloader.stats()['bytes'])
+
+# Limites das esperas do bot, ex: WAIT_BOUNDS='{"video_load": [2, 300]}'
+waits.configure_bounds(json.loads(os.environ.get('WAIT_BOUNDS', '{}')))
+
+# Sondagem do vídeo antes de abrir o navegador (VIDEO_PREFLIGHT=0 desativa),
+# ex: PREFLIGHT_LIMITS='{"max_duration": 600}'
+VIDEO_PREFLIGHT = os.environ.get('VIDEO_PREFLIGHT', '1') == '1'
+# Retry-After das respostas 503 quando a origem do vídeo está fora do ar
+PREFLIGHT_RETRY_AFTER = int(os.environ.get('PREFLIGHT_RETRY_AFTER', 30))
+preflight.configure_limits(json.loads(os.environ.get('PREFLIGHT_LIMITS', '{}')))
+metrics.Counter('tiktok_api_preflight_rejected_total', 'Vídeos recusados antes de abrir o navegador',
+                func=lambda: preflight.preflight_stats()['rejected'])
+
+# Traces por requisição em JSON lines (TRACE_FILE vazio desativa). Uma fração
+# TRACE_SAMPLE_RATE é amostrada (com tempos de página do CDP); traces com erro
+# ou mais lentos que TRACE_SLOW_SECONDS são sempre gravados
+tracing.tracer.configure(
+    path=os.environ.get('TRACE_FILE', '/tmp/tiktok-traces.jsonl') or None,
+    sample_rate=float(os.environ.get('TRACE_SAMPLE_RATE', 0.05)),
+    slow_seconds=float(os.environ.get('TRACE_SLOW_SECONDS', 300)),
+    max_bytes=int(os.environ.get('TRACE_MAX_MB', 100)) * 1024 * 1024
+)
+metrics.Counter('tiktok_api_traces_exported_total', 'Traces gravados no arquivo de traces',
+                func=lambda: tracing.tracer.stats()['exported'])
+
+# Prazos do watchdog: JOB_DEADLINE_SECONDS por postagem (por vídeo num lote) e
+# STEP_DEADLINES por tentativa de cada passo, ex: STEP_DEADLINES='{"upload_complete": 1200}'.
+# Um prazo estourado mata o driver travado; a cada REAP_INTERVAL segundos
+# processos do Chrome sem driver vivo há mais de REAP_GRACE_SECONDS são finalizados
+JOB_DEADLINE_SECONDS = int(os.environ.get('JOB_DEADLINE_SECONDS', 1800))
+step_deadlines = dict(STEP_DEADLINES, **json.loads(os.environ.get('STEP_DEADLINES', '{}')))
+watchdog.configure(
+    interval=float(os.environ.get('WATCHDOG_INTERVAL', 5)),
+    reap_interval=float(os.environ.get('REAP_INTERVAL', 60)),
+    reap_grace=float(os.environ.get('REAP_GRACE_SECONDS', 120))
+)
+metrics.Counter('tiktok_api_watchdog_expired_total', 'Postagens abortadas por estourar o prazo do job ou de um passo',
+                func=lambda: watchdog.stats()['expired_jobs'] + watchdog.stats()['expired_steps'])
+metrics.Counter('tiktok_api_watchdog_killed_processes_total', 'Processos do Chrome finalizados pelo watchdog',
+                func=lambda: watchdog.stats()['killed_processes'] + watchdog.stats()['reaped_processes'])
+metrics.Counter('tiktok_api_watchdog_reclaimed_bytes_total', 'Memória (RSS) liberada pelo watchdog',
+                func=lambda: watchdog.stats()['reclaimed_bytes'])
+
+# Id de trace aceito no header X-Trace-Id (ex: vindo de um proxy ou do cliente)
+TRACE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+def request_trace_id():
+    """Id de trace da requisição: o do header X-Trace-Id, se válido, ou um novo"""
+    trace_id = request.headers.get('X-Trace-Id', '')
+    if not TRACE_ID_PATTERN.match(trace_id):
+        trace_id = tracing.tracer.new_trace_id()
+    g.trace_id = trace_id
+    return trace_id
+
+@app.after_request
+def add_trace_header(response):
+    """Devolve o id do trace para o cliente correlacionar a resposta com o arquivo de traces"""
+    trace_id = g.get('trace_id')
+    if trace_id:
+        response.headers['X-Trace-Id'] = trace_id
+    return response
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Rota para verificar se a API está funcionando"""
-    return jsonify({"status": "ok", "message": "API is running"}), 200
+    response = {"status": "ok", "message": "API is running"}
+    if browser_pool:
+        response["browser_pool"] = browser_pool.stats()
+    if video_cache:
+        response["video_cache"] = video_cache.stats()
+    if spool:
+        response["spool"] = spool.stats()
+    response["downloads"] = downloader.stats()
+    response["chromedriver"] = driver_cache_stats()
+    if session_store:
+        response["sessions"] = session_store.stats()
+    response["hashtag_cache"] = hashtag_cache.stats()
+    response["music_cache"] = music_cache.stats()
+    response["locators"] = locators.stats()
+    response["page_weights"] = page_weights.stats()
+    response["preflight"] = preflight.preflight_stats()
+    response["admission"] = admission.stats()
+    response["jobs"] = job_queue.stats()
+    response["idempotency"] = idempotency.stats()
+    response["scheduler"] = scheduler.stats()
+    response["waits"] = waits.wait_stats()
+    response["tracing"] = tracing.tracer.stats()
+    response["watchdog"] = watchdog.stats()
+    return jsonify(response), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métricas por fase do bot e do processo no formato do Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def parse_post_request(data):
+    """
+    Valida o corpo de uma requisição de postagem.
+    Retorna (bot_params, None) ou (None, (resposta de erro, status)).
+    """
+    if not isinstance(data, dict):
+        return None, ({
+            "error": "Invalid request body",
+            "message": "Request body must be a JSON object"
+        }, 400)
+
+    # Validação dos campos obrigatórios
+    required_fields = ['session_id', 'video_url']
+    missing_fields = [field for field in required_fields if field not in data]
+    
+    if missing_fields:
+        return None, ({
+            "error": "Missing required fields",
+            "missing_fields": missing_fields
+        }, 400)
+
+    # Configuração dos parâmetros com valores padrão
+    bot_params = {
+        'session_id': data['session_id'],
+        'sid_tt': data.get('sid_tt', data['session_id']),
+        'video_url': data['video_url'],
+        'video_caption': data.get('video_caption', ''),
+        'hashtags': data.get('hashtags', []),
+        'music_name': data.get('music_name', ''),
+        'music_volume': data.get('music_volume', 50)
+    }
+
+    # Validações adicionais
+    if not isinstance(bot_params['hashtags'], list):
+        return None, ({
+            "error": "Invalid hashtags format",
+            "message": "Hashtags must be a list of strings"
+        }, 400)
+
+    if not isinstance(bot_params['music_volume'], (int, float)) or \
+       not 0 <= bot_params['music_volume'] <= 100:
+        return None, ({
+            "error": "Invalid music volume",
+            "message": "Music volume must be a number between 0 and 100"
+        }, 400)
+
+    return bot_params, None
+
+def parse_batch_request(data):
+    """
+    Valida o corpo de uma postagem em lote: session_id/sid_tt no topo e a
+    lista de vídeos em "videos". Retorna (lista de bot_params, None) ou
+    (None, (resposta de erro, status)).
+    """
+    if not isinstance(data, dict):
+        return None, ({
+            "error": "Invalid request body",
+            "message": "Request body must be a JSON object"
+        }, 400)
+
+    videos = data.get('videos')
+    if not isinstance(videos, list) or not videos:
+        return None, ({
+            "error": "Invalid videos format",
+            "message": "videos must be a non-empty list of video specs"
+        }, 400)
+
+    if len(videos) > MAX_BATCH_SIZE:
+        return None, ({
+            "error": "Batch too large",
+            "message": f"A batch accepts at most {MAX_BATCH_SIZE} videos"
+        }, 400)
+
+    items = []
+    for index, video in enumerate(videos):
+        if not isinstance(video, dict):
+            video = {}
+        spec = dict(video, session_id=data.get('session_id'), sid_tt=data.get('sid_tt', data.get('session_id')))
+        if spec['session_id'] is None:
+            del spec['session_id']
+        bot_params, error = parse_post_request(spec)
+        if error:
+            error[0]['index'] = index
+            return None, error
+        items.append(bot_params)
+    return items, None
+
+# Passo do pipeline que esgotou as tentativas -> código HTTP
+STEP_STATUS_CODES = {
+    'browser_ready': 503,
+    'session_valid': 401
+}
+
+def error_status_code(error_message, step=None):
+    """Mapeia diferentes tipos de erro para códigos HTTP apropriados"""
+    if "preflight" in error_message.lower():
+        return 422
+    if step in STEP_STATUS_CODES:
+        return STEP_STATUS_CODES[step]
+    if "Session" in error_message or "login" in error_message.lower():
+        return 401
+    if "validation" in error_message.lower():
+        return 400
+    if "timeout" in error_message.lower():
+        return 504
+    return 500
+
+def idempotency_key(bot_params, derive=IDEMPOTENCY_DERIVE):
+    """
+    Retorna (chave, fingerprint) da postagem ou (None, None) sem idempotência.
+    A chave do header é combinada com o session_id para não colidir entre contas;
+    o fingerprint detecta a mesma chave reutilizada com outro conteúdo.
+    """
+    fingerprint = derive_key(bot_params['session_id'], bot_params['video_url'], bot_params['video_caption'],
+                             json.dumps(bot_params['hashtags']), bot_params['music_name'], bot_params['music_volume'])
+    header = request.headers.get('Idempotency-Key', '').strip()
+    if header:
+        if len(header) > 255:
+            raise ValueError("Validation error: Idempotency-Key must have at most 255 characters")
+        return derive_key(bot_params['session_id'], header), fingerprint
+    if derive:
+        return derive_key(bot_params['session_id'], bot_params['video_url'], bot_params['video_caption']), None
+    return None, None
+
+def replay_headers(origin):
+    """Marca respostas servidas a partir de outra requisição com a mesma chave"""
+    return {"Idempotent-Replayed": "true"} if origin != 'executed' else {}
+
+def conflict_response(error):
+    """Resposta 422 para uma Idempotency-Key reutilizada com outro conteúdo"""
+    return jsonify({
+        "error": "IdempotencyConflict",
+        "message": str(error)
+    }), 422
+
+def overloaded_response(error):
+    """Resposta 429 com o Retry-After estimado pelo controle de admissão"""
+    return jsonify({
+        "error": "Overloaded",
+        "message": str(error),
+        "retry_after": error.retry_after
+    }), 429, {"Retry-After": str(error.retry_after)}
+
+def invalid_video_response(error):
+    """
+    Resposta 422 para vídeos recusados pela sondagem, ou 503 com Retry-After
+    quando a origem do vídeo estava inacessível (o vídeo pode ser válido)
+    """
+    if error.transient:
+        return jsonify({
+            "error": "VideoSourceUnavailable",
+            "message": str(error),
+            "reason": error.reason,
+            "retry_after": PREFLIGHT_RETRY_AFTER
+        }), 503, {"Retry-After": str(PREFLIGHT_RETRY_AFTER)}
+    return jsonify({
+        "error": "InvalidVideo",
+        "message": str(error),
+        "reason": error.reason
+    }), 422
+
+def preflight_video(bot_params):
+    """
+    Sonda o vídeo (só cabeçalhos, via Range) antes de abrir o navegador e guarda
+    o resultado em bot_params['preflight']. Levanta PreflightError para vídeos inválidos.
+    """
+    if VIDEO_PREFLIGHT and 'preflight' not in bot_params:
+        with tracing.span('preflight') as span:
+            bot_params['preflight'] = preflight.probe_url(bot_params['video_url'], downloader.session)
+            span.set(probed=bot_params['preflight'] is not None)
+
+def preflight_batch(items):
+    """
+    Sonda os vídeos do lote; os inválidos são marcados e não chegam ao navegador.
+    Itens já sondados (ex: no aceite de um lote assíncrono) não são sondados de novo.
+    """
+    for item in items:
+        if 'preflight_error' in item:
+            continue
+        try:
+            preflight_video(item)
+        except PreflightError as e:
+            item['preflight_error'] = e
+            if item.get('video_future'):
+                release_prefetched_video(item.pop('video_future'), video_store)
+    if all('preflight_error' in item for item in items):
+        raise items[0]['preflight_error']
+
+def reject_if_jobs_full():
+    """Levanta Overloaded se a fila assíncrona já tem JOB_MAX_QUEUED jobs esperando"""
+    queued = job_queue.stats().get('queued', 0)
+    if queued >= JOB_MAX_QUEUED:
+        raise Overloaded("Job queue is full, try again later", admission.retry_after(queued))
+
+def run_post(bot_params, bounded=False):
+    """
+    Executa o fluxo completo de postagem; levanta exceção em caso de falha.
+    bounded=True (rotas síncronas) recusa com Overloaded quando a fila de admissão está cheia.
+    """
+    with tracing.tracer.trace('post_video', trace_id=bot_params.get('trace_id')) as span:
+        preflight_video(bot_params)
+        if not bot_params.get('video_future'):
+            # O download corre enquanto a requisição espera vaga na admissão
+            bot_params['video_future'] = prefetch_video(bot_params['video_url'], video_store, downloader,
+                                                        (bot_params.get('preflight') or {}).get('size'))
+        queued = time.monotonic()
+        try:
+            with admission.slot(bounded=bounded):
+                span.set(admission_wait_ms=round((time.monotonic() - queued) * 1000, 1))
+                return _run_post(bot_params)
+        except Overloaded:
+            # Recusada antes de chegar ao navegador: libera o vídeo pré-carregado
+            release_prefetched_video(bot_params['video_future'], video_store)
+            raise
+
+def run_scheduled_post(bot_params, publish_at, on_publish):
+    """
+    Prepara uma postagem agendada (download, login, upload, legenda e música)
+    e publica no horário; chamado pelo agendador lead_seconds antes de publish_at.
+    """
+    with tracing.tracer.trace('scheduled_post', trace_id=bot_params.get('trace_id'), publish_at=publish_at):
+        preflight_video(bot_params)
+        with admission.slot(bounded=False):
+            return _run_post(bot_params, publish_at=publish_at, on_publish=on_publish)
+
+def _run_post(bot_params, publish_at=None, on_publish=None):
+    with watchdog.watch('post_video', JOB_DEADLINE_SECONDS) as watch:
+        return _run_watched_post(bot_params, watch, publish_at, on_publish)
+
+def _run_watched_post(bot_params, watch, publish_at=None, on_publish=None):
+    bot = None
+    JOBS_IN_FLIGHT.inc()
+    try:
+        bot = TikTokBot(bot_params, pool=browser_pool, cache=video_store,
+                        downloader=downloader, sessions=session_store,
+                        driver_factory=driver_factory, watch=watch, step_deadlines=step_deadlines)
+
+        # Cada passo é repetido a partir do último checkpoint; levanta StepFailed
+        if publish_at is None:
+            bot.run()
+        else:
+            # Tudo pronto antes do horário: no horário resta só o clique de publicar
+            bot.run(until='music_set')
+            wait = publish_at - time.time()
+            if wait > 0:
+                print(f"⏰ Postagem preparada, publicando em {wait:.0f}s")
+                # A espera pelo horário não conta no prazo da postagem
+                watch.extend(wait)
+                with tracing.span('wait_publish_at', seconds=round(wait, 1)):
+                    time.sleep(wait)
+            on_publish()
+            bot.run(start='published')
+
+        return {
+            "status": "success",
+            "message": "Video posted successfully",
+            "upload_seconds": bot.last_result.get('upload_seconds'),
+            "publish_seconds": bot.last_result.get('publish_seconds'),
+            "page_bytes": bot.last_result.get('page_bytes'),
+            "bytes_saved": bot.last_result.get('bytes_saved'),
+            "step_attempts": bot.last_result.get('step_attempts'),
+            "faststart": bot.last_result.get('faststart'),
+            "published_at": bot.last_result.get('published_at'),
+            "trace_id": tracing.current_trace_id()
+        }
+
+    finally:
+        JOBS_IN_FLIGHT.dec()
+        # Garante que o bot seja fechado mesmo em caso de erro
+        if not bot and bot_params.get('video_future'):
+            # O bot nem chegou a ser criado: libera o vídeo pré-carregado no aceite
+            release_prefetched_video(bot_params['video_future'], video_store)
+        if bot:
+            try:
+                bot.close()
+            except Exception as e:
+                print(f"⚠️ Erro ao fechar o bot: {e}")
+
+def run_batch(items, bounded=False):
+    """
+    Posta vários vídeos da mesma conta com um único navegador e um único login.
+    O download do próximo vídeo começa enquanto o atual está sendo postado.
+    """
+    with tracing.tracer.trace('post_videos', trace_id=items[0].get('trace_id'), videos=len(items)) as span:
+        preflight_batch(items)
+        queued = time.monotonic()
+        try:
+            with admission.slot(bounded=bounded):
+                span.set(admission_wait_ms=round((time.monotonic() - queued) * 1000, 1))
+                return _run_batch(items)
+        except Overloaded:
+            # Vídeos pré-carregados que nem chegaram ao navegador
+            for item in items:
+                if item.get('video_future'):
+                    release_prefetched_video(item['video_future'], video_store)
+            raise
+
+def _run_batch(items):
+    # O prazo do lote cresce com o número de vídeos
+    with watchdog.watch('post_videos', JOB_DEADLINE_SECONDS * len(items)) as watch:
+        return _run_watched_batch(items, watch)
+
+def _run_watched_batch(items, watch):
+    bot = None
+    # O bot começa pelo primeiro vídeo aprovado na sondagem
+    loaded = next(index for index, item in enumerate(items) if 'preflight_error' not in item)
+    first = loaded
+    JOBS_IN_FLIGHT.inc()
+    try:
+        bot = TikTokBot(items[first], pool=browser_pool, cache=video_store,
+                        downloader=downloader, sessions=session_store,
+                        driver_factory=driver_factory, watch=watch, step_deadlines=step_deadlines)
+
+        # Navegador e login uma vez só; cada vídeo repete os passos de postagem
+        bot.run(until='session_valid')
+
+        results = []
+        for index, item in enumerate(items):
+            if 'preflight_error' in item:
+                results.append({"index": index, "video_url": item['video_url'], "status": "failed",
+                                "message": str(item['preflight_error'])})
+                continue
+            if index > first:
+                bot.load_video(item)
+                loaded = index
+
+            # Pré-carrega o próximo vídeo enquanto este é postado
+            if index + 1 < len(items) and 'video_future' not in items[index + 1] \
+                    and 'preflight_error' not in items[index + 1]:
+                items[index + 1]['video_future'] = prefetch_video(items[index + 1]['video_url'], video_store, downloader,
+                                                                  (items[index + 1].get('preflight') or {}).get('size'))
+
+            result = {"index": index, "video_url": item['video_url']}
+            with tracing.span('video', index=index) as span:
+                try:
+                    if bot.post_video():
+                        result.update(status="success",
+                                      upload_seconds=bot.last_result.get('upload_seconds'),
+                                      publish_seconds=bot.last_result.get('publish_seconds'))
+                    else:
+                        result.update(status="failed", message=watch.expired or "Failed to post video",
+                                      checkpoint=bot.last_result.get('checkpoint'))
+                        span.fail(result['message'])
+                except Exception as e:
+                    result.update(status="failed", message=str(e))
+                    span.fail(e)
+            results.append(result)
+
+        succeeded = sum(1 for result in results if result['status'] == 'success')
+        return {
+            "status": "success" if succeeded == len(results) else ("partial" if succeeded else "failed"),
+            "message": f"{succeeded} of {len(results)} videos posted",
+            "results": results,
+            "trace_id": tracing.current_trace_id()
+        }
+
+    finally:
+        JOBS_IN_FLIGHT.dec()
+        # Vídeos pré-carregados que não chegaram a ser postados (ex: falha no login)
+        for item in items[loaded + 1:]:
+            if item.get('video_future'):
+                release_prefetched_video(item['video_future'], video_store)
+        if bot:
+            try:
+                bot.close()
+            except Exception as e:
+                print(f"⚠️ Erro ao fechar o bot: {e}")
+
+# Fila de postagens assíncronas
+job_queue = JobQueue(
+    run_post,
+    workers=int(os.environ.get('JOB_WORKERS', max(BROWSER_CONTEXTS or BROWSER_POOL_SIZE, 1))),
+    max_finished=int(os.environ.get('JOB_HISTORY_SIZE', 1000))
+)
+
+# Postagens com publish_at: agendadas no SQLite e preparadas SCHEDULE_LEAD_SECONDS antes do horário
+scheduler = Scheduler(
+    os.environ.get('SCHEDULE_DB', '/tmp/tiktok-schedules/schedules.db'),
+    run_scheduled_post,
+    lead_seconds=int(os.environ.get('SCHEDULE_LEAD_SECONDS', 180)),
+    max_late_seconds=int(os.environ.get('SCHEDULE_MAX_LATE_SECONDS', 3600)),
+    workers=int(os.environ.get('SCHEDULE_WORKERS', max(BROWSER_CONTEXTS or BROWSER_POOL_SIZE, 1)))
+)
+# Até quanto tempo no futuro uma postagem pode ser agendada
+SCHEDULE_MAX_HORIZON_SECONDS = int(os.environ.get('SCHEDULE_MAX_HORIZON_DAYS', 365)) * 24 * 60 * 60
+metrics.Gauge('tiktok_api_scheduled_posts', 'Postagens agendadas aguardando preparação',
+              func=lambda: len(scheduler.wheel))
+
+def parse_publish_at(value):
+    """
+    Converte publish_at (epoch em segundos ou ISO 8601; sem fuso é UTC) para epoch.
+    Levanta ValueError para valores inválidos, no passado ou além do horizonte máximo.
+    """
+    if isinstance(value, bool):
+        raise ValueError("Validation error: publish_at must be a timestamp or an ISO 8601 date")
+    if isinstance(value, (int, float)):
+        publish_at = float(value)
+        if not math.isfinite(publish_at):
+            raise ValueError("Validation error: publish_at must be a finite timestamp")
+    else:
+        try:
+            moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError("Validation error: publish_at must be a timestamp or an ISO 8601 date")
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        publish_at = moment.timestamp()
+    if publish_at < time.time() - 60:
+        raise ValueError("Validation error: publish_at is in the past")
+    if publish_at > time.time() + SCHEDULE_MAX_HORIZON_SECONDS:
+        raise ValueError(f"Validation error: publish_at is more than "
+                         f"{SCHEDULE_MAX_HORIZON_SECONDS / 86400:g} days in the future")
+    return publish_at
+
+# Tempo máximo de long-poll em GET /jobs/<id>?wait=N
+MAX_JOB_WAIT = 60
+
+# Quantidade máxima de vídeos por chamada de /post-videos
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 20))
 
 @app.route('/post-video', methods=['POST'])
-@retry_with_backoff(max_retries=3)
 def post_video():
     """Rota principal para postar vídeo no TikTok"""
-    bot = None
     try:
         # Pega os dados do request
-        data = request.get_json()
-        
-        # Validação dos campos obrigatórios
-        required_fields = ['session_id', 'video_url']
-        missing_fields = [field for field in required_fields if field not in data]
-        
-        if missing_fields:
-            return jsonify({
-                "error": "Missing required fields",
-                "missing_fields": missing_fields
-            }), 400
-
-        # Configuração dos parâmetros com valores padrão
-        bot_params = {
-            'session_id': data['session_id'],
-            'sid_tt': data.get('sid_tt', data['session_id']),
-            'video_url': data['video_url'],
-            'video_caption': data.get('video_caption', ''),
-            'hashtags': data.get('hashtags', []),
-            'music_name': data.get('music_name', ''),
-            'music_volume': data.get('music_volume', 50)
-        }
+        data = request.get_json(silent=True)
+        bot_params, error = parse_post_request(data)
+        if error:
+            return jsonify(error[0]), error[1]
+        bot_params['trace_id'] = request_trace_id()
 
-        # Validações adicionais
-        if not isinstance(bot_params['hashtags'], list):
-            return jsonify({
-                "error": "Invalid hashtags format",
-                "message": "Hashtags must be a list of strings"
-            }), 400
+        key, fingerprint = idempotency_key(bot_params)
 
-        if not isinstance(bot_params['music_volume'], (int, float)) or \
-           not 0 <= bot_params['music_volume'] <= 100:
-            return jsonify({
-                "error": "Invalid music volume",
-                "message": "Music volume must be a number between 0 and 100"
-            }), 400
+        if isinstance(data, dict) and data.get('publish_at') is not None:
+            # Agendada: responde já com o id; a postagem é preparada antes do horário
+            publish_at = parse_publish_at(data['publish_at'])
+            preflight_video(bot_params)
+            if key:
+                # O mesmo vídeo pode ser agendado para horários diferentes
+                if 'Idempotency-Key' not in request.headers:
+                    key = derive_key(key, publish_at)
+                fingerprint = fingerprint and derive_key(fingerprint, publish_at)
+            schedule = lambda: scheduler.schedule(bot_params, publish_at)
+            record, origin = idempotency.run(f'schedule:{key}', schedule, fingerprint) if key else (schedule(), 'executed')
+            status_url = f"/schedules/{record['id']}"
+            return jsonify(dict(record, status_url=status_url)), 202, dict(replay_headers(origin), Location=status_url)
 
-        # Instancia o bot com os parâmetros e tenta cada operação com retry
-        bot = TikTokBot(bot_params)
-        
-        # Tenta injetar a sessão com retry
-        def inject_session_with_retry():
-            if not bot.retry_with_backoff(bot.inject_session):
-                raise Exception("Failed to inject session after retries")
-        inject_session_with_retry()
-
-        # Testa o login com retry
-        def test_login_with_retry():
-            if not bot.retry_with_backoff(bot.test_login):
-                raise Exception("Failed to login after retries")
-        test_login_with_retry()
-
-        # Tenta postar o vídeo com retry
-        def post_video_with_retry():
-            if not bot.retry_with_backoff(bot.post_video):
-                raise Exception("Failed to post video after retries")
-        post_video_with_retry()
-            
-        return jsonify({
-            "status": "success",
-            "message": "Video posted successfully"
-        }), 200
+        if not key:
+            return jsonify(run_post(bot_params, bounded=True)), 200
+
+        # Duplicatas (retries do cliente) esperam a postagem em andamento ou recebem o resultado guardado
+        result, origin = idempotency.run(key, lambda: run_post(bot_params, bounded=True), fingerprint)
+        if origin != 'executed':
+            print(f"♻️ Postagem duplicada respondida sem abrir o navegador ({origin}) [{g.trace_id}]")
+        return jsonify(result), 200, replay_headers(origin)
 
+    except IdempotencyConflict as e:
+        return conflict_response(e)
+    except PreflightError as e:
+        print(f"❌ Vídeo recusado [{g.get('trace_id')}]: {e}")
+        return invalid_video_response(e)
+    except Overloaded as e:
+        print(f"⚠️ Postagem recusada [{g.get('trace_id')}]: {e}")
+        return overloaded_response(e)
     except Exception as e:
         error_message = str(e)
         error_type = type(e).__name__
-        
-        # Mapeia diferentes tipos de erro para códigos HTTP apropriados
-        status_code = 500
-        if "Session" in error_message or "login" in error_message.lower():
-            status_code = 401
-        elif "validation" in error_message.lower():
-            status_code = 400
-        elif "timeout" in error_message.lower():
-            status_code = 504
+        status_code = error_status_code(error_message, getattr(e, 'step', None))
             
-        # Log detalhado do erro
-        print(f"❌ Erro ({error_type}): {error_message}")
+        # Log detalhado do erro (o trace_id aponta para os spans no arquivo de traces)
+        print(f"❌ Erro ({error_type}) [{g.get('trace_id')}]: {error_message}")
         
         return jsonify({
             "error": error_type,
-            "message": error_message
+            "message": error_message,
+            "trace_id": g.get('trace_id')
         }), status_code
 
-    finally:
-        # Garante que o bot seja fechado mesmo em caso de erro
-        if bot:
-            try:
-                bot.close()
-            except Exception as e:
-                print(f"⚠️ Erro ao fechar o bot: {e}")
+@app.route('/post-videos', methods=['POST'])
+def post_videos():
+    """
+    Posta vários vídeos na mesma conta reaproveitando o navegador logado.
+    Com "async": true o lote vai para a fila e a resposta é 202 com o id do job.
+    """
+    data = request.get_json(silent=True)
+    items, error = parse_batch_request(data)
+    if error:
+        return jsonify(error[0]), error[1]
+    items[0]['trace_id'] = request_trace_id()
+
+    try:
+        if data.get('async'):
+            reject_if_jobs_full()
+        # Vídeos inválidos são recusados já no aceite, antes de qualquer download
+        preflight_batch(items)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except PreflightError as e:
+        print(f"❌ Lote recusado: {e}")
+        return invalid_video_response(e)
+
+    # O download do primeiro vídeo aprovado começa já no aceite
+    first = next(item for item in items if 'preflight_error' not in item)
+    first['video_future'] = prefetch_video(first['video_url'], video_store, downloader,
+                                           (first.get('preflight') or {}).get('size'))
+
+    if data.get('async'):
+        job = job_queue.submit(items, callback_url=data.get('callback_url'), handler=run_batch)
+        status_url = f"/jobs/{job.id}"
+        return jsonify({
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": status_url,
+            "trace_id": g.trace_id
+        }), 202, {"Location": status_url}
+
+    try:
+        result = run_batch(items, bounded=True)
+        return jsonify(result), 200
+    except PreflightError as e:
+        print(f"❌ Lote recusado: {e}")
+        return invalid_video_response(e)
+    except Overloaded as e:
+        print(f"⚠️ Lote recusado: {e}")
+        return overloaded_response(e)
+    except Exception as e:
+        error_message = str(e)
+        error_type = type(e).__name__
+        print(f"❌ Erro ({error_type}) [{g.trace_id}]: {error_message}")
+        return jsonify({
+            "error": error_type,
+            "message": error_message,
+            "trace_id": g.trace_id
+        }), error_status_code(error_message, getattr(e, 'step', None))
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Enfileira uma postagem e responde imediatamente com o id do job"""
+    data = request.get_json(silent=True)
+    bot_params, error = parse_post_request(data)
+    if error:
+        return jsonify(error[0]), error[1]
+    bot_params['trace_id'] = request_trace_id()
+
+    def accept():
+        reject_if_jobs_full()
+        # Vídeo inválido é recusado já no aceite, sem ocupar a fila
+        preflight_video(bot_params)
+
+        # O download começa já no aceite, enquanto o job aguarda na fila
+        bot_params['video_future'] = prefetch_video(bot_params['video_url'], video_store, downloader,
+                                                    (bot_params.get('preflight') or {}).get('size'))
+        job = job_queue.submit(bot_params, callback_url=data.get('callback_url'))
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/jobs/{job.id}",
+            "trace_id": bot_params['trace_id']
+        }
+
+    try:
+        # Só a Idempotency-Key explícita vale para jobs: o mesmo job é devolvido para a mesma chave
+        key, fingerprint = idempotency_key(bot_params, derive=False)
+        if key:
+            accepted, origin = idempotency.run(f'job:{key}', accept, fingerprint)
+        else:
+            accepted, origin = accept(), 'executed'
+    except ValueError as e:
+        return jsonify({"error": "Invalid Idempotency-Key", "message": str(e)}), 400
+    except IdempotencyConflict as e:
+        return conflict_response(e)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except PreflightError as e:
+        return invalid_video_response(e)
+
+    job = job_queue.get(accepted['job_id'])
+    response = dict(accepted, status=job.status if job else accepted['status'])
+    return jsonify(response), 202, dict(replay_headers(origin), Location=accepted['status_url'])
+
+@app.route('/schedules/<schedule_id>', methods=['GET'])
+def get_schedule(schedule_id):
+    """Consulta uma postagem agendada (estado, horário e desvio da publicação)"""
+    record = scheduler.get(schedule_id)
+    if not record:
+        return jsonify({
+            "error": "Schedule not found",
+            "message": f"No scheduled post with id {schedule_id}"
+        }), 404
+    return jsonify(record), 200
+
+@app.route('/schedules/<schedule_id>', methods=['DELETE'])
+def cancel_schedule(schedule_id):
+    """Cancela uma postagem agendada que ainda não começou a ser preparada"""
+    if not scheduler.cancel(schedule_id):
+        record = scheduler.get(schedule_id)
+        if not record:
+            return jsonify({
+                "error": "Schedule not found",
+                "message": f"No scheduled post with id {schedule_id}"
+            }), 404
+        return jsonify({
+            "error": "Schedule not cancellable",
+            "message": f"Scheduled post is already {record['status']}"
+        }), 409
+    return jsonify(scheduler.get(schedule_id)), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Consulta um job; com ?wait=N aguarda até N segundos pelo resultado (long-poll)"""
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({
+            "error": "Job not found",
+            "message": f"No job with id {job_id}"
+        }), 404
+
+    wait = min(request.args.get('wait', 0, type=float), MAX_JOB_WAIT)
+    if wait > 0:
+        job.wait(wait)
+
+    return jsonify(job.to_dict()), 200
 
 if __name__ == '__main__':
+    if browser_pool:
+        browser_pool.start()
+    scheduler.start()
+    watchdog.start()
     app.run(host='0.0.0.0', port=3090, threaded=True)
\ No newline at end of file
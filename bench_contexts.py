@@ -0,0 +1,71 @@
+"""
+Benchmark: N contas em Chromes separados x N contextos em um Chrome compartilhado.
+Mede o tempo até cada slot estar pronto e a memória total (Chrome + chromedriver).
+
+Uso: python bench_contexts.py --accounts 4 --url https://www.tiktok.com
+"""
+import argparse
+import time
+from tiktok_bot import create_driver
+from contexts import ContextPool
+from procinfo import rss_bytes, tree_rss_bytes
+
+
+def _driver_rss(driver):
+    """Memória do processo do chromedriver de uma sessão"""
+    try:
+        return rss_bytes(driver.service.process.pid)
+    except Exception:
+        return 0
+
+
+def bench_processes(accounts, url):
+    drivers, startup = [], []
+    try:
+        for _ in range(accounts):
+            start = time.monotonic()
+            driver = create_driver()
+            driver.get(url)
+            startup.append(time.monotonic() - start)
+            drivers.append(driver)
+        memory = sum(tree_rss_bytes(d.browser_pid) + _driver_rss(d) for d in drivers)
+        return startup, memory
+    finally:
+        for driver in drivers:
+            driver.quit()
+
+
+def bench_contexts(accounts, url):
+    pool = ContextPool(size=accounts)
+    contexts, startup = [], []
+    try:
+        for account in range(accounts):
+            start = time.monotonic()
+            context = pool.acquire(key=f'account-{account}')
+            context.driver.get(url)
+            startup.append(time.monotonic() - start)
+            contexts.append(context)
+        memory = pool.stats()['host_rss_bytes'] + sum(_driver_rss(c.driver) for c in contexts)
+        return startup, memory
+    finally:
+        for context in contexts:
+            pool.release(context)
+        pool.close()
+
+
+def _report(name, startup, memory, accounts):
+    print(f"{name:<10} primeiro slot {startup[0]:6.2f}s | "
+          f"demais (média) {sum(startup[1:]) / max(len(startup) - 1, 1):6.2f}s | "
+          f"total {sum(startup):6.2f}s | "
+          f"memória {memory / 1024 / 1024:7.0f} MB ({memory / accounts / 1024 / 1024:.0f} MB por conta)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=4)
+    parser.add_argument('--url', default='https://www.tiktok.com')
+    args = parser.parse_args()
+
+    print(f"📊 {args.accounts} contas em {args.url}")
+    _report('processos', *bench_processes(args.accounts, args.url), args.accounts)
+    _report('contextos', *bench_contexts(args.accounts, args.url), args.accounts)
@@ -0,0 +1,67 @@
+"""
+Benchmark: tempo do setup_browser() com o patch do chromedriver a cada
+instância (padrão do undetected_chromedriver) x chromedriver patcheado uma
+vez no boot (driver_cache). Reporta p50/p95 de cada modo.
+
+Uso: python bench_startup.py --runs 10 --concurrency 2
+"""
+import argparse
+import math
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tiktok_bot import TikTokBot, create_driver, CHROME_VERSION_MAIN
+from driver_cache import prepare_driver
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def _setup_once(_):
+    """Roda o setup_browser() de um bot sem pool (sem download nem login)"""
+    bot = TikTokBot.__new__(TikTokBot)
+    bot.pool = None
+    bot.driver_factory = create_driver
+    bot.driver = None
+    start = time.monotonic()
+    ok = bot.setup_browser()
+    elapsed = time.monotonic() - start
+    if bot.driver:
+        bot.driver.quit()
+    return elapsed if ok else None
+
+
+def bench(runs, concurrency):
+    """Dispara os setups em grupos de concurrency (simula threads do Flask iniciando bots juntas)"""
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(_setup_once, range(runs)))
+    timings = [elapsed for elapsed in results if elapsed is not None]
+    return timings, len(results) - len(timings)
+
+
+def _report(name, timings, failures):
+    if not timings:
+        print(f"{name:<10} todas as {failures} tentativas falharam")
+        return
+    print(f"{name:<10} p50 {_percentile(timings, 50):6.2f}s | p95 {_percentile(timings, 95):6.2f}s | "
+          f"máx {max(timings):6.2f}s | falhas {failures}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--source', help='chromedriver local usado no lugar do download')
+    args = parser.parse_args()
+
+    print(f"📊 {args.runs} execuções do setup_browser() com {args.concurrency} em paralelo")
+    # Antes: sem chromedriver preparado, cada instância roda o patcher
+    _report('antes', *bench(args.runs, args.concurrency))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        started = time.monotonic()
+        prepare_driver(cache_dir, CHROME_VERSION_MAIN, source=args.source)
+        print(f"⏱️ Preparo do chromedriver no boot: {time.monotonic() - started:.2f}s")
+        _report('depois', *bench(args.runs, args.concurrency))
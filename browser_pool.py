@@ -0,0 +1,220 @@
+import threading
+import time
+from collections import deque
+from tiktok_bot import create_driver
+from procinfo import tree_rss_bytes
+
+WARM_URL = 'https://www.tiktok.com'
+
+# Origens cujo storage (localStorage, IndexedDB, service workers...) é apagado na devolução
+WIPE_ORIGINS = ['https://www.tiktok.com', 'https://tiktok.com']
+
+
+class PooledBrowser:
+    """Um navegador pré-iniciado que pertence ao pool"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.time()
+
+    @property
+    def browser_pid(self):
+        return getattr(self.driver, 'browser_pid', None)
+
+    def rss_bytes(self):
+        """Memória total do Chrome (processo principal + renderers)"""
+        return tree_rss_bytes(self.browser_pid)
+
+
+class BrowserPool:
+    """
+    Pool limitado de navegadores pré-iniciados e pré-navegados.
+    Cada requisição pega um navegador com acquire() e devolve com release(),
+    que limpa cookies/storage/abas, verifica a saúde e recicla o navegador
+    após max_uses usos ou quando passa de max_rss_mb de memória.
+    """
+
+    def __init__(self, size=2, max_uses=20, max_rss_mb=1500, acquire_timeout=120,
+                 driver_factory=create_driver, warm_url=WARM_URL):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self.acquire_timeout = acquire_timeout
+        self.driver_factory = driver_factory
+        self.warm_url = warm_url
+
+        self._idle = deque()
+        self._in_use = set()
+        self._launching = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self.launched = 0
+        self.recycled = 0
+        self.launch_failures = 0
+
+    def start(self):
+        """Inicia os navegadores do pool em background"""
+        with self._cond:
+            missing = self.size - self._total()
+            self._launching += missing
+        for _ in range(missing):
+            threading.Thread(target=self._launch, daemon=True).start()
+
+    def _total(self):
+        return len(self._idle) + len(self._in_use) + self._launching
+
+    def _launch(self):
+        """Cria um navegador novo, já navegado até a página inicial, e o coloca no pool"""
+        browser = None
+        try:
+            driver = self.driver_factory()
+            driver.get(self.warm_url)
+            browser = PooledBrowser(driver)
+            print("✅ Navegador do pool aquecido")
+        except Exception as e:
+            self.launch_failures += 1
+            print(f"❌ Erro ao iniciar navegador do pool: {e}")
+
+        with self._cond:
+            self._launching -= 1
+            if browser:
+                self.launched += 1
+                if self._closed:
+                    self._quit(browser)
+                else:
+                    self._idle.append(browser)
+            self._cond.notify_all()
+
+    def acquire(self, timeout=None, key=None):
+        """
+        Pega um navegador livre, esperando até acquire_timeout segundos.
+        key (a conta) é ignorada: os navegadores são limpos a cada devolução.
+        A verificação de saúde roda fora do lock: um navegador travado não
+        bloqueia os outros acquire/release nem as estatísticas.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Browser pool is closed")
+
+                    if self._idle:
+                        # Reservado (conta como em uso) enquanto é verificado
+                        browser = self._idle.popleft()
+                        self._in_use.add(browser)
+                        break
+
+                    # Pool ainda não está cheio: inicia um navegador novo
+                    if self._total() < self.size:
+                        self._launching += 1
+                        threading.Thread(target=self._launch, daemon=True).start()
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Timeout waiting for a browser from the pool")
+                    self._cond.wait(remaining)
+
+            if self._is_healthy(browser):
+                return browser
+
+            with self._cond:
+                self._in_use.discard(browser)
+                self.recycled += 1
+                if not self._closed and self._total() < self.size:
+                    # Repõe o navegador morto para manter o pool aquecido
+                    self._launching += 1
+                    threading.Thread(target=self._launch, daemon=True).start()
+                self._cond.notify_all()
+            self._quit(browser)
+
+    def release(self, browser):
+        """Devolve o navegador ao pool depois de limpar a sessão"""
+        browser.uses += 1
+        if browser.uses >= self.max_uses:
+            # Vai ser descartado de qualquer forma: não limpa nem verifica
+            print(f"♻️ Reciclando navegador após {browser.uses} usos")
+            reusable = False
+        else:
+            reusable = self._wipe(browser) and self._is_healthy(browser)
+
+        if reusable and self.max_rss_bytes and browser.rss_bytes() > self.max_rss_bytes:
+            print(f"♻️ Reciclando navegador por uso de memória ({browser.rss_bytes() // (1024 * 1024)} MB)")
+            reusable = False
+
+        with self._cond:
+            self._in_use.discard(browser)
+            if reusable and not self._closed:
+                self._idle.append(browser)
+            else:
+                self.recycled += 1
+                if not self._closed and self._total() < self.size:
+                    # Repõe o navegador reciclado para manter o pool aquecido
+                    self._launching += 1
+                    threading.Thread(target=self._launch, daemon=True).start()
+            self._cond.notify_all()
+
+        if not reusable or self._closed:
+            self._quit(browser)
+
+    def _wipe(self, browser):
+        """Remove cookies, storage e abas extras, voltando para a página inicial"""
+        driver = browser.driver
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            for origin in WIPE_ORIGINS:
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                    'origin': origin,
+                    'storageTypes': 'all'
+                })
+
+            driver.get(self.warm_url)
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+            return True
+        except Exception as e:
+            print(f"⚠️ Erro ao limpar navegador do pool: {e}")
+            return False
+
+    def _is_healthy(self, browser):
+        """Verifica se o navegador ainda responde a comandos"""
+        try:
+            return browser.driver.execute_script("return document.readyState") is not None
+        except Exception:
+            return False
+
+    def _quit(self, browser):
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            print(f"⚠️ Erro ao fechar navegador do pool: {e}")
+
+    def close(self):
+        """Fecha todos os navegadores livres; os emprestados são fechados na devolução"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for browser in idle:
+            self._quit(browser)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'launching': self._launching,
+                'launched': self.launched,
+                'recycled': self.recycled,
+                'launch_failures': self.launch_failures
+            }
@@ -0,0 +1,301 @@
+import threading
+import time
+from collections import OrderedDict
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from tiktok_bot import create_driver
+from slim import enable_resource_blocking
+from procinfo import tree_rss_bytes
+from watchdog import track_driver
+
+
+class BrowserContext:
+    """Um contexto isolado (cookies e storage próprios) dentro do Chrome compartilhado"""
+
+    def __init__(self, context_id, target_id, driver, generation, key=None):
+        self.context_id = context_id
+        self.target_id = target_id
+        self.driver = driver
+        self.generation = generation
+        self.key = key
+        self.uses = 0
+        self.created_at = time.time()
+
+
+class ContextPool:
+    """
+    Vários contextos isolados (Target.createBrowserContext) dentro de um único
+    processo do Chrome. Cada contexto tem o próprio cookie jar e é controlado
+    por um chromedriver anexado ao navegador compartilhado, então várias contas
+    postam em paralelo pagando a inicialização e a memória de um Chrome só.
+
+    Contextos livres continuam associados à conta (key) que os usou por último
+    e são devolvidos a ela já logados; outras contas recebem um contexto novo.
+    Mesma interface do BrowserPool: acquire() / release() / stats().
+    """
+
+    def __init__(self, size=8, max_uses=50, acquire_timeout=120, driver_factory=create_driver):
+        self.size = size
+        self.max_uses = max_uses
+        self.acquire_timeout = acquire_timeout
+        self.driver_factory = driver_factory
+
+        self._host = None
+        self._generation = 0
+        self._host_lock = threading.Lock()  # serializa os comandos no driver principal
+
+        self._idle = OrderedDict()  # context_id -> BrowserContext, do menos para o mais recente
+        self._in_use = set()
+        self._creating = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self.created = 0
+        self.reused = 0
+        self.disposed = 0
+        self.host_launches = 0
+        self.launch_failures = 0
+
+    def start(self):
+        """Inicia o Chrome compartilhado em background"""
+        def launch():
+            try:
+                self._ensure_host()
+            except Exception as e:
+                print(f"❌ Erro ao iniciar o Chrome compartilhado: {e}")
+        threading.Thread(target=launch, daemon=True).start()
+
+    def _ensure_host(self):
+        """Retorna o driver principal, (re)iniciando o Chrome se ele tiver morrido"""
+        with self._host_lock:
+            if self._host is not None:
+                try:
+                    self._host.execute_script("return 1")
+                    return self._host
+                except Exception:
+                    print("⚠️ Chrome compartilhado não responde, reiniciando")
+                    self._quit_driver(self._host)
+                    self._host = None
+                    # Contextos do navegador antigo morreram junto com ele
+                    self._generation += 1
+
+            try:
+                self._host = self.driver_factory()
+            except Exception:
+                self.launch_failures += 1
+                raise
+            self.host_launches += 1
+            print("✅ Chrome compartilhado iniciado")
+            return self._host
+
+    def acquire(self, timeout=None, key=None):
+        """
+        Pega um contexto para a conta key, esperando até acquire_timeout segundos.
+        Um contexto livre da mesma conta é reaproveitado; senão um contexto novo é
+        criado, descartando o contexto livre usado há mais tempo se o limite foi atingido.
+        A verificação de saúde roda fora do lock (uma aba travada não bloqueia o pool).
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            discard = []
+            candidate = None
+            try:
+                with self._cond:
+                    while True:
+                        if self._closed:
+                            raise RuntimeError("Browser context pool is closed")
+
+                        for context in list(self._idle.values()):
+                            if context.generation != self._generation:
+                                del self._idle[context.context_id]
+                                discard.append(context)
+                            elif key is not None and context.key == key:
+                                # Reservado (conta como em uso) enquanto é verificado
+                                del self._idle[context.context_id]
+                                self._in_use.add(context)
+                                candidate = context
+                                break
+                        if candidate:
+                            break
+
+                        if self._total() >= self.size and self._idle:
+                            # Libera a vaga do contexto livre mais antigo de outra conta
+                            _, oldest = self._idle.popitem(last=False)
+                            discard.append(oldest)
+
+                        if self._total() < self.size:
+                            self._creating += 1
+                            break
+
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError("Timeout waiting for a browser context")
+                        self._cond.wait(remaining)
+            finally:
+                for context in discard:
+                    self._dispose(context)
+
+            if candidate is None:
+                break
+            if self._is_healthy(candidate):
+                with self._cond:
+                    self.reused += 1
+                return candidate
+            with self._cond:
+                self._in_use.discard(candidate)
+                self._cond.notify_all()
+            self._dispose(candidate)
+
+        context = None
+        try:
+            context = self._create_context(key)
+            return context
+        finally:
+            with self._cond:
+                self._creating -= 1
+                if context:
+                    self.created += 1
+                    self._in_use.add(context)
+                self._cond.notify_all()
+
+    def _total(self):
+        return len(self._idle) + len(self._in_use) + self._creating
+
+    def _create_context(self, key):
+        """Cria um contexto com uma aba em branco e anexa um chromedriver a ela"""
+        host = self._ensure_host()
+        with self._host_lock:
+            generation = self._generation
+            context_id = host.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+            target_id = host.execute_cdp_cmd('Target.createTarget', {
+                'url': 'about:blank',
+                'browserContextId': context_id
+            })['targetId']
+
+        try:
+            driver = self._attach(host, target_id)
+        except Exception:
+            self.launch_failures += 1
+            self._dispose_context_id(context_id, generation)
+            raise
+        return BrowserContext(context_id, target_id, driver, generation, key)
+
+    def _attach(self, host, target_id):
+        """Abre uma sessão do chromedriver (o mesmo binário patcheado) na aba do contexto"""
+        options = webdriver.ChromeOptions()
+        options.debugger_address = host.options.debugger_address
+        driver = webdriver.Chrome(service=Service(executable_path=host.patcher.executable_path), options=options)
+        # No chromedriver o handle da janela é o id do target
+        driver.switch_to.window(target_id)
+
+        # O Chrome é do host: abortar este driver mata só o seu chromedriver
+        driver.browser_pid = host.browser_pid
+        driver.shared_browser = True
+        track_driver(driver)
+        driver.slim_mode = getattr(host, 'slim_mode', False)
+        if driver.slim_mode:
+            enable_resource_blocking(driver)
+        return driver
+
+    def release(self, context):
+        """Devolve o contexto; os cookies ficam para a próxima postagem da mesma conta"""
+        context.uses += 1
+        reusable = (
+            not self._closed
+            and context.generation == self._generation
+            and context.uses < self.max_uses
+            and self._reset(context)
+            and self._is_healthy(context)
+        )
+
+        with self._cond:
+            self._in_use.discard(context)
+            if reusable:
+                self._idle[context.context_id] = context
+            self._cond.notify_all()
+
+        if not reusable:
+            self._dispose(context)
+
+    def _reset(self, context):
+        """
+        Fecha as abas extras abertas durante a postagem. O chromedriver anexado
+        enxerga todas as abas do Chrome compartilhado (as de outras contas e a
+        do host), então só são fechados os targets deste contexto.
+        """
+        try:
+            with self._host_lock:
+                if self._host is None or context.generation != self._generation:
+                    return False
+                targets = self._host.execute_cdp_cmd('Target.getTargets', {})['targetInfos']
+                for target in targets:
+                    if target.get('browserContextId') == context.context_id \
+                            and target['targetId'] != context.target_id:
+                        self._host.execute_cdp_cmd('Target.closeTarget', {'targetId': target['targetId']})
+            context.driver.switch_to.window(context.target_id)
+            return True
+        except Exception as e:
+            print(f"⚠️ Erro ao limpar contexto do navegador: {e}")
+            return False
+
+    def _is_healthy(self, context):
+        """Verifica se a aba do contexto ainda responde a comandos"""
+        try:
+            return context.driver.execute_script("return document.readyState") is not None
+        except Exception:
+            return False
+
+    def _dispose(self, context):
+        """Desanexa o chromedriver e apaga o contexto (abas, cookies e storage)"""
+        self._quit_driver(context.driver)
+        self._dispose_context_id(context.context_id, context.generation)
+
+    def _dispose_context_id(self, context_id, generation):
+        with self._host_lock:
+            self.disposed += 1
+            if self._host is None or generation != self._generation:
+                return
+            try:
+                self._host.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+            except Exception as e:
+                print(f"⚠️ Erro ao descartar contexto do navegador: {e}")
+
+    def _quit_driver(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"⚠️ Erro ao fechar driver: {e}")
+
+    def close(self):
+        """Descarta os contextos livres e fecha o Chrome compartilhado"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle.values())
+            self._idle.clear()
+            self._cond.notify_all()
+        for context in idle:
+            self._dispose(context)
+        with self._host_lock:
+            if self._host is not None:
+                self._quit_driver(self._host)
+                self._host = None
+                self._generation += 1
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                'mode': 'contexts',
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'launching': self._creating,
+                'launched': self.created,
+                'recycled': self.disposed,
+                'reused': self.reused,
+                'host_launches': self.host_launches,
+                'launch_failures': self.launch_failures
+            }
+        host = self._host
+        stats['host_rss_bytes'] = tree_rss_bytes(getattr(host, 'browser_pid', None)) if host else 0
+        return stats
@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+MB = 1024 * 1024
+
+
+class DownloadError(Exception):
+    pass
+
+
+class RangedDownloader:
+    """
+    Downloader de vídeos com requisições HTTP Range em paralelo.
+    Usa uma Session com pool de conexões, retoma arquivos parciais
+    (.part + .part.json com o progresso de cada segmento) e aplica
+    limites de tamanho e de tempo por download.
+    """
+
+    def __init__(self, segments=4, min_segment_size=4 * MB, max_bytes=4096 * MB,
+                 timeout=300, connect_timeout=10, read_timeout=30, chunk_size=MB, session=None):
+        self.segments = segments
+        self.min_segment_size = min_segment_size
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.request_timeout = (connect_timeout, read_timeout)
+        self.chunk_size = chunk_size
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(segments * 4, 10))
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+        self._stats_lock = threading.Lock()
+        self.downloads = 0
+        self.failures = 0
+        self.bytes_downloaded = 0
+        self.bytes_resumed = 0
+        self.seconds = 0.0
+        self.last_throughput = 0.0
+
+    def download(self, url, dest_path, headers=None, on_size=None):
+        """
+        Baixa url para dest_path.
+        headers pode conter If-None-Match/If-Modified-Since; nesse caso um
+        resultado com status 304 indica que o arquivo local continua válido.
+        on_size(bytes) é chamado com o tamanho do vídeo antes de gravar o arquivo
+        (ou, sem Content-Length, com os bytes recebidos até cada pedaço ser
+        gravado); uma exceção levantada por ele interrompe o download.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        try:
+            # Sonda com o primeiro byte: descobre o tamanho e se o servidor aceita Range
+            probe_headers = dict(headers or {})
+            probe_headers['Range'] = 'bytes=0-0'
+            response = self.session.get(url, headers=probe_headers, stream=True, timeout=self.request_timeout)
+            try:
+                if response.status_code == 304:
+                    return self._result(304, dest_path, response, 0, 0, start)
+                if response.status_code == 200:
+                    # Servidor ignorou o Range: baixa tudo em um único stream
+                    length = self._check_size(response.headers.get('Content-Length'))
+                    if length is not None and on_size:
+                        on_size(length)
+                    written = self._stream_whole(response, dest_path, deadline, None if length else on_size)
+                    return self._result(200, dest_path, response, written, 0, start)
+                if response.status_code != 206:
+                    raise DownloadError(f"Video download failed with status code {response.status_code}")
+
+                size = self._check_size(response.headers.get('Content-Range', '').rpartition('/')[2])
+                if size is None:
+                    raise DownloadError("Server did not report the video size")
+                if on_size:
+                    on_size(size)
+                validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            finally:
+                response.close()
+
+            written, resumed = self._download_ranges(url, dest_path, size, validator, deadline)
+            return self._result(200, dest_path, response, written, resumed, start)
+
+        except Exception:
+            with self._stats_lock:
+                self.failures += 1
+            raise
+
+    def _check_size(self, value):
+        if not value or not value.isdigit():
+            return None
+        size = int(value)
+        if size == 0:
+            raise DownloadError("Video download returned an empty file")
+        if self.max_bytes and size > self.max_bytes:
+            raise DownloadError(f"Video is too large ({size} bytes, limit {self.max_bytes})")
+        return size
+
+    def _stream_whole(self, response, dest_path, deadline, on_size=None):
+        written = 0
+        part_path = dest_path + '.part'
+        with open(part_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if not chunk:
+                    continue
+                written += len(chunk)
+                if self.max_bytes and written > self.max_bytes:
+                    raise DownloadError(f"Video is too large (limit {self.max_bytes} bytes)")
+                if time.monotonic() > deadline:
+                    raise DownloadError(f"Video download timeout after {self.timeout}s")
+                if on_size:
+                    on_size(written)
+                f.write(chunk)
+        if written == 0:
+            raise DownloadError("Video download returned an empty file")
+        os.replace(part_path, dest_path)
+        return written
+
+    def _plan(self, size):
+        """Divide o arquivo em segmentos [início, fim] (fim inclusivo)"""
+        count = max(1, min(self.segments, size // self.min_segment_size))
+        step = -(-size // count)
+        return [[offset, min(offset + step, size) - 1, 0] for offset in range(0, size, step)]
+
+    def _download_ranges(self, url, dest_path, size, validator, deadline):
+        part_path = dest_path + '.part'
+        state_path = dest_path + '.part.json'
+
+        # Retoma o download anterior se for o mesmo arquivo remoto
+        state = None
+        try:
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+            if state['url'] != url or state['size'] != size or state['validator'] != validator \
+                    or os.path.getsize(part_path) != size:
+                state = None
+        except (OSError, ValueError, KeyError):
+            state = None
+
+        if state is None:
+            state = {'url': url, 'size': size, 'validator': validator, 'segments': self._plan(size)}
+            with open(part_path, 'wb') as f:
+                f.truncate(size)
+        resumed = sum(segment[2] for segment in state['segments'])
+
+        state_lock = threading.Lock()
+
+        def save_state():
+            with open(state_path + '.tmp', 'w') as f:
+                json.dump(state, f)
+            os.replace(state_path + '.tmp', state_path)
+
+        fd = os.open(part_path, os.O_RDWR)
+        try:
+            def fetch(segment):
+                start, end, done = segment
+                if start + done > end:
+                    return
+                headers = {'Range': f'bytes={start + done}-{end}'}
+                if validator:
+                    headers['If-Range'] = validator
+                response = self.session.get(url, headers=headers, stream=True, timeout=self.request_timeout)
+                try:
+                    if response.status_code != 206:
+                        raise DownloadError(f"Range request failed with status code {response.status_code}")
+                    unsaved = 0
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if not chunk:
+                            continue
+                        if time.monotonic() > deadline:
+                            raise DownloadError(f"Video download timeout after {self.timeout}s")
+                        os.pwrite(fd, chunk, start + segment[2])
+                        segment[2] += len(chunk)
+                        unsaved += len(chunk)
+                        if unsaved >= 8 * self.chunk_size:
+                            with state_lock:
+                                save_state()
+                            unsaved = 0
+                finally:
+                    response.close()
+                    with state_lock:
+                        save_state()
+
+            with ThreadPoolExecutor(max_workers=len(state['segments'])) as executor:
+                for future in [executor.submit(fetch, segment) for segment in state['segments']]:
+                    future.result()
+        finally:
+            os.close(fd)
+
+        missing = [s for s in state['segments'] if s[0] + s[2] <= s[1]]
+        if missing:
+            raise DownloadError("Video download ended before all segments were received")
+
+        os.replace(part_path, dest_path)
+        try:
+            os.unlink(state_path)
+        except OSError:
+            pass
+        return size - resumed, resumed
+
+    def _result(self, status, dest_path, response, written, resumed, start):
+        elapsed = time.monotonic() - start
+        throughput = written / elapsed if elapsed > 0 else 0.0
+        with self._stats_lock:
+            if status == 200:
+                self.downloads += 1
+                self.bytes_downloaded += written
+                self.bytes_resumed += resumed
+                self.seconds += elapsed
+                self.last_throughput = throughput
+        return {
+            'status': status,
+            'path': dest_path if status == 200 else None,
+            'bytes': written,
+            'resumed_bytes': resumed,
+            'seconds': elapsed,
+            'throughput': throughput,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'downloads': self.downloads,
+                'failures': self.failures,
+                'bytes': self.bytes_downloaded,
+                'resumed_bytes': self.bytes_resumed,
+                'avg_throughput': self.bytes_downloaded / self.seconds if self.seconds else 0.0,
+                'last_throughput': self.last_throughput
+            }
@@ -0,0 +1,125 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import threading
+import time
+from undetected_chromedriver import Patcher
+
+# Marca que o undetected_chromedriver grava no binário patcheado
+PATCHED_MARKER = b'undetected chromedriver'
+
+_lock = threading.Lock()
+_cached = {'path': None, 'sha256': None, 'stat': None}
+_stats = {'path': None, 'sha256': None, 'built': False, 'prepare_seconds': None, 'verifications': 0, 'mismatches': 0}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_patched(path):
+    with open(path, 'rb') as f:
+        return f.read().find(PATCHED_MARKER) != -1
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def _read_checksum(path):
+    try:
+        with open(path + '.sha256') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _build(path, version_main, source=None):
+    """Baixa (ou copia de source) o chromedriver, aplica o patch e grava em path como somente leitura"""
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+    if source:
+        shutil.copyfile(source, tmp_path)
+    else:
+        patcher = Patcher(version_main=version_main)
+        patcher.auto()
+        # Impede o patcher de apagar o binário ao ser coletado
+        patcher._custom_exe_path = True
+        shutil.move(patcher.executable_path, tmp_path)
+    os.chmod(tmp_path, 0o755)
+
+    # Com um caminho próprio o patcher só aplica o patch no arquivo (sem download)
+    Patcher(executable_path=tmp_path, version_main=version_main).auto()
+    if not _is_patched(tmp_path):
+        raise RuntimeError("Failed to patch chromedriver binary")
+    os.chmod(tmp_path, 0o555)
+    os.replace(tmp_path, path)
+
+
+def prepare_driver(cache_dir, version_main, source=None):
+    """
+    Prepara uma única vez o chromedriver patcheado e retorna o caminho.
+    O binário fica em cache_dir com o sha256 ao lado; um binário já existente
+    só é reaproveitado se o checksum bater. source usa um chromedriver local
+    (ex: o do pacote do sistema) em vez de baixar.
+    """
+    started = time.monotonic()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'chromedriver_{version_main}')
+    with _lock, open(os.path.join(cache_dir, '.lock'), 'w') as lock_file:
+        # Outros processos (ex: workers da API) esperam o primeiro terminar
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        checksum = _read_checksum(path)
+        built = False
+        if not (checksum and os.path.exists(path) and file_sha256(path) == checksum):
+            if checksum:
+                print("⚠️ Checksum do chromedriver em cache não confere, recriando")
+                _stats['mismatches'] += 1
+            _build(path, version_main, source)
+            checksum = file_sha256(path)
+            with open(path + '.sha256', 'w') as f:
+                f.write(checksum)
+            built = True
+
+        _cached.update(path=path, sha256=checksum, stat=_stat_key(path))
+        _stats.update(path=path, sha256=checksum, built=built,
+                      prepare_seconds=round(time.monotonic() - started, 3))
+    print(f"✅ Chromedriver {'patcheado' if built else 'em cache'} pronto ({path})")
+    return path
+
+
+def cached_path():
+    """
+    Caminho do chromedriver preparado, ou None (o undetected_chromedriver
+    patcheia o próprio binário). Se o arquivo mudou desde a verificação, o
+    checksum é conferido de novo antes de ser usado.
+    """
+    with _lock:
+        path = _cached['path']
+        if not path:
+            return None
+        try:
+            stat = _stat_key(path)
+            if stat != _cached['stat']:
+                _stats['verifications'] += 1
+                if file_sha256(path) != _cached['sha256']:
+                    raise ValueError("checksum mismatch")
+                _cached['stat'] = stat
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Chromedriver em cache inválido ({e}), usando o patch padrão")
+            _stats['mismatches'] += 1
+            _cached['path'] = None
+            return None
+        return path
+
+
+def driver_cache_stats():
+    with _lock:
+        return dict(_stats, active=_cached['path'] is not None)
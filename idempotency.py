@@ -0,0 +1,117 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class IdempotencyConflict(Exception):
+    """A mesma Idempotency-Key foi reutilizada com outro conteúdo"""
+
+
+class _Entry:
+    def __init__(self, fingerprint):
+        self.future = Future()
+        self.fingerprint = fingerprint
+        self.expires_at = None  # definido quando o resultado fica pronto
+
+
+def derive_key(*parts):
+    """Chave estável a partir dos campos da requisição (o session_id nunca aparece em claro)"""
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Resultados por chave de idempotência. A primeira requisição com uma chave
+    executa a postagem; duplicatas que chegam enquanto ela roda esperam o
+    mesmo resultado e as que chegam depois recebem o resultado guardado por
+    até ttl segundos, sem abrir o navegador. Falhas não ficam guardadas (o
+    cliente pode tentar de novo), exceto as que cache_error aceitar, como uma
+    publicação sem confirmação, que repetida poderia duplicar o post.
+    """
+
+    def __init__(self, ttl=24 * 60 * 60, max_entries=10000, cache_error=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_error = cache_error or (lambda error: False)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.executed = 0
+        self.joined = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    def _prune(self):
+        """Remove resultados expirados e os mais antigos acima de max_entries (chamar com o lock)"""
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items()
+                    if entry.expires_at is not None and entry.expires_at <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            key, entry = next(iter(self._entries.items()))
+            if not entry.future.done():
+                break
+            del self._entries[key]
+
+    def run(self, key, func, fingerprint=None):
+        """
+        Executa func() uma única vez por chave dentro do TTL.
+        Retorna (resultado, origem) com origem 'executed', 'joined' (esperou a
+        execução em andamento) ou 'replayed' (resultado guardado). Uma falha
+        guardada é levantada de novo para as duplicatas.
+        """
+        with self._lock:
+            self._prune()
+            entry = self._entries.get(key)
+            if entry is not None and fingerprint and entry.fingerprint and entry.fingerprint != fingerprint:
+                self.conflicts += 1
+                raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+            if entry is None:
+                entry = self._entries[key] = _Entry(fingerprint)
+                self.executed += 1
+                origin = 'executed'
+            elif entry.future.done():
+                self.replayed += 1
+                origin = 'replayed'
+            else:
+                self.joined += 1
+                origin = 'joined'
+
+        if origin != 'executed':
+            return entry.future.result(), origin
+
+        try:
+            result = func()
+        except BaseException as e:
+            with self._lock:
+                if isinstance(e, Exception) and self.cache_error(e):
+                    entry.expires_at = time.monotonic() + self.ttl
+                else:
+                    self._entries.pop(key, None)
+            if isinstance(e, Exception):
+                entry.future.set_exception(e)
+            else:
+                # KeyboardInterrupt, SystemExit, greenlet morto...: as duplicatas que
+                # esperavam recebem um erro comum em vez de ficarem presas para sempre
+                interrupted = RuntimeError(f"Request was interrupted ({type(e).__name__})")
+                interrupted.__cause__ = e
+                entry.future.set_exception(interrupted)
+            raise
+        with self._lock:
+            entry.expires_at = time.monotonic() + self.ttl
+        entry.future.set_result(result)
+        return result, origin
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'in_flight': sum(1 for entry in self._entries.values() if not entry.future.done()),
+                'executed': self.executed,
+                'joined': self.joined,
+                'replayed': self.replayed,
+                'conflicts': self.conflicts,
+                'ttl': self.ttl
+            }
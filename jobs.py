@@ -0,0 +1,114 @@
+import threading
+import time
+import uuid
+import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """Uma postagem enfileirada e o seu resultado"""
+
+    def __init__(self, params, callback_url=None, handler=None):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.handler = handler
+        self.callback_url = callback_url
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Bloqueia até o job terminar (ou até o timeout); retorna True se terminou"""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobQueue:
+    """
+    Fila de postagens executadas por um pool de workers.
+    handler(params) roda no worker e deve retornar um dict com o resultado
+    ou levantar uma exceção em caso de falha.
+    """
+
+    def __init__(self, handler, workers=2, max_finished=1000, callback_timeout=10):
+        self.handler = handler
+        self.max_finished = max_finished
+        self.callback_timeout = callback_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-worker')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, params, callback_url=None, handler=None):
+        """
+        Enfileira uma postagem e retorna o Job imediatamente.
+        handler sobrescreve o handler padrão da fila (ex: postagem em lote).
+        """
+        job = Job(params, callback_url, handler or self.handler)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = job.handler(job.params)
+            job.status = 'succeeded'
+        except Exception as e:
+            job.error = {'error': type(e).__name__, 'message': str(e)}
+            job.status = 'failed'
+            print(f"❌ Job {job.id} falhou: {e}")
+        finally:
+            job.finished_at = time.time()
+            job._done.set()
+
+        if job.callback_url:
+            self._notify(job)
+
+    def _notify(self, job):
+        """Envia o resultado do job para o webhook informado pelo cliente"""
+        try:
+            requests.post(job.callback_url, json=job.to_dict(), timeout=self.callback_timeout)
+        except Exception as e:
+            print(f"⚠️ Erro ao chamar callback do job {job.id}: {e}")
+
+    def _prune(self):
+        """Descarta os jobs finalizados mais antigos para limitar a memória"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,157 @@
+import threading
+import time
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from resolution_cache import ResolutionCache
+
+# Avalia todas as estratégias de um locator numa única ida ao navegador e
+# retorna [índice da primeira estratégia que encontrou, elemento(s)] ou null
+LOCATE_JS = """
+var strategies = arguments[0], condition = arguments[1], all = arguments[2];
+function ready(el) {
+    if (condition === 'present') return true;
+    if (!el.getClientRects().length || getComputedStyle(el).visibility === 'hidden') return false;
+    return condition !== 'clickable' || !(el.disabled || el.getAttribute('aria-disabled') === 'true');
+}
+for (var i = 0; i < strategies.length; i++) {
+    var found = [];
+    try {
+        if (strategies[i][0] === 'xpath') {
+            var result = document.evaluate(strategies[i][1], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            for (var j = 0; j < result.snapshotLength; j++) found.push(result.snapshotItem(j));
+        } else {
+            found = Array.prototype.slice.call(document.querySelectorAll(strategies[i][1]));
+        }
+    } catch (e) {
+        continue;
+    }
+    found = found.filter(ready);
+    if (found.length) return [i, all ? found : found[0]];
+}
+return null;
+"""
+
+
+class Locator:
+    """
+    Um alvo da interface com a sua cadeia de estratégias, em ordem de preferência.
+    strategies: lista de (rótulo, 'css' ou 'xpath', seletor), ex:
+    ('aria', 'css', 'div[role="combobox"]'). condition: 'present', 'visible' ou 'clickable'.
+    """
+
+    def __init__(self, name, strategies, condition='present'):
+        self.name = name
+        self.strategies = strategies
+        self.condition = condition
+
+
+class LocatorRegistry:
+    """
+    Registro de locators nomeados. Todas as estratégias de um locator são
+    testadas juntas a cada verificação (um único execute_script), então um
+    seletor quebrado não gasta o timeout inteiro antes do próximo ser tentado.
+    A estratégia vencedora é memorizada e passa a ser testada primeiro; as
+    estatísticas por locator mostram quando a interface muda (vencedora fora
+    da primeira posição da cadeia ou troca da vencedora memorizada).
+    """
+
+    def __init__(self, locators, timeout=5, poll_interval=0.1, memo=None):
+        self.locators = {locator.name: locator for locator in locators}
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.memo = memo or ResolutionCache('locators')
+        self._stats = {name: self._new_stats() for name in self.locators}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_stats():
+        return {'lookups': 0, 'found': 0, 'timeouts': 0, 'memo_hits': 0, 'memo_changes': 0,
+                'fallbacks': 0, 'seconds': 0.0, 'winner': None, 'strategies': {}}
+
+    def _ordered(self, locator):
+        """Estratégias do locator com a vencedora memorizada na frente"""
+        winner = self.memo.get(locator.name)
+        strategies = list(locator.strategies)
+        for index, strategy in enumerate(strategies):
+            if strategy[0] == winner:
+                strategies.insert(0, strategies.pop(index))
+                break
+        return strategies, winner
+
+    def _locate(self, driver, locator, strategies, condition, find_all):
+        try:
+            found = driver.execute_script(LOCATE_JS, [[kind, selector] for _, kind, selector in strategies],
+                                          condition, find_all)
+        except WebDriverException:
+            # Página ainda trocando de contexto (navegação em andamento)
+            return None
+        if not found:
+            return None
+        return strategies[found[0]][0], found[1]
+
+    def _record(self, locator, winner, memorized, elapsed):
+        with self._lock:
+            stats = self._stats[locator.name]
+            stats['lookups'] += 1
+            stats['seconds'] += elapsed
+            if winner is None:
+                stats['timeouts'] += 1
+                return
+            stats['found'] += 1
+            stats['winner'] = winner
+            stats['strategies'][winner] = stats['strategies'].get(winner, 0) + 1
+            if winner != locator.strategies[0][0]:
+                stats['fallbacks'] += 1
+            if winner == memorized:
+                stats['memo_hits'] += 1
+            elif memorized is not None:
+                stats['memo_changes'] += 1
+                print(f"⚠️ Locator {locator.name}: estratégia {memorized} deixou de funcionar, usando {winner}")
+        if winner != memorized:
+            self.memo.put(locator.name, winner)
+
+    def find(self, driver, name, timeout=None, condition=None, find_all=False):
+        """
+        Retorna o elemento (ou a lista de elementos com find_all=True) da
+        primeira estratégia que encontrar algo; levanta TimeoutException.
+        """
+        locator = self.locators[name]
+        condition = condition or locator.condition
+        strategies, memorized = self._ordered(locator)
+        start = time.monotonic()
+        deadline = start + (self.timeout if timeout is None else timeout)
+        while True:
+            found = self._locate(driver, locator, strategies, condition, find_all)
+            if found:
+                self._record(locator, found[0], memorized, time.monotonic() - start)
+                return found[1]
+            if time.monotonic() >= deadline:
+                self._record(locator, None, memorized, time.monotonic() - start)
+                raise TimeoutException(f"Locator '{name}' not found ({condition})")
+            time.sleep(self.poll_interval)
+
+    def predicate(self, driver, name, condition=None):
+        """Predicado para o WaitEngine (esperas longas, ex: o vídeo carregar)"""
+        locator = self.locators[name]
+        condition = condition or locator.condition
+        strategies, memorized = self._ordered(locator)
+        start = time.monotonic()
+        recorded = []
+
+        def predicate():
+            found = self._locate(driver, locator, strategies, condition, False)
+            if not found:
+                return None
+            # O WaitEngine pode chamar o predicado de novo até o tempo mínimo da espera
+            if not recorded:
+                recorded.append(found[0])
+                self._record(locator, found[0], memorized, time.monotonic() - start)
+            return found[1]
+        return predicate
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: dict(stats, strategies=dict(stats['strategies']),
+                           avg_seconds=stats['seconds'] / stats['lookups'] if stats['lookups'] else 0.0)
+                for name, stats in self._stats.items()
+            }
@@ -0,0 +1,173 @@
+import threading
+import time
+import tracing
+from functools import wraps
+
+# Buckets em segundos, cobrindo desde cliques (~0.1s) até uploads longos
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), func=None):
+        """func: callable opcional avaliado no momento da coleta (retorna o valor atual)"""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.func = func
+        self._values = {}
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self):
+        if self.func:
+            return [(self.name, '', self.func())]
+        with _lock:
+            return [(self.name, _format_labels(self.labelnames, key), value)
+                    for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for name, labels, value in self.samples():
+            lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['counts'][i] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def samples(self):
+        samples = []
+        with _lock:
+            for key, entry in self._values.items():
+                for bound, count in zip(self.buckets, entry['counts']):
+                    labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                    samples.append((f'{self.name}_bucket', labels, count))
+                labels = _format_labels(self.labelnames, key)
+                samples.append((f'{self.name}_sum', labels, entry['sum']))
+                samples.append((f'{self.name}_count', labels, entry['count']))
+        return samples
+
+
+def render():
+    """Gera o texto no formato de exposição do Prometheus"""
+    with _lock:
+        metrics = list(_registry)
+    return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+PHASE_SECONDS = Histogram('tiktok_bot_phase_seconds', 'Duração de cada fase do TikTokBot', ['phase'])
+PHASE_TOTAL = Counter('tiktok_bot_phase_total', 'Execuções de cada fase do TikTokBot por resultado', ['phase', 'outcome'])
+
+
+class timed_phase:
+    """
+    Mede uma fase do bot, como decorator ou context manager.
+    Como decorator, um retorno False/None conta como falha; como context
+    manager, só exceções (ou uma chamada a fail()) contam como falha.
+    Dentro de um trace, cada fase também vira um span.
+    """
+
+    def __init__(self, phase):
+        self.phase = phase
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+        self.span.fail()
+
+    def __enter__(self):
+        self.failed = False
+        self._scope = tracing.span(self.phase)
+        self.span = self._scope.__enter__()
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._record(time.monotonic() - self._start, exc_type is None and not self.failed)
+        self._scope.__exit__(exc_type, exc, tb)
+        return False
+
+    def _record(self, elapsed, success):
+        PHASE_SECONDS.observe(elapsed, phase=self.phase)
+        PHASE_TOTAL.inc(phase=self.phase, outcome='success' if success else 'failure')
+
+    def __call__(self, func):
+        phase = self
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracing.span(phase.phase) as span:
+                start = time.monotonic()
+                success = False
+                try:
+                    result = func(*args, **kwargs)
+                    success = result is not None and result is not False
+                    return result
+                finally:
+                    phase._record(time.monotonic() - start, success)
+                    if not success:
+                        span.fail()
+        return wrapper
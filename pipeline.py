@@ -0,0 +1,139 @@
+import contextlib
+import random
+import time
+import tracing
+
+
+class StepFailed(Exception):
+    """Um passo esgotou as tentativas; checkpoint é o último passo concluído"""
+
+    def __init__(self, step, attempts, reason=None, checkpoint=None):
+        message = f"Step '{step}' failed after {attempts} attempt(s)"
+        if reason:
+            message += f": {reason}"
+        super().__init__(message)
+        self.step = step
+        self.attempts = attempts
+        self.reason = reason
+        self.checkpoint = checkpoint
+
+
+class Rewind(Exception):
+    """Levantada por um passo para retomar de um checkpoint anterior (ex: login expirou)"""
+
+    def __init__(self, step, reason=''):
+        super().__init__(reason)
+        self.step = step
+
+
+class Abort(Exception):
+    """Falha que não deve ser repetida (ex: publicação sem confirmação, que poderia duplicar o post)"""
+
+
+class Step:
+    """
+    Um passo do fluxo de postagem.
+    func() retorna um valor verdadeiro em caso de sucesso; retries é quantas
+    vezes o passo pode ser repetido e required=False deixa o fluxo seguir
+    mesmo que o passo esgote as tentativas (ex: música). deadline é o
+    tempo máximo de uma tentativa, vigiado pelo watchdog.
+    """
+
+    def __init__(self, name, func, retries=2, required=True, deadline=None):
+        self.name = name
+        self.func = func
+        self.retries = retries
+        self.required = required
+        self.deadline = deadline
+
+
+class Pipeline:
+    """
+    Executa os passos em ordem registrando um checkpoint a cada passo
+    concluído. Uma falha repete só o passo que falhou (no mesmo navegador),
+    com backoff exponencial e orçamento de tentativas por passo, em vez de
+    recomeçar a postagem inteira. Passos refeitos por causa de um Rewind só
+    gastam o orçamento deles se falharem (o Rewind é cobrado de quem o
+    levantou). Com um watch (watchdog.Watch), cada
+    tentativa roda dentro do prazo do passo e um prazo estourado encerra o
+    fluxo sem novas tentativas (o driver já foi abortado).
+    """
+
+    def __init__(self, steps, initial_delay=1, max_delay=15, watch=None):
+        self.steps = steps
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.watch = watch
+        self.checkpoint = None
+        self.attempts = {}
+        self.history = []  # (passo, tentativa, sucesso, segundos, erro)
+
+    def _index(self, name):
+        for index, step in enumerate(self.steps):
+            if step.name == name:
+                return index
+        raise ValueError(f"Unknown step '{name}'")
+
+    def _phase(self, step):
+        if self.watch is None:
+            return contextlib.nullcontext()
+        return self.watch.phase(step.name, step.deadline)
+
+    def run(self):
+        index = 0
+        replaying = set()  # passos refeitos por causa de um Rewind
+        while index < len(self.steps):
+            step = self.steps[index]
+            if self.watch is not None and self.watch.expired:
+                raise StepFailed(step.name, self.attempts.get(step.name, 0), self.watch.expired, self.checkpoint)
+            attempt = self.attempts.get(step.name, 0) + 1
+            self.attempts[step.name] = attempt
+            resume_at = index
+            started = time.monotonic()
+            with tracing.span(f'step.{step.name}', attempt=attempt) as span, self._phase(step):
+                try:
+                    ok, error = bool(step.func()), None
+                    if not ok:
+                        error = "step returned failure"
+                except Rewind as e:
+                    ok, error = False, str(e) or f"rewind to {e.step}"
+                    resume_at = self._index(e.step)
+                    replaying.update(s.name for s in self.steps[resume_at:index])
+                    span.set(rewind_to=e.step)
+                except Abort as e:
+                    span.fail(e)
+                    self.history.append((step.name, attempt, False, time.monotonic() - started, str(e)))
+                    raise StepFailed(step.name, attempt, str(e), self.checkpoint)
+                except Exception as e:
+                    ok, error = False, str(e)
+                if not ok:
+                    span.fail(error)
+            self.history.append((step.name, attempt, ok, time.monotonic() - started, error))
+
+            if not ok and self.watch is not None and self.watch.expired:
+                raise StepFailed(step.name, attempt, self.watch.expired, self.checkpoint)
+
+            if step.name in replaying:
+                replaying.discard(step.name)
+                if ok:
+                    # Refazer o passo não foi culpa dele: devolve a tentativa ao orçamento
+                    self.attempts[step.name] = attempt - 1
+
+            if ok:
+                self.checkpoint = step.name
+                index += 1
+                continue
+
+            if attempt > step.retries:
+                if not step.required:
+                    print(f"⚠️ Passo {step.name} ignorado após {attempt} tentativa(s): {error}")
+                    index += 1
+                    continue
+                raise StepFailed(step.name, attempt, error, self.checkpoint)
+
+            delay = min(self.initial_delay * (2 ** (attempt - 1)) + random.uniform(0, 1), self.max_delay)
+            index = resume_at
+            self.checkpoint = self.steps[index - 1].name if index > 0 else None
+            print(f"⚠️ Passo {step.name} falhou (tentativa {attempt}): {error}. "
+                  f"Retomando de {self.steps[index].name} em {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,349 @@
+import mmap
+import os
+import struct
+import threading
+import time
+import requests
+
+MB = 1024 * 1024
+
+# Limites de upload do TikTok verificados antes de abrir o navegador
+DEFAULT_LIMITS = {
+    'min_bytes': 1024,
+    'max_bytes': 4096 * MB,
+    'min_duration': 1,
+    'max_duration': 60 * 60,
+    'min_side': 360,
+    'max_side': 4096,
+    'video_codecs': ['avc1', 'avc3', 'hvc1', 'hev1']
+}
+
+_limits = dict(DEFAULT_LIMITS)
+
+# Caixas que contêm outras caixas no caminho até o stsd
+_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+# Bytes lidos do início do arquivo remoto e tamanho máximo aceito para o moov
+HEAD_BYTES = 256 * 1024
+MAX_MOOV_BYTES = 64 * MB
+MAX_HOPS = 16
+
+# Tentativas de cada leitura remota em falhas de conexão e respostas 5xx
+READ_ATTEMPTS = 2
+
+_stats = {'probed': 0, 'passed': 0, 'rejected': 0, 'faststart': 0, 'seconds': 0.0, 'reasons': {}}
+_stats_lock = threading.Lock()
+
+
+# Falhas da origem do vídeo (e não do vídeo em si): o cliente pode tentar de novo
+TRANSIENT_REASONS = {'unreachable', 'upstream'}
+
+
+class PreflightError(Exception):
+    """O vídeo não é um MP4 aceito pelo TikTok; a postagem não deve nem começar"""
+
+    def __init__(self, message, reason='invalid'):
+        super().__init__(message)
+        self.reason = reason
+
+    @property
+    def transient(self):
+        """A origem do vídeo falhou (sem conexão ou 5xx); o vídeo pode ser válido"""
+        return self.reason in TRANSIENT_REASONS
+
+
+def configure_limits(overrides):
+    """Sobrescreve os limites padrão, ex: {'max_duration': 600}"""
+    _limits.update(overrides)
+
+
+def _record(outcome, seconds, reason=None, faststart=False):
+    with _stats_lock:
+        _stats['probed'] += 1
+        _stats[outcome] += 1
+        _stats['seconds'] += seconds
+        if faststart:
+            _stats['faststart'] += 1
+        if reason:
+            _stats['reasons'][reason] = _stats['reasons'].get(reason, 0) + 1
+
+
+def preflight_stats():
+    with _stats_lock:
+        stats = dict(_stats, reasons=dict(_stats['reasons']))
+    stats['avg_seconds'] = stats['seconds'] / stats['probed'] if stats['probed'] else 0.0
+    return stats
+
+
+# Parser de MP4 -------------------------------------------------------------
+
+def _box_header(buf, offset, end):
+    """Lê o cabeçalho da caixa em offset; retorna (tipo, início do conteúdo, fim da caixa) ou None"""
+    if offset + 8 > end:
+        return None
+    size, box_type = struct.unpack_from('>I4s', buf, offset)
+    payload = offset + 8
+    if size == 1:
+        if offset + 16 > end:
+            return None
+        size = struct.unpack_from('>Q', buf, payload)[0]
+        payload += 8
+    elif size == 0:
+        size = end - offset
+    if size < payload - offset:
+        raise PreflightError("Corrupted MP4 box header", 'corrupted')
+    return box_type, payload, offset + size
+
+
+def _iter_boxes(buf, start, end):
+    offset = start
+    while offset < end:
+        header = _box_header(buf, offset, end)
+        if not header:
+            return
+        yield header
+        offset = header[2]
+
+
+def _parse_moov(buf, start, end, info):
+    """Extrai duração, resolução e codecs de um moov inteiro presente em buf[start:end]"""
+    for box_type, payload, box_end in _iter_boxes(buf, start, min(end, len(buf))):
+        if box_type == b'mvhd':
+            version = buf[payload]
+            if version == 1:
+                timescale, duration = struct.unpack_from('>IQ', buf, payload + 20)
+            else:
+                timescale, duration = struct.unpack_from('>II', buf, payload + 12)
+            if timescale:
+                info['duration'] = duration / timescale
+        elif box_type == b'trak':
+            _parse_track(buf, payload, box_end, info)
+    return info
+
+
+def _parse_track(buf, start, end, info):
+    track = {}
+
+    def walk(box_start, box_end):
+        for box_type, payload, child_end in _iter_boxes(buf, box_start, box_end):
+            if box_type in _CONTAINERS:
+                walk(payload, child_end)
+            elif box_type == b'tkhd':
+                offset = payload + (88 if buf[payload] == 1 else 76)
+                width, height = struct.unpack_from('>II', buf, offset)
+                track['size'] = (width >> 16, height >> 16)
+            elif box_type == b'hdlr':
+                track['handler'] = bytes(buf[payload + 8:payload + 12])
+            elif box_type == b'stsd' and payload + 16 <= child_end:
+                track['codec'] = bytes(buf[payload + 12:payload + 16]).decode('latin-1')
+                if payload + 44 <= child_end:
+                    track['entry_size'] = struct.unpack_from('>HH', buf, payload + 40)
+
+    walk(start, end)
+    if track.get('handler') == b'vide' and not info['video_codec']:
+        width, height = track.get('size') or (0, 0)
+        if not width or not height:
+            width, height = track.get('entry_size') or (0, 0)
+        info.update(video_codec=track.get('codec'), width=width, height=height)
+    elif track.get('handler') == b'soun' and not info['audio_codec']:
+        info['audio_codec'] = track.get('codec')
+
+
+def _new_info(size):
+    return {'size': size, 'brand': None, 'faststart': False, 'duration': None,
+            'width': None, 'height': None, 'video_codec': None, 'audio_codec': None}
+
+
+def inspect_file(path):
+    """Lê os cabeçalhos de um MP4 local via mmap (só as páginas das caixas são tocadas)"""
+    size = os.path.getsize(path)
+    info = _new_info(size)
+    if size == 0:
+        return info
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        mdat_seen = False
+        for box_type, payload, box_end in _iter_boxes(buf, 0, size):
+            if box_type == b'ftyp':
+                info['brand'] = bytes(buf[payload:payload + 4]).decode('latin-1')
+            elif box_type == b'mdat':
+                mdat_seen = True
+            elif box_type == b'moov':
+                info['faststart'] = not mdat_seen
+                _parse_moov(buf, payload, box_end, info)
+    return info
+
+
+def validate(info, limits=None, partial=False):
+    """
+    Levanta PreflightError se o vídeo violar os limites do TikTok.
+    partial=True verifica só tamanho e container (moov ainda não lido).
+    """
+    limits = limits or _limits
+    if info['size'] is not None and info['size'] < limits['min_bytes']:
+        raise PreflightError(f"Video is too small ({info['size']} bytes)", 'too_small')
+    if info['size'] is not None and info['size'] > limits['max_bytes']:
+        raise PreflightError(f"Video is too large ({info['size'] / MB:.0f} MB)", 'too_large')
+    if not info['brand']:
+        raise PreflightError("Not an MP4/MOV file (no ftyp box)", 'not_mp4')
+    if partial:
+        return info
+    if info['duration'] is None:
+        raise PreflightError("MP4 has no readable moov box", 'no_moov')
+    if not limits['min_duration'] <= info['duration'] <= limits['max_duration']:
+        raise PreflightError(f"Video duration {info['duration']:.1f}s is outside "
+                             f"{limits['min_duration']}-{limits['max_duration']}s", 'duration')
+    if not info['video_codec']:
+        raise PreflightError("MP4 has no video track", 'no_video')
+    if info['video_codec'] not in limits['video_codecs']:
+        raise PreflightError(f"Unsupported video codec '{info['video_codec']}'", 'codec')
+    if info['width'] and info['height']:
+        if min(info['width'], info['height']) < limits['min_side'] or \
+                max(info['width'], info['height']) > limits['max_side']:
+            raise PreflightError(f"Unsupported resolution {info['width']}x{info['height']}", 'resolution')
+    return info
+
+
+def check_file(path):
+    """Valida um vídeo já baixado; retorna as informações do MP4"""
+    try:
+        return validate(inspect_file(path))
+    except (struct.error, ValueError) as e:
+        raise PreflightError(f"Corrupted MP4: {e}", 'corrupted')
+
+
+# Sondagem remota -----------------------------------------------------------
+
+class _RemoteFile:
+    """Lê trechos de um arquivo remoto com requisições Range"""
+
+    def __init__(self, url, session, timeout):
+        self.url = url
+        self.session = session
+        self.timeout = timeout
+        self.size = None
+
+    def read(self, start, length):
+        """
+        Retorna (bytes, ranged); ranged=False quando o servidor ignora o Range.
+        Falhas de conexão e respostas 5xx são repetidas uma vez e depois recusadas.
+        """
+        for attempt in range(1, READ_ATTEMPTS + 1):
+            try:
+                return self._read(start, length)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt == READ_ATTEMPTS:
+                    raise PreflightError(f"Video URL is unreachable: {e}", 'unreachable')
+            except requests.HTTPError as e:
+                if attempt == READ_ATTEMPTS:
+                    raise PreflightError(f"Video URL returned HTTP {e.response.status_code}", 'upstream')
+            except requests.RequestException as e:
+                # URL malformada, esquema não suportado...: repetir não adianta
+                raise PreflightError(f"Invalid video URL: {e}", 'bad_url')
+
+    def _read(self, start, length):
+        response = self.session.get(self.url, headers={'Range': f'bytes={start}-{start + length - 1}'},
+                                    stream=True, timeout=self.timeout)
+        try:
+            status = response.status_code
+            if status == 416 and start == 0:
+                raise PreflightError("Video is empty", 'too_small')
+            if 400 <= status < 500:
+                raise PreflightError(f"Video URL returned HTTP {status}", 'http')
+            response.raise_for_status()
+
+            content_type = response.headers.get('Content-Type', '').lower()
+            if content_type.startswith('text/'):
+                raise PreflightError(f"Video URL returned {content_type} instead of a video", 'html')
+
+            if status == 206:
+                content = response.content
+                content_range = response.headers.get('Content-Range', '')
+                if '/' in content_range and content_range.rsplit('/', 1)[1].isdigit():
+                    self.size = int(content_range.rsplit('/', 1)[1])
+                ranged = True
+            else:
+                # Servidor sem suporte a Range: lê só o início do corpo e fecha a conexão
+                content = b''
+                for chunk in response.iter_content(64 * 1024):
+                    content += chunk
+                    if len(content) >= start + length:
+                        break
+                content = content[start:start + length]
+                length_header = response.headers.get('Content-Length')
+                self.size = int(length_header) if length_header else None
+                ranged = False
+        finally:
+            response.close()
+
+        if start == 0 and content.lstrip()[:1] == b'<':
+            raise PreflightError("Video URL returned HTML instead of a video", 'html')
+        return content, ranged
+
+
+def probe_url(url, session=None, timeout=10):
+    """
+    Valida o vídeo remoto lendo só os cabeçalhos: o início do arquivo (ftyp e,
+    em arquivos faststart, o moov) e, se o moov estiver no fim, os cabeçalhos
+    das caixas seguintes até encontrá-lo. Levanta PreflightError para vídeos
+    inválidos, cabeçalhos corrompidos e URLs inacessíveis (após uma nova tentativa);
+    nestas últimas o erro é transient.
+    """
+    started = time.monotonic()
+    remote = _RemoteFile(url, session or requests, timeout)
+    try:
+        head, ranged = remote.read(0, HEAD_BYTES)
+        info = _new_info(remote.size)
+        if remote.size == 0 or not head:
+            info['size'] = 0
+            validate(info)
+
+        offset, mdat_seen = 0, False
+        for _ in range(MAX_HOPS):
+            if remote.size is not None and offset >= remote.size:
+                break
+            # Cabeçalho da próxima caixa: no trecho já baixado ou buscado por Range
+            if offset + 16 <= len(head):
+                buf, base = head, offset
+            elif ranged:
+                buf, _ = remote.read(offset, 16)
+                base = 0
+            else:
+                break
+            # Caixa com tamanho 0 vai até o fim do arquivo
+            end = base + remote.size - offset if remote.size is not None else len(buf)
+            header = _box_header(buf, base, end)
+            if not header:
+                break
+            box_type, payload, box_end = header
+            payload, box_end = offset + payload - base, offset + box_end - base
+
+            if box_type == b'ftyp':
+                info['brand'] = bytes(head[payload:payload + 4]).decode('latin-1')
+            elif box_type == b'mdat':
+                mdat_seen = True
+            elif box_type == b'moov':
+                if box_end - offset > MAX_MOOV_BYTES:
+                    raise PreflightError("MP4 moov box is too large", 'corrupted')
+                info['faststart'] = not mdat_seen
+                if box_end <= len(head):
+                    _parse_moov(head, payload, box_end, info)
+                elif ranged:
+                    moov, _ = remote.read(offset, box_end - offset)
+                    _parse_moov(moov, payload - offset, len(moov), info)
+                break
+            elif offset == 0:
+                raise PreflightError("Not an MP4/MOV file (no ftyp box)", 'not_mp4')
+            offset = box_end
+
+        # Sem Range não dá para alcançar um moov no fim do arquivo: o restante
+        # é validado depois do download
+        validate(info, partial=info['duration'] is None and not ranged)
+    except (struct.error, ValueError) as e:
+        _record('rejected', time.monotonic() - started, reason='corrupted')
+        raise PreflightError(f"Corrupted MP4: {e}", 'corrupted')
+    except PreflightError as e:
+        _record('rejected', time.monotonic() - started, reason=e.reason)
+        raise
+
+    _record('passed', time.monotonic() - started, faststart=info['faststart'])
+    return info
@@ -0,0 +1,133 @@
+import os
+import signal
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _read_proc(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except (OSError, IOError):
+        return None
+
+
+def list_pids():
+    """Lista os PIDs visíveis em /proc"""
+    try:
+        return [int(entry) for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+        return []
+
+
+def parent_pid(pid):
+    """Retorna o PID do processo pai (ou None se o processo não existir)"""
+    stat = _read_proc(f'/proc/{pid}/stat')
+    if not stat:
+        return None
+    # O nome do processo pode conter espaços, então partimos do último ')'
+    fields = stat[stat.rfind(')') + 2:].split()
+    return int(fields[1])
+
+
+def process_name(pid):
+    """Retorna o nome curto do processo (comm)"""
+    name = _read_proc(f'/proc/{pid}/comm')
+    return name.strip() if name else None
+
+
+def rss_bytes(pid):
+    """Memória residente (RSS) de um processo em bytes"""
+    statm = _read_proc(f'/proc/{pid}/statm')
+    if not statm:
+        return 0
+    return int(statm.split()[1]) * PAGE_SIZE
+
+
+def process_tree(pid):
+    """Retorna o PID informado mais todos os seus descendentes"""
+    children = {}
+    for candidate in list_pids():
+        ppid = parent_pid(candidate)
+        if ppid is not None:
+            children.setdefault(ppid, []).append(candidate)
+
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+
+def tree_rss_bytes(pid):
+    """Soma o RSS de um processo e de todos os seus filhos (ex: Chrome + renderers)"""
+    if not pid:
+        return 0
+    return sum(rss_bytes(p) for p in process_tree(pid))
+
+
+def find_processes(names):
+    """Lista os PIDs cujo nome (comm) está em names"""
+    # O kernel trunca o comm em 15 caracteres (ex: "undetected_chro")
+    names = {name[:15] for name in names}
+    return [pid for pid in list_pids() if process_name(pid) in names]
+
+
+def _cgroup_memory_available():
+    """Memória livre dentro do limite do cgroup (container), ou None sem limite"""
+    for limit_path, usage_path in (('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),
+                                   ('/sys/fs/cgroup/memory/memory.limit_in_bytes',
+                                    '/sys/fs/cgroup/memory/memory.usage_in_bytes')):
+        limit, usage = _read_proc(limit_path), _read_proc(usage_path)
+        if not limit or not usage or not limit.strip().isdigit():
+            continue
+        return max(int(limit) - int(usage), 0)
+    return None
+
+
+def available_memory_bytes():
+    """
+    Memória disponível para novos processos: o menor valor entre o MemAvailable
+    do sistema e o que resta no limite do cgroup (é ele que dispara o OOM killer
+    dentro do container). Retorna None se nada puder ser lido.
+    """
+    candidates = []
+    meminfo = _read_proc('/proc/meminfo')
+    if meminfo:
+        for line in meminfo.splitlines():
+            if line.startswith('MemAvailable:'):
+                candidates.append(int(line.split()[1]) * 1024)
+                break
+    cgroup = _cgroup_memory_available()
+    if cgroup is not None:
+        candidates.append(cgroup)
+    return min(candidates) if candidates else None
+
+
+def process_age_seconds(pid):
+    """Há quantos segundos o processo foi iniciado (ou None se ele não existir)"""
+    stat, uptime = _read_proc(f'/proc/{pid}/stat'), _read_proc('/proc/uptime')
+    if not stat or not uptime:
+        return None
+    # starttime (22º campo) em ticks do clock desde o boot
+    started = int(stat[stat.rfind(')') + 2:].split()[19]) / os.sysconf('SC_CLK_TCK')
+    return float(uptime.split()[0]) - started
+
+
+def kill_tree(pid):
+    """
+    Mata (SIGKILL) o processo e todos os seus descendentes.
+    Retorna (processos mortos, bytes de RSS liberados).
+    """
+    tree = process_tree(pid)
+    freed = sum(rss_bytes(p) for p in tree)
+    killed = 0
+    # Filhos primeiro, para nenhum ser reparentado antes de morrer
+    for target in reversed(tree):
+        try:
+            os.kill(target, signal.SIGKILL)
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            pass
+    return killed, freed
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class ResolutionCache:
+    """
+    Cache LRU de resoluções da interface do TikTok (ex: hashtag -> sugestão
+    escolhida, música -> card e estratégia que funcionaram). Guarda também
+    quanto tempo as resoluções levam com e sem cache e acumula o tempo
+    economizado a cada acerto. Com path informado o cache sobrevive a reinícios.
+    """
+
+    def __init__(self, name, path=None, max_entries=1000):
+        self.name = name
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self._hit_seconds = 0.0
+        self._miss_seconds = 0.0
+        self._timed_hits = 0
+        self._timed_misses = 0
+        self._saved_seconds = 0.0
+
+        self._load()
+
+    @staticmethod
+    def _normalize(key):
+        return key.strip().lower()
+
+    def get(self, key):
+        key = self._normalize(key)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[self._normalize(key)] = value
+            self._entries.move_to_end(self._normalize(key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def invalidate(self, key):
+        """Remove uma resolução que deixou de funcionar (ex: a interface mudou)"""
+        with self._lock:
+            if self._entries.pop(self._normalize(key), None) is not None:
+                self._save()
+
+    def observe(self, hit, seconds):
+        """Registra quanto tempo levou uma resolução com (hit=True) ou sem cache"""
+        with self._lock:
+            if hit:
+                self._timed_hits += 1
+                self._hit_seconds += seconds
+                # Economia deste acerto frente à média das resoluções sem cache até agora;
+                # acumulada, para o total nunca diminuir quando as médias mudam
+                if self._timed_misses:
+                    self._saved_seconds += max(self._miss_seconds / self._timed_misses - seconds, 0.0)
+            else:
+                self._timed_misses += 1
+                self._miss_seconds += seconds
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                for key, value in json.load(f):
+                    self._entries[key] = value
+        except (OSError, ValueError):
+            pass
+
+    def _save(self):
+        """Grava o cache de forma atômica (chamar com o lock)"""
+        if not self.path:
+            return
+        try:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(list(self._entries.items()), f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Erro ao salvar cache {self.name}: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_hit = self._hit_seconds / self._timed_hits if self._timed_hits else 0.0
+            avg_miss = self._miss_seconds / self._timed_misses if self._timed_misses else 0.0
+            saved_per_hit = max(avg_miss - avg_hit, 0.0) if self._timed_hits and self._timed_misses else 0.0
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'avg_hit_seconds': avg_hit,
+                'avg_miss_seconds': avg_miss,
+                'saved_seconds_per_hit': saved_per_hit,
+                'saved_seconds_total': self._saved_seconds
+            }
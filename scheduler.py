@@ -0,0 +1,302 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+DRIFT_SECONDS = metrics.Histogram('tiktok_api_schedule_drift_seconds',
+                                  'Diferença absoluta entre a publicação e o horário agendado',
+                                  buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300))
+
+# Estados de uma postagem agendada
+PENDING_STATES = ('scheduled', 'staging')
+FINAL_STATES = ('succeeded', 'failed', 'missed', 'cancelled')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    id TEXT PRIMARY KEY,
+    publish_at REAL NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    published_at REAL,
+    finished_at REAL,
+    drift REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS schedules_status ON schedules (status, publish_at);
+"""
+
+
+class TimerWheel:
+    """
+    Roda de timers (hashed timing wheel): cada timer fica no slot em que o
+    ponteiro estará no vencimento, com o número de voltas que faltam. Agendar
+    e cancelar custam O(1) e uma única thread avança um slot a cada tick,
+    disparando callback(timer_id) dos timers vencidos.
+    """
+
+    def __init__(self, callback, tick=1.0, slots=512):
+        self.callback = callback
+        self.tick = tick
+        self._slots = [{} for _ in range(slots)]  # timer_id -> voltas restantes
+        self._index = {}                          # timer_id -> slot
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='timer-wheel', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def schedule(self, timer_id, deadline):
+        """Agenda timer_id para o instante deadline (time.time()); reagendar substitui o anterior"""
+        ticks = max(math.ceil((deadline - time.time()) / self.tick), 1)
+        with self._lock:
+            self._remove(timer_id)
+            slot = (self._cursor + ticks) % len(self._slots)
+            self._slots[slot][timer_id] = (ticks - 1) // len(self._slots)
+            self._index[timer_id] = slot
+
+    def cancel(self, timer_id):
+        with self._lock:
+            self._remove(timer_id)
+
+    def _remove(self, timer_id):
+        slot = self._index.pop(timer_id, None)
+        if slot is not None:
+            self._slots[slot].pop(timer_id, None)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while not self._stopped.wait(max(next_tick - time.monotonic(), 0)):
+            next_tick += self.tick
+            with self._lock:
+                self._cursor = (self._cursor + 1) % len(self._slots)
+                slot = self._slots[self._cursor]
+                due = [timer_id for timer_id, rounds in slot.items() if rounds == 0]
+                for timer_id in list(slot):
+                    if slot[timer_id] == 0:
+                        del slot[timer_id]
+                        del self._index[timer_id]
+                    else:
+                        slot[timer_id] -= 1
+            for timer_id in due:
+                try:
+                    self.callback(timer_id)
+                except Exception as e:
+                    print(f"⚠️ Erro ao disparar timer {timer_id}: {e}")
+
+
+class ScheduleStore:
+    """Postagens agendadas num arquivo SQLite (sobrevive a reinícios do container)"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Os parâmetros incluem o session_id: o arquivo fica legível só pelo dono
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def insert(self, record):
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO schedules (id, publish_at, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                             (record['id'], record['publish_at'], json.dumps(record['params']),
+                              record['status'], record['created_at']))
+
+    def delete(self, schedule_id):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
+
+    def update(self, schedule_id, expected=None, **fields):
+        """Atualiza os campos; com expected só altera se o estado atual estiver nele (retorna True se alterou)"""
+        if fields.get('result') is not None:
+            fields['result'] = json.dumps(fields['result'])
+        assignments = ', '.join(f'{key} = ?' for key in fields)
+        query = f"UPDATE schedules SET {assignments} WHERE id = ?"
+        values = list(fields.values()) + [schedule_id]
+        if expected:
+            query += f" AND status IN ({', '.join('?' for _ in expected)})"
+            values += list(expected)
+        with self._lock, self._db:
+            return self._db.execute(query, values).rowcount > 0
+
+    def get(self, schedule_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM schedules WHERE id = ?", (schedule_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def by_status(self, *statuses):
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM schedules WHERE status IN ({', '.join('?' for _ in statuses)}) ORDER BY publish_at",
+                statuses).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM schedules GROUP BY status").fetchall())
+
+    def drifts(self, limit=200):
+        """Desvios (segundos) das últimas publicações agendadas"""
+        with self._lock:
+            rows = self._db.execute("SELECT drift FROM schedules WHERE drift IS NOT NULL "
+                                    "ORDER BY published_at DESC LIMIT ?", (limit,)).fetchall()
+        return [row[0] for row in rows]
+
+    def prune(self, older_than):
+        """Apaga postagens finalizadas há mais de older_than segundos"""
+        with self._lock, self._db:
+            self._db.execute(f"DELETE FROM schedules WHERE status IN ({', '.join('?' for _ in FINAL_STATES)}) "
+                             "AND finished_at < ?", FINAL_STATES + (time.time() - older_than,))
+
+    @staticmethod
+    def _to_dict(row):
+        record = dict(row)
+        record['params'] = json.loads(record['params'])
+        if record['result']:
+            record['result'] = json.loads(record['result'])
+        return record
+
+
+class Scheduler:
+    """
+    Postagens com horário marcado (publish_at). A roda de timers dispara a
+    preparação lead_seconds antes do horário: download, login, upload,
+    legenda e música rodam antes, e no horário resta só o clique de publicar.
+    handler(params, publish_at, on_publish) faz a postagem e deve chamar
+    on_publish() logo antes do clique; retorna o resultado com 'published_at'.
+    Postagens atrasadas mais de max_late_seconds (ex: servidor fora do ar)
+    são marcadas como perdidas em vez de publicadas fora de hora.
+    """
+
+    def __init__(self, path, handler, lead_seconds=180, max_late_seconds=3600, workers=2,
+                 tick=1.0, history_seconds=7 * 24 * 60 * 60):
+        self.store = ScheduleStore(path)
+        self.handler = handler
+        self.lead_seconds = lead_seconds
+        self.max_late_seconds = max_late_seconds
+        self.history_seconds = history_seconds
+        self.wheel = TimerWheel(self._fire, tick=tick)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scheduled-post')
+
+    def start(self):
+        """Recarrega os agendamentos do SQLite e inicia a roda de timers"""
+        self.store.prune(self.history_seconds)
+        # O clique pode ter acontecido antes da queda: não publica de novo
+        for record in self.store.by_status('publishing'):
+            self.store.update(record['id'], status='failed', finished_at=time.time(),
+                              error='Interrupted while publishing; the video may have been posted')
+        for record in self.store.by_status(*PENDING_STATES):
+            try:
+                self.wheel.schedule(record['id'], record['publish_at'] - self.lead_seconds)
+            except (OverflowError, ValueError) as e:
+                # Horário inválido (ex: gravado antes da validação): não impede o boot
+                self.store.update(record['id'], status='failed', finished_at=time.time(),
+                                  error=f"Invalid publish_at {record['publish_at']!r}: {e}")
+                continue
+            self.store.update(record['id'], status='scheduled')
+        self.wheel.start()
+        print(f"✅ Agendador iniciado ({len(self.wheel)} postagens agendadas)")
+
+    def schedule(self, params, publish_at):
+        """Agenda a postagem e retorna o registro (sem os parâmetros)"""
+        record = {
+            'id': uuid.uuid4().hex,
+            'publish_at': publish_at,
+            'params': {key: value for key, value in params.items() if key != 'video_future'},
+            'status': 'scheduled',
+            'created_at': time.time()
+        }
+        self.store.insert(record)
+        try:
+            self.wheel.schedule(record['id'], publish_at - self.lead_seconds)
+        except Exception:
+            # Sem timer a linha nunca rodaria e seria recarregada (e falharia) no próximo boot
+            self.store.delete(record['id'])
+            raise
+        return self.public(self.store.get(record['id']))
+
+    def get(self, schedule_id):
+        record = self.store.get(schedule_id)
+        return self.public(record) if record else None
+
+    def cancel(self, schedule_id):
+        """Cancela uma postagem que ainda não começou a ser preparada"""
+        if not self.store.update(schedule_id, expected=('scheduled',), status='cancelled', finished_at=time.time()):
+            return False
+        self.wheel.cancel(schedule_id)
+        return True
+
+    @staticmethod
+    def public(record):
+        """Registro sem os parâmetros (que contêm o session_id)"""
+        return {key: value for key, value in record.items() if key != 'params'}
+
+    def _fire(self, schedule_id):
+        self._executor.submit(self._run, schedule_id)
+
+    def _run(self, schedule_id):
+        record = self.store.get(schedule_id)
+        if not record:
+            return
+        now = time.time()
+        if now - record['publish_at'] > self.max_late_seconds:
+            self.store.update(schedule_id, expected=('scheduled',), status='missed', finished_at=now,
+                              error=f"Missed publish time by {now - record['publish_at']:.0f}s")
+            return
+        if not self.store.update(schedule_id, expected=('scheduled',), status='staging', started_at=now):
+            return  # cancelada enquanto o timer disparava
+
+        def on_publish():
+            self.store.update(schedule_id, status='publishing')
+
+        try:
+            result = self.handler(record['params'], record['publish_at'], on_publish)
+        except Exception as e:
+            print(f"❌ Postagem agendada {schedule_id} falhou: {e}")
+            self.store.update(schedule_id, status='failed', finished_at=time.time(),
+                              error=f"{type(e).__name__}: {e}")
+            return
+
+        published_at = result.get('published_at')
+        drift = published_at - record['publish_at'] if published_at else None
+        if drift is not None:
+            DRIFT_SECONDS.observe(abs(drift))
+            print(f"✅ Postagem agendada {schedule_id} publicada ({drift:+.2f}s do horário)")
+        self.store.update(schedule_id, status='succeeded', finished_at=time.time(),
+                          published_at=published_at, drift=drift, result=result)
+
+    def stats(self):
+        drifts = self.store.drifts()
+        absolute = sorted(abs(drift) for drift in drifts)
+        return {
+            'timers': len(self.wheel),
+            'lead_seconds': self.lead_seconds,
+            'states': self.store.counts(),
+            'drift': {
+                'samples': len(drifts),
+                'avg_seconds': sum(drifts) / len(drifts) if drifts else 0.0,
+                'p50_abs_seconds': absolute[len(absolute) // 2] if absolute else 0.0,
+                'p95_abs_seconds': absolute[min(int(len(absolute) * 0.95), len(absolute) - 1)] if absolute else 0.0,
+                'max_abs_seconds': absolute[-1] if absolute else 0.0
+            }
+        }
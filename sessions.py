@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class SessionStore:
+    """
+    Guarda, por session_id, os cookies do último login validado e o momento
+    da validação. Enquanto a validação estiver dentro do TTL o bot pode
+    restaurar os cookies direto via CDP e ir para a página de upload sem
+    carregar a home nem refazer o teste de login.
+    """
+
+    def __init__(self, root, ttl=1800):
+        self.root = root
+        self.ttl = ttl
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _path(self, session_id):
+        key = hashlib.sha256(session_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, f'{key}.json')
+
+    def _read(self, session_id):
+        try:
+            with open(self._path(session_id), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_valid_cookies(self, session_id):
+        """Retorna os cookies salvos se a sessão foi validada dentro do TTL, senão None"""
+        record = self._read(session_id)
+        with self._lock:
+            if record and time.time() - record['validated_at'] < self.ttl:
+                self.hits += 1
+                return record['cookies']
+            self.misses += 1
+            return None
+
+    def mark_valid(self, session_id, cookies):
+        """Registra que a sessão acabou de passar pelo teste de login"""
+        path = self._path(session_id)
+        temp_path = path + '.tmp'
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'validated_at': time.time(), 'cookies': cookies}, f)
+        os.replace(temp_path, path)
+
+    def invalidate(self, session_id):
+        """Descarta a sessão (ex: após um redirecionamento para o login)"""
+        with self._lock:
+            self.invalidations += 1
+        try:
+            os.unlink(self._path(session_id))
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'ttl': self.ttl
+            }
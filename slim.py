@@ -0,0 +1,89 @@
+import threading
+
+# Argumentos extras do modo leve: sem imagens, menos processos de renderer e
+# limite de heap do V8 em cada renderer. O isolamento de sites continua ligado:
+# com o Chrome compartilhado, sessões de contas diferentes não dividem renderer
+SLIM_CHROME_ARGS = [
+    '--blink-settings=imagesEnabled=false',
+    '--renderer-process-limit=2',
+    '--disable-background-networking',
+    '--mute-audio'
+]
+
+# Recursos não essenciais bloqueados via CDP (Network.setBlockedURLs):
+# imagens, fontes, streams de preview e domínios de analytics de terceiros.
+# Vídeos e áudios não entram na lista para não quebrar o upload e o editor de música
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.ico', '*.svg',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.m3u8*',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*connect.facebook.com*', '*analytics.tiktok.com*',
+    '*mon-va.byteoversea.com*', '*mon.tiktokv.com*', '*mcs-va.tiktokv.com*',
+    '*sentry.io*', '*hotjar.com*'
+]
+
+# Bytes transferidos pela página atual (documento + todos os recursos)
+PAGE_WEIGHT_JS = """
+var entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+var total = 0;
+for (var i = 0; i < entries.length; i++) total += entries[i].transferSize || 0;
+return total;
+"""
+
+
+def memory_cap_args(max_heap_mb):
+    return [f'--js-flags=--max-old-space-size={max_heap_mb}']
+
+
+def enable_resource_blocking(driver, patterns=None):
+    """Ativa o bloqueio de recursos na aba atual do navegador"""
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns or BLOCKED_URL_PATTERNS})
+
+
+class PageWeightStats:
+    """
+    Bytes transferidos por página, separados entre navegadores completos e
+    leves. A economia do modo leve é a diferença entre as médias das duas
+    amostras; navegadores completos servem de grupo de controle.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}  # (página, modo) -> [bytes, amostras]
+
+    def record(self, page, slim, transferred):
+        key = (page, 'slim' if slim else 'full')
+        with self._lock:
+            entry = self._totals.setdefault(key, [0, 0])
+            entry[0] += transferred
+            entry[1] += 1
+
+    def average(self, page, slim):
+        with self._lock:
+            entry = self._totals.get((page, 'slim' if slim else 'full'))
+            return entry[0] / entry[1] if entry and entry[1] else None
+
+    def bytes_saved(self, page, transferred):
+        """Estimativa de bytes economizados por uma carga leve da página (None sem controle)"""
+        baseline = self.average(page, slim=False)
+        if baseline is None:
+            return None
+        return max(baseline - transferred, 0)
+
+    def stats(self):
+        with self._lock:
+            pages = {}
+            for (page, mode), (transferred, samples) in self._totals.items():
+                pages.setdefault(page, {})[mode] = {
+                    'avg_bytes': transferred / samples,
+                    'samples': samples
+                }
+        for page, modes in pages.items():
+            if 'full' in modes and 'slim' in modes:
+                modes['avg_bytes_saved'] = max(modes['full']['avg_bytes'] - modes['slim']['avg_bytes'], 0)
+        return pages
+
+
+page_weights = PageWeightStats()
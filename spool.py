@@ -0,0 +1,223 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from downloader import RangedDownloader
+
+MB = 1024 * 1024
+
+SHM_DIR = '/dev/shm'
+
+# Arquivos criados pelo spool (o purge nunca toca em outros arquivos do diretório)
+_SPOOL_FILE = re.compile(r'^[0-9a-f]{64}\.mp4(\.download(\.part(\.json)?)?)?$')
+
+
+class SpoolFull(Exception):
+    """O spool não tem espaço para o vídeo dentro da quota"""
+
+
+def default_spool_dir(min_bytes=512 * MB):
+    """
+    Usa /dev/shm (tmpfs, sem I/O de disco) quando ele tem espaço livre suficiente;
+    senão o diretório temporário do sistema. O /dev/shm padrão do Docker tem só 64 MB.
+    """
+    try:
+        stat = os.statvfs(SHM_DIR)
+        if os.access(SHM_DIR, os.W_OK) and stat.f_bavail * stat.f_frsize >= min_bytes:
+            return os.path.join(SHM_DIR, 'tiktok-spool')
+    except OSError:
+        pass
+    return os.path.join(tempfile.gettempdir(), 'tiktok-spool')
+
+
+class _SpoolEntry:
+    def __init__(self):
+        self.future = Future()
+        self.refs = 1
+        self.size = 0
+
+
+class VideoSpool:
+    """
+    Área de staging dos vídeos baixados quando não há cache.
+    Mesma interface do VideoCache: get(url) devolve o caminho reservado e
+    release(path) libera a reserva. Jobs simultâneos com a mesma URL dividem
+    um único arquivo (contagem de referências) e o arquivo é apagado assim
+    que a última referência é liberada. O espaço total é limitado por
+    max_bytes; downloads que não cabem esperam até wait_timeout por espaço.
+    """
+
+    def __init__(self, root, max_bytes, downloader=None, wait_timeout=60):
+        self.root = root
+        self.downloader = downloader or RangedDownloader()
+        self.wait_timeout = wait_timeout
+        os.makedirs(self.root, exist_ok=True)
+        self._purge()
+
+        # A quota nunca passa do espaço livre do sistema de arquivos (ex: tmpfs pequeno)
+        stat = os.statvfs(self.root)
+        self.max_bytes = min(max_bytes, stat.f_bavail * stat.f_frsize)
+
+        self._entries = {}  # chave da URL -> _SpoolEntry
+        self._used = 0      # bytes ocupados + reservados para downloads em andamento
+        self._cond = threading.Condition()
+
+        self.acquired = 0
+        self.shared = 0
+        self.released = 0
+        self.rejected = 0
+        self.peak_bytes = 0
+
+    @staticmethod
+    def url_key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, f'{key}.mp4')
+
+    def _purge(self):
+        """Apaga arquivos deixados por um processo anterior (ex: container reiniciado)"""
+        for name in os.listdir(self.root):
+            if not _SPOOL_FILE.match(name):
+                continue
+            try:
+                os.unlink(os.path.join(self.root, name))
+            except OSError:
+                pass
+
+    def _remove_files(self, path):
+        for leftover in (path, path + '.download', path + '.download.part', path + '.download.part.json'):
+            try:
+                os.unlink(leftover)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"⚠️ Erro ao apagar arquivo do spool: {e}")
+
+    def get(self, url, size_hint=None):
+        """
+        Retorna o caminho local do vídeo, baixando se necessário.
+        size_hint (ex: tamanho visto na sondagem) reserva a quota antes do download;
+        sem ele a reserva é feita com o tamanho informado pelo servidor ou, se ele
+        não informar, conforme os bytes são gravados (SpoolFull ao passar da quota).
+        O arquivo fica reservado até release(path) ser chamado.
+        """
+        key = self.url_key(url)
+        with self._cond:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = _SpoolEntry()
+            else:
+                entry.refs += 1
+                self.shared += 1
+
+        if not owner:
+            # O dono do download remove a entrada (e as referências) se ele falhar
+            return entry.future.result()
+
+        try:
+            path = self._fill(key, url, entry, size_hint)
+        except Exception as e:
+            with self._cond:
+                self._entries.pop(key, None)
+                self._cond.notify_all()
+            entry.future.set_exception(e)
+            raise
+        entry.future.set_result(path)
+        return path
+
+    def _reserve(self, size, wait=True):
+        """
+        Espera espaço na quota para size bytes (chamar com o lock).
+        Com wait=False falha na hora em vez de esperar (ex: no meio de um stream).
+        """
+        if size > self.max_bytes:
+            self.rejected += 1
+            raise SpoolFull(f"Video ({size // MB} MB) is larger than the spool quota ({self.max_bytes // MB} MB)")
+        deadline = time.monotonic() + (self.wait_timeout if wait else 0)
+        while self._used + size > self.max_bytes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.rejected += 1
+                raise SpoolFull("Timed out waiting for space in the video spool")
+            self._cond.wait(remaining)
+        self._used += size
+        self.peak_bytes = max(self.peak_bytes, self._used)
+
+    def _fill(self, key, url, entry, size_hint):
+        path = self._path(key)
+        reserved = size_hint or 0
+        with self._cond:
+            self._reserve(reserved)
+
+        started = False
+
+        def on_size(size):
+            """Estende a reserva ao tamanho informado pelo servidor ou já gravado"""
+            nonlocal reserved, started
+            if size > reserved:
+                with self._cond:
+                    # Antes do primeiro byte ainda dá para esperar espaço; no meio do stream não
+                    self._reserve(size - reserved, wait=not started)
+                    reserved = size
+            started = True
+
+        try:
+            download_path = path + '.download'
+            result = self.downloader.download(url, download_path, on_size=on_size)
+            os.replace(download_path, path)
+            size = os.path.getsize(path)
+            with self._cond:
+                # Troca a reserva estimada pelo tamanho real
+                self._used -= reserved
+                reserved = 0
+                if self._used + size > self.max_bytes:
+                    self.rejected += 1
+                    raise SpoolFull("Video does not fit in the spool quota")
+                self._used += size
+                self.peak_bytes = max(self.peak_bytes, self._used)
+                entry.size = size
+                self.acquired += 1
+            print(f"✅ Vídeo baixado ({result['bytes'] / MB:.1f} MB a {result['throughput'] / MB:.1f} MB/s)")
+            return path
+        except Exception:
+            with self._cond:
+                self._used -= reserved
+            self._remove_files(path)
+            raise
+
+    def release(self, path):
+        """Libera a reserva feita por get(); a última liberação apaga o arquivo"""
+        key = os.path.splitext(os.path.basename(path))[0]
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is None or not entry.future.done():
+                return
+            entry.refs -= 1
+            self.released += 1
+            if entry.refs > 0:
+                return
+            del self._entries[key]
+            self._used -= entry.size
+            # Apaga com o lock para um novo download da mesma URL não ser apagado junto
+            self._remove_files(path)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'root': self.root,
+                'files': len(self._entries),
+                'references': sum(entry.refs for entry in self._entries.values()),
+                'bytes': self._used,
+                'max_bytes': self.max_bytes,
+                'peak_bytes': self.peak_bytes,
+                'acquired': self.acquired,
+                'shared': self.shared,
+                'released': self.released,
+                'rejected': self.rejected
+            }
@@ -0,0 +1,61 @@
+import threading
+import time
+import pytest
+from browser_pool import BrowserPool
+
+
+class FakeDriver:
+    def __init__(self, hang=None):
+        self.hang = hang  # Event: o navegador não responde até ele ser setado
+
+    def get(self, url):
+        pass
+
+    def execute_script(self, script):
+        if self.hang is not None:
+            self.hang.wait()
+            raise RuntimeError('browser is gone')
+        return 'complete'
+
+    def quit(self):
+        pass
+
+
+def test_hung_browser_does_not_block_other_acquires():
+    hang = threading.Event()
+    drivers = iter([FakeDriver(hang), FakeDriver(), FakeDriver()])
+    pool = BrowserPool(size=2, driver_factory=lambda: next(drivers), acquire_timeout=5)
+    pool._launching = 2  # como start() faz antes de disparar os _launch
+    pool._launch()
+    pool._launch()
+    assert pool.stats()['launching'] == 0
+
+    stuck = {}
+    thread = threading.Thread(target=lambda: stuck.update(browser=pool.acquire()))
+    thread.start()
+    time.sleep(0.1)  # a thread está verificando o navegador travado
+
+    started = time.monotonic()
+    assert pool.stats()['in_use'] == 1
+    healthy = pool.acquire(timeout=1)
+    assert healthy.driver.hang is None
+    assert time.monotonic() - started < 0.5
+
+    # O navegador travado morre: é descartado e reposto por um novo
+    hang.set()
+    thread.join(timeout=5)
+    assert stuck['browser'].driver.hang is None
+    assert pool.stats()['recycled'] == 1
+
+
+def test_release_skips_wipe_for_worn_out_browser():
+    pool = BrowserPool(size=1, max_uses=1, driver_factory=FakeDriver)
+    pool._launching = 1
+    pool._launch()
+    browser = pool.acquire(timeout=1)
+
+    pool._wipe = lambda browser: pytest.fail('navegador descartado não deve ser limpo')
+    pool._launch = lambda: None  # não repõe o navegador neste teste
+    pool.release(browser)
+    assert pool.stats()['recycled'] == 1
+    assert pool.stats()['idle'] == 0
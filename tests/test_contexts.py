@@ -0,0 +1,92 @@
+import itertools
+from contexts import ContextPool
+
+
+class FakeChrome:
+    """Chrome compartilhado em memória: targets (abas) -> browserContextId"""
+
+    def __init__(self):
+        self.ids = itertools.count()
+        self.targets = {'host-tab': None}
+
+    def cdp(self, command, params):
+        if command == 'Target.createBrowserContext':
+            return {'browserContextId': f'ctx-{next(self.ids)}'}
+        if command == 'Target.createTarget':
+            target_id = f'tab-{next(self.ids)}'
+            self.targets[target_id] = params.get('browserContextId')
+            return {'targetId': target_id}
+        if command == 'Target.getTargets':
+            return {'targetInfos': [{'targetId': target_id, 'type': 'page', 'browserContextId': context_id}
+                                    for target_id, context_id in self.targets.items()]}
+        if command == 'Target.closeTarget':
+            self.targets.pop(params['targetId'], None)
+            return {}
+        if command == 'Target.disposeBrowserContext':
+            for target_id, context_id in list(self.targets.items()):
+                if context_id == params['browserContextId']:
+                    del self.targets[target_id]
+            return {}
+        raise AssertionError(command)
+
+
+class FakeDriver:
+    """Sessão do chromedriver: como no Chrome real, window_handles lista todas as abas"""
+
+    def __init__(self, chrome, current):
+        self.chrome = chrome
+        self.current = current
+
+    @property
+    def window_handles(self):
+        return list(self.chrome.targets)
+
+    @property
+    def switch_to(self):
+        return self
+
+    def window(self, handle):
+        if handle not in self.chrome.targets:
+            raise RuntimeError('no such window')
+        self.current = handle
+
+    def close(self):
+        self.chrome.targets.pop(self.current, None)
+
+    def execute_script(self, script):
+        if self.current not in self.chrome.targets:
+            raise RuntimeError('no such window')
+        return 1 if script == 'return 1' else 'complete'
+
+    def execute_cdp_cmd(self, command, params):
+        return self.chrome.cdp(command, params)
+
+    def quit(self):
+        pass
+
+
+def make_pool(chrome):
+    pool = ContextPool(size=4, driver_factory=lambda: FakeDriver(chrome, 'host-tab'))
+    pool._attach = lambda host, target_id: FakeDriver(chrome, target_id)
+    return pool
+
+
+def test_release_keeps_tabs_of_other_contexts():
+    chrome = FakeChrome()
+    pool = make_pool(chrome)
+    first = pool.acquire(key='a')
+    second = pool.acquire(key='b')
+
+    # A postagem da conta a abriu uma aba extra no seu contexto
+    extra = chrome.cdp('Target.createTarget', {'browserContextId': first.context_id})['targetId']
+    pool.release(first)
+
+    assert extra not in chrome.targets
+    assert first.target_id in chrome.targets
+    assert second.target_id in chrome.targets
+    assert 'host-tab' in chrome.targets
+    assert second.driver.execute_script('return document.readyState') == 'complete'
+
+    # O Chrome compartilhado continua o mesmo e o contexto livre volta para a conta a
+    assert pool.acquire(key='a') is first
+    assert pool.stats()['host_launches'] == 1
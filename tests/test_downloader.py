@@ -0,0 +1,129 @@
+import http.server
+import os
+import threading
+import time
+import pytest
+from downloader import RangedDownloader, DownloadError
+from spool import VideoSpool, SpoolFull
+from tiktok_bot import download_video_file
+
+CONTENT = bytes(range(256)) * 1024  # 256 KB
+
+
+class VideoHandler(http.server.BaseHTTPRequestHandler):
+    """Servidor de teste: Range opcional, conexão derrubada e resposta lenta"""
+    protocol_version = 'HTTP/1.1'
+    ranges = True
+    drop_after = None  # derruba a próxima resposta com Range depois de N bytes
+    delay = 0
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(self.headers.get('Range'))
+        header = self.headers.get('Range')
+        if not self.ranges or not header:
+            self._send(200, CONTENT)
+            return
+        start, _, end = header[len('bytes='):].partition('-')
+        start, end = int(start), int(end) if end else len(CONTENT) - 1
+        body = CONTENT[start:end + 1]
+        drop = type(self).drop_after if end > 0 else None
+        if drop is not None:
+            type(self).drop_after = None
+        self._send(206, body, {'Content-Range': f'bytes {start}-{end}/{len(CONTENT)}'}, drop)
+
+    def _send(self, status, body, headers=None, drop=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', '"v1"')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.delay:
+            time.sleep(self.delay)
+        self.wfile.write(body[:drop] if drop is not None else body)
+        self.wfile.flush()
+        if drop is not None:
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    VideoHandler.ranges, VideoHandler.drop_after, VideoHandler.delay = True, None, 0
+    VideoHandler.requests = []
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), VideoHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}/video.mp4'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_downloader(**kwargs):
+    kwargs.setdefault('segments', 4)
+    return RangedDownloader(min_segment_size=32 * 1024, chunk_size=8 * 1024, **kwargs)
+
+
+def test_resumes_ranges_after_dropped_connection(server, tmp_path):
+    dest = str(tmp_path / 'video.mp4')
+    downloader = make_downloader(segments=1)
+    VideoHandler.drop_after = 100 * 1024
+
+    with pytest.raises(Exception):
+        downloader.download(server, dest)
+    assert os.path.exists(dest + '.part.json')
+
+    result = downloader.download(server, dest)
+    assert result['resumed_bytes'] >= 64 * 1024
+    assert result['bytes'] == len(CONTENT) - result['resumed_bytes']
+    assert VideoHandler.requests[-1] == f"bytes={result['resumed_bytes']}-{len(CONTENT) - 1}"
+    with open(dest, 'rb') as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(dest + '.part') and not os.path.exists(dest + '.part.json')
+
+
+def test_falls_back_to_single_stream_when_range_is_ignored(server, tmp_path):
+    dest = str(tmp_path / 'video.mp4')
+    VideoHandler.ranges = False
+
+    result = make_downloader().download(server, dest)
+    assert result['status'] == 200
+    assert result['bytes'] == len(CONTENT)
+    with open(dest, 'rb') as f:
+        assert f.read() == CONTENT
+
+
+def test_rejects_videos_over_the_size_limit(server, tmp_path):
+    with pytest.raises(DownloadError, match='too large'):
+        make_downloader(max_bytes=len(CONTENT) - 1).download(server, str(tmp_path / 'video.mp4'))
+
+    VideoHandler.ranges = False
+    with pytest.raises(DownloadError, match='too large'):
+        make_downloader(max_bytes=len(CONTENT) - 1).download(server, str(tmp_path / 'whole.mp4'))
+
+
+def test_aborts_downloads_over_the_time_limit(server, tmp_path):
+    VideoHandler.delay = 0.3
+    downloader = make_downloader(timeout=0.2)
+    with pytest.raises(DownloadError, match='timeout'):
+        downloader.download(server, str(tmp_path / 'video.mp4'))
+    assert downloader.stats()['failures'] == 1
+
+
+def test_failed_uncached_download_leaves_no_files(server, tmp_path, monkeypatch):
+    monkeypatch.setattr('tempfile.tempdir', str(tmp_path))
+    VideoHandler.drop_after = 100 * 1024
+
+    assert download_video_file(server, downloader=make_downloader(segments=1)) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_spool_enforces_quota_without_size_hint(server, tmp_path):
+    spool = VideoSpool(str(tmp_path), max_bytes=len(CONTENT) - 1, downloader=make_downloader(), wait_timeout=0)
+    with pytest.raises(SpoolFull):
+        spool.get(server)
+    assert os.listdir(tmp_path) == []
+    assert spool.stats()['bytes'] == 0
+    assert VideoHandler.requests == ['bytes=0-0']  # recusado antes de baixar o vídeo
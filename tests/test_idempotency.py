@@ -0,0 +1,33 @@
+import threading
+import pytest
+from idempotency import IdempotencyStore
+
+
+def test_interrupted_execution_releases_joined_duplicates():
+    store = IdempotencyStore(ttl=60)
+    started, interrupt = threading.Event(), threading.Event()
+    joined = {}
+
+    def func():
+        started.set()
+        interrupt.wait()
+        raise KeyboardInterrupt
+
+    def duplicate():
+        started.wait()
+        try:
+            store.run('key', lambda: 'never runs')
+        except Exception as e:
+            joined['error'] = e
+
+    thread = threading.Thread(target=duplicate)
+    thread.start()
+    threading.Timer(0.2, interrupt.set).start()
+    with pytest.raises(KeyboardInterrupt):
+        store.run('key', func)
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert isinstance(joined['error'], RuntimeError)
+    assert store.stats()['in_flight'] == 0
+    assert store.run('key', lambda: 'retried') == ('retried', 'executed')
@@ -0,0 +1,41 @@
+import pytest
+from pipeline import Pipeline, Step, StepFailed, Rewind
+
+
+def test_rewinds_do_not_spend_the_target_step_budget():
+    calls = {'session_valid': 0}
+    redirects = {'file_uploaded': 1, 'caption_set': 1, 'published': 1}
+
+    def session_valid():
+        calls['session_valid'] += 1
+        return True
+
+    def redirected(name):
+        def step():
+            if redirects[name]:
+                redirects[name] -= 1
+                raise Rewind('session_valid', 'Redirected to login page')
+            return True
+        return step
+
+    steps = [Step('session_valid', session_valid, retries=1)]
+    steps += [Step(name, redirected(name), retries=1) for name in ('file_uploaded', 'caption_set', 'published')]
+    pipeline = Pipeline(steps, initial_delay=0, max_delay=0)
+    pipeline.run()
+
+    assert calls['session_valid'] == 4
+    assert pipeline.attempts['session_valid'] == 1
+    assert pipeline.attempts['file_uploaded'] == 2
+    assert pipeline.checkpoint == 'published'
+
+
+def test_rewinding_step_still_spends_its_own_budget():
+    def always_rewind():
+        raise Rewind('first', 'upload rejected')
+
+    pipeline = Pipeline([Step('first', lambda: True), Step('second', always_rewind, retries=1)],
+                        initial_delay=0, max_delay=0)
+    with pytest.raises(StepFailed) as error:
+        pipeline.run()
+    assert error.value.step == 'second'
+    assert pipeline.attempts == {'first': 1, 'second': 2}
@@ -0,0 +1,55 @@
+import pytest
+import requests
+from preflight import PreflightError, probe_url
+
+
+class FakeResponse:
+    def __init__(self, status, body=b'', headers=None):
+        self.status_code = status
+        self.content = body
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(response=self)
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Origem do vídeo que sempre responde (ou falha) da mesma forma"""
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+@pytest.mark.parametrize('outcome, reason', [
+    (requests.ConnectionError('connection refused'), 'unreachable'),
+    (FakeResponse(503), 'upstream'),
+])
+def test_origin_outage_is_transient(outcome, reason):
+    session = FakeSession(outcome)
+    with pytest.raises(PreflightError) as error:
+        probe_url('https://example.com/video.mp4', session)
+    assert error.value.reason == reason
+    assert error.value.transient
+    assert session.calls == 2
+
+
+@pytest.mark.parametrize('outcome, reason', [
+    (FakeResponse(404), 'http'),
+    (FakeResponse(206, b'<html></html>', {'Content-Range': 'bytes 0-12/13'}), 'html'),
+])
+def test_content_rejections_are_not_transient(outcome, reason):
+    with pytest.raises(PreflightError) as error:
+        probe_url('https://example.com/video.mp4', FakeSession(outcome))
+    assert error.value.reason == reason
+    assert not error.value.transient
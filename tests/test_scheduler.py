@@ -0,0 +1,27 @@
+import pytest
+from scheduler import Scheduler
+
+
+def make_scheduler(path):
+    return Scheduler(str(path), handler=lambda params, publish_at, on_publish: None, tick=0.05)
+
+
+def test_unarmable_schedule_leaves_no_row(tmp_path):
+    scheduler = make_scheduler(tmp_path / 'schedules.db')
+    with pytest.raises(OverflowError):
+        scheduler.schedule({'video_url': 'https://example.com/video.mp4'}, float('inf'))
+    assert scheduler.store.counts() == {}
+    assert len(scheduler.wheel) == 0
+
+
+def test_boot_marks_unarmable_rows_failed(tmp_path):
+    path = tmp_path / 'schedules.db'
+    scheduler = make_scheduler(path)
+    scheduler.store.insert({'id': 'bad', 'publish_at': float('inf'), 'params': {},
+                            'status': 'scheduled', 'created_at': 0})
+
+    restarted = make_scheduler(path)
+    restarted.start()
+    restarted.wheel.stop()
+    assert restarted.store.get('bad')['status'] == 'failed'
+    assert len(restarted.wheel) == 0
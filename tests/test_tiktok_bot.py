@@ -0,0 +1,58 @@
+import pytest
+import tiktok_bot
+from resolution_cache import ResolutionCache
+from tiktok_bot import TikTokBot
+
+
+class FakeDriver:
+    """Página sem dropdown de sugestões: o texto digitado fica como está"""
+
+    def __init__(self):
+        self.typed = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.typed.append(params['text'])
+
+    def execute_script(self, script, *args):
+        raise AssertionError('nenhuma sugestão deveria ser clicada ou lida')
+
+
+class FakeWaits:
+    def until(self, name, predicate, **kwargs):
+        return None  # timeout: a sugestão nunca apareceu
+
+    def js(self, script, *args):
+        return lambda: None
+
+    def settle(self, **kwargs):
+        pass
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    monkeypatch.setattr(tiktok_bot, 'hashtag_cache', ResolutionCache('hashtags'))
+    bot = TikTokBot.__new__(TikTokBot)
+    bot.driver = FakeDriver()
+    bot.waits = FakeWaits()
+    return bot
+
+
+def test_hashtag_without_suggestion_is_not_cached(bot):
+    assert bot._insert_hashtag(None, 'viral')
+    assert bot.driver.typed == ['#viral', ' ']
+
+    cache = tiktok_bot.hashtag_cache
+    assert cache.get('viral') is None
+    stats = cache.stats()
+    assert stats['entries'] == 0
+    assert stats['avg_miss_seconds'] == 0.0
+
+
+def test_run_from_a_later_step_needs_a_prepared_post():
+    bot = TikTokBot.__new__(TikTokBot)
+    bot._post = None
+    bot.last_result = {}
+    bot.step_deadlines = {}
+    bot.watch = None
+    with pytest.raises(RuntimeError, match="no previous run"):
+        bot.run(start='published')
@@ -1,72 +1,416 @@
-from selenium import webdriver
 import undetected_chromedriver as uc
+import os
 import time
 import random
-import requests
 import tempfile
-import json
+import contextvars
+import tracing
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
-from difflib import SequenceMatcher
+from selenium.common.exceptions import TimeoutException
+from concurrent.futures import ThreadPoolExecutor
+from waits import WaitEngine
+from downloader import RangedDownloader
+from driver_cache import cached_path
+from watchdog import track_driver, kill_driver, watchdog
+from metrics import timed_phase
+from resolution_cache import ResolutionCache
+from locators import Locator, LocatorRegistry
+from preflight import PreflightError, check_file
+from pipeline import Pipeline, Step, StepFailed, Rewind, Abort
+from slim import SLIM_CHROME_ARGS, PAGE_WEIGHT_JS, memory_cap_args, enable_resource_blocking, page_weights
+
+CHROME_VERSION_MAIN = 135
+
+UPLOAD_URL = 'https://www.tiktok.com/tiktokstudio/upload'
+CAPTION_XPATH = "/html/body/div[1]/div/div/div[2]/div[2]/div/div/div/div[3]/div[1]/div[2]/div[1]/div[2]/div[1]/div/div/div/div/div/div"
+
+SESSION_COOKIE_NAMES = ['sessionid', 'sessionid_ss', 'sid_tt']
+
+# Procura, fora do campo de legenda, a sugestão visível da hashtag digitada
+# (a que começa exatamente com a hashtag tem prioridade)
+HASHTAG_SUGGESTION_JS = """
+var tag = '#' + arguments[0].toLowerCase();
+var nodes = document.querySelectorAll('[role="option"], [class*="hashtag"], [class*="mention"]');
+var first = null;
+for (var i = 0; i < nodes.length; i++) {
+    var node = nodes[i];
+    if (node.closest('[contenteditable="true"]') || node.offsetParent === null) continue;
+    var text = node.textContent.trim().toLowerCase();
+    if (text.indexOf(tag) === -1) continue;
+    if (text.split(/\\s/)[0] === tag) return node;
+    if (!first) first = node;
+}
+return first;
+"""
+
+# Última hashtag presente no campo de legenda (a que o TikTok efetivamente inseriu)
+LAST_HASHTAG_JS = """
+var tags = arguments[0].textContent.match(/#[^\\s#]+/g);
+return tags ? tags[tags.length - 1] : null;
+"""
+
+# Texto dos avisos visíveis (toasts, alertas e indicadores de progresso). A
+# legenda digitada ([contenteditable]) e a navegação ficam de fora: uma legenda
+# com "enviado" ou "try again" não pode ser confundida com o estado da página
+STATUS_TEXT_JS = """
+function statusText() {
+    var selector = '[role="alert"], [role="status"], [aria-live], [class*="toast"], [class*="Toast"], '
+        + '[class*="notice"], [class*="upload"] [class*="progress"], [class*="uploading"], [class*="info-status"]';
+    var nodes = document.querySelectorAll(selector), parts = [];
+    for (var i = 0; i < nodes.length; i++) {
+        var node = nodes[i];
+        if (node.offsetParent === null && getComputedStyle(node).position !== 'fixed') continue;
+        if (node.closest('[contenteditable], nav') || node.querySelector('[contenteditable]')) continue;
+        parts.push(node.textContent);
+    }
+    return parts.join('\\n').toLowerCase();
+}
+"""
+
+# Estado do upload na página do TikTok Studio: porcentagem exibida, aviso de
+# concluído, botão de publicar habilitado e requisições de upload finalizadas
+UPLOAD_STATE_JS = STATUS_TEXT_JS + """
+var state = {progress: null, uploaded: false, failed: false, publishEnabled: false, uploadRequests: 0};
+var bar = document.querySelector('[role="progressbar"][aria-valuenow]');
+if (bar && bar.offsetParent !== null) state.progress = parseFloat(bar.getAttribute('aria-valuenow'));
+var containers = document.querySelectorAll('[class*="upload"] [class*="progress"], [class*="uploading"], [class*="info-status"]');
+for (var i = 0; i < containers.length; i++) {
+    var match = containers[i].textContent.match(/(\\d{1,3})\\s*%/);
+    if (match && containers[i].offsetParent !== null) state.progress = parseFloat(match[1]);
+}
+var text = statusText();
+state.uploaded = /carregado|enviado|uploaded/.test(text);
+state.failed = /falha no (upload|carregamento)|upload failed|couldn't upload|não foi possível carregar/.test(text);
+var button = document.querySelector('[data-e2e="post_video_button"]');
+if (button) {
+    state.publishEnabled = !button.disabled && button.getAttribute('aria-disabled') !== 'true'
+        && button.getAttribute('data-disabled') !== 'true';
+}
+state.uploadRequests = performance.getEntriesByType('resource').filter(function(entry) {
+    return (entry.initiatorType === 'xmlhttprequest' || entry.initiatorType === 'fetch')
+        && /upload|vod|tos-/.test(entry.name) && entry.transferSize > 0;
+}).length;
+return state;
+"""
+
+# Resultado da publicação: a página vai para a lista de conteúdos ou exibe um
+# aviso de sucesso. 'rejected' é um aviso de recusa da publicação (o post não
+# saiu); 'error' é um aviso genérico, que não garante que o post não saiu
+PUBLISH_STATE_JS = STATUS_TEXT_JS + """
+if (/tiktokstudio\\/content|\\/manage/.test(location.href)) return 'success';
+var text = statusText();
+if (/seu vídeo (foi|está sendo) publicado|vídeo publicado|your video (has been|is being) (posted|published|uploaded)|video published/.test(text)) return 'success';
+if (/falha ao publicar|não foi possível publicar|couldn't post|failed to post|post failed/.test(text)) return 'rejected';
+if (/tente novamente|try again/.test(text)) return 'error';
+return null;
+"""
+
+MUSIC_CARD_XPATH = "//div[contains(@class, 'search-result-list')]//div[contains(@class, 'music-card')]"
+
+# Título de um card de música (identifica o resultado escolhido entre buscas)
+MUSIC_CARD_TITLE_JS = """
+var title = arguments[0].querySelector('[class*="title"]');
+return (title ? title.textContent : arguments[0].textContent.split('\\n')[0]).trim();
+"""
+
+# Card visível, entre os resultados da busca, cujo título é o informado
+FIND_MUSIC_CARD_JS = """
+var cards = document.querySelectorAll('[class*="search-result-list"] [class*="music-card"]');
+for (var i = 0; i < cards.length; i++) {
+    var title = cards[i].querySelector('[class*="title"]');
+    var text = (title ? title.textContent : cards[i].textContent.split('\\n')[0]).trim();
+    if (text === arguments[0] && cards[i].offsetParent !== null) return cards[i];
+}
+return null;
+"""
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36'
+]
+
+def build_chrome_options(slim=False, max_heap_mb=512):
+    """
+    Monta as opções do Chrome necessárias para evitar detecção
+    slim: modo leve, sem imagens e com limite de memória dos renderers
+    """
+    options = uc.ChromeOptions()
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument('--disable-infobars')
+    options.add_argument('--disable-notifications')
+
+    # Adiciona um user agent aleatório
+    options.add_argument(f'user-agent={random.choice(USER_AGENTS)}')
+
+    if slim:
+        for argument in SLIM_CHROME_ARGS + memory_cap_args(max_heap_mb):
+            options.add_argument(argument)
+    return options
+
+def create_driver(slim=False, max_heap_mb=512):
+    """
+    Cria uma nova instância do Chrome (sem modo headless).
+    Usa o chromedriver patcheado no boot (driver_cache.prepare_driver), quando
+    houver, em vez de o undetected_chromedriver baixar e patchear a cada instância.
+    """
+    driver = uc.Chrome(options=build_chrome_options(slim, max_heap_mb), version_main=CHROME_VERSION_MAIN,
+                       headless=False, driver_executable_path=cached_path())
+    driver.slim_mode = slim
+    # Processos de drivers vivos não são tratados como órfãos pelo watchdog
+    track_driver(driver)
+    if slim:
+        # Bloqueia recursos não essenciais antes da primeira navegação
+        enable_resource_blocking(driver)
+    return driver
+
+# Downloads rodam em paralelo com a inicialização do navegador e o login
+_download_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='video-download')
+_default_downloader = RangedDownloader()
+
+def download_video_file(video_url, cache=None, downloader=None, size_hint=None):
+    """
+    Baixa o vídeo da URL fornecida (ou pega do cache).
+    cache é um VideoCache ou VideoSpool; sem ele o vídeo vai para um arquivo
+    temporário que o bot apaga ao terminar a postagem.
+    """
+    with tracing.span('fetch_video', cached=bool(cache)) as span:
+        temp_path = None
+        try:
+            if cache:
+                return cache.get(video_url, size_hint=size_hint)
+
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
+            temp_file.close()
+            temp_path = temp_file.name
+            result = (downloader or _default_downloader).download(video_url, temp_path)
+            print(f"✅ Vídeo baixado ({result['bytes'] / 1024 / 1024:.1f} MB a {result['throughput'] / 1024 / 1024:.1f} MB/s)")
+            span.set(bytes=result['bytes'], throughput=round(result['throughput']))
+            return result['path']
+        except Exception as e:
+            print(f"❌ Erro ao baixar vídeo: {e}")
+            span.fail(e)
+            # Sem cache não há retomada: apaga o arquivo temporário e o parcial
+            if temp_path:
+                for path in (temp_path, temp_path + '.part', temp_path + '.part.json'):
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+            return None
+
+def prefetch_video(video_url, cache=None, downloader=None, size_hint=None):
+    """
+    Inicia o download em background e retorna um Future com o caminho local.
+    O download roda no contexto de quem o iniciou, então aparece no trace da postagem.
+    """
+    context = contextvars.copy_context()
+    return _download_executor.submit(context.run, download_video_file, video_url, cache, downloader, size_hint)
+
+def release_prefetched_video(future, cache):
+    """Libera no cache um vídeo pré-carregado (quando o download terminar, se ainda estiver rodando)"""
+    def release(done):
+        try:
+            path = None if done.exception() else done.result()
+            if path:
+                cache.release(path)
+        except Exception as e:
+            print(f"⚠️ Erro ao liberar vídeo do cache: {e}")
+    future.add_done_callback(release)
+
+def _to_cdp_cookie(cookie):
+    """Converte um cookie do Selenium para o formato do Network.setCookies"""
+    cdp_cookie = {
+        'name': cookie['name'],
+        'value': cookie['value'],
+        'domain': cookie.get('domain', '.tiktok.com'),
+        'path': cookie.get('path', '/'),
+        'secure': cookie.get('secure', False),
+        'httpOnly': cookie.get('httpOnly', False)
+    }
+    if cookie.get('sameSite'):
+        cdp_cookie['sameSite'] = cookie['sameSite']
+    if cookie.get('expiry'):
+        cdp_cookie['expires'] = cookie['expiry']
+    return cdp_cookie
+
+# Define o valor de um input range pelo setter nativo (o React ignora input.value = x)
+# e dispara os eventos que o framework escuta
+SET_RANGE_VALUE_JS = """
+var input = arguments[0];
+var setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+setter.call(input, arguments[1]);
+input.dispatchEvent(new Event('input', {bubbles: true}));
+input.dispatchEvent(new Event('change', {bubbles: true}));
+"""
+
+VOLUME_SET_ATTEMPTS = 3
+
+# Hashtag -> texto inserido pela sugestão escolhida; hashtags repetidas pulam o dropdown
+hashtag_cache = ResolutionCache('hashtags')
+
+# Música -> título do card escolhido e estratégia de clique em "Usar" que funcionou
+music_cache = ResolutionCache('music')
+
+# Estratégias de clique em "Usar", na ordem em que são tentadas sem cache
+MUSIC_CLICK_STRATEGIES = ('card_button', 'page_button', 'js_click')
+
+# Elementos da interface com as estratégias em ordem de preferência: atributos
+# data-e2e, papéis ARIA e texto antes de classes e dos XPaths absolutos antigos
+UI_LOCATORS = [
+    Locator('caption_field', [
+        ('aria', 'css', 'div[contenteditable="true"][role="combobox"]'),
+        ('css', 'css', '.public-DraftEditor-content[contenteditable="true"]'),
+        ('xpath', 'xpath', CAPTION_XPATH)
+    ]),
+    Locator('publish_button', [
+        ('data', 'css', 'button[data-e2e="post_video_button"]'),
+        ('text', 'xpath', "//button[normalize-space()='Publicar' or normalize-space()='Post']"),
+        ('xpath', 'xpath', "/html/body/div[1]/div/div/div[2]/div[2]/div/div/div/div[4]/div/button[1]")
+    ], condition='clickable'),
+    Locator('edit_music_button', [
+        ('data', 'css', '[data-e2e="editor_sound_button"] button, button[data-e2e="editor_sound_button"]'),
+        ('xpath', 'xpath', "/html/body/div[1]/div/div/div[2]/div[2]/div/div/div/div[3]/div[2]/div/div[3]/div/button")
+    ], condition='clickable'),
+    Locator('music_search_input', [
+        ('aria', 'css', '[role="dialog"] input[type="search"]'),
+        ('text', 'xpath', "//input[@placeholder='Pesquisar' or @placeholder='Search']")
+    ]),
+    Locator('music_modal', [
+        ('css', 'css', '[role="dialog"] [class*="search-result-list"]'),
+        ('xpath', 'xpath', "/html/body/div[6]/div/div/div[3]")
+    ]),
+    Locator('volume_trigger', [
+        ('css', 'css', '[role="dialog"] [class*="volume"] img'),
+        ('xpath', 'xpath', "/html/body/div[6]/div/div/div[3]/div[2]/div/div[1]/div/div[1]/div[3]/img")
+    ]),
+    Locator('volume_ranges', [
+        ('css', 'css', 'div[class*="volume-range"]'),
+        ('jsx', 'css', 'div.jsx-2057176669.volume-range')
+    ]),
+    Locator('save_music_button', [
+        ('text', 'xpath', "//*[@role='dialog']//button[normalize-space()='Salvar' or normalize-space()='Save']"),
+        ('xpath', 'xpath', "/html/body/div[6]/div/div/div[4]/button[2]")
+    ], condition='clickable')
+]
+
+# Lembra a estratégia vencedora de cada locator (tentada primeiro nas próximas postagens)
+locators = LocatorRegistry(UI_LOCATORS)
+
+# Tempo máximo (segundos) de cada tentativa de um passo, vigiado pelo watchdog
+STEP_DEADLINES = {
+    'browser_ready': 180,
+    'session_valid': 120,
+    'file_uploaded': 600,
+    'caption_set': 120,
+    'upload_complete': 900,
+    'music_set': 180,
+    'published': 180
+}
 
 class TikTokBot:
-    def __init__(self, params):
+    def __init__(self, params, pool=None, cache=None, downloader=None, sessions=None, driver_factory=None,
+                 watch=None, step_deadlines=None):
         """
         Inicializa o bot com os parâmetros recebidos
         params: dicionário com os parâmetros da API
+        pool: BrowserPool ou ContextPool opcional; quando informado o navegador é emprestado do pool
+        cache: VideoCache ou VideoSpool opcional; reserva o arquivo do vídeo até o close()
+        downloader: RangedDownloader usado quando não há cache
+        sessions: SessionStore opcional; sessões validadas recentemente pulam o login
+        driver_factory: função que cria o Chrome quando não há pool (padrão: create_driver)
+        watch: watchdog.Watch opcional com o prazo da postagem; ao estourar, o driver é abortado
+        step_deadlines: prazo de cada passo (padrão: STEP_DEADLINES)
+
+        O download do vídeo começa antes do navegador ser iniciado (ou já vem
+        iniciado em params['video_future']) e roda em paralelo com o login.
         """
         if not params:
             raise ValueError("Parâmetros não podem ser nulos")
             
         self.session_id = params['session_id']
         self.sid_tt = params.get('sid_tt', self.session_id)  # Usa session_id como fallback
+        self.cache = cache
+        self.downloader = downloader
+        self.video_future = None
+        self.load_video(params)
+        
+        self.sessions = sessions
+        self.session_restored = False
+        self.logged_in = False
+
+        self.watch = watch
+        self.step_deadlines = step_deadlines or STEP_DEADLINES
+        if watch is not None:
+            watch.on_expire = self.abort
+
+        self.pool = pool
+        self.driver_factory = driver_factory or create_driver
+        self.browser = None
+        self.driver = None
+        self.waits = None
+        self.setup_browser()
+
+    def load_video(self, params):
+        """
+        Define o vídeo (URL, legenda, hashtags e música) da próxima postagem.
+        Permite postar vários vídeos com o mesmo navegador já logado.
+        """
+        self._release_video()
         self.video_url = params['video_url']
         self.video_caption = params.get('video_caption', '')
         self.hashtags = params.get('hashtags', [])
         self.music_name = params.get('music_name', '')
         self.music_volume = int(params.get('music_volume', 50))
-        
-        self.driver = None
-        self.setup_browser()
+        size_hint = (params.get('preflight') or {}).get('size')
+        self.video_future = params.get('video_future') or prefetch_video(self.video_url, self.cache, self.downloader,
+                                                                         size_hint)
+        self.last_result = {}
+        self._post = None  # estado dos passos da postagem, criado pelo run()
 
+    @timed_phase('setup_browser')
     def setup_browser(self):
         """Configura o navegador com as opções necessárias para evitar detecção"""
         try:
-            options = uc.ChromeOptions()
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--window-size=1920,1080')
-            options.add_argument('--disable-infobars')
-            options.add_argument('--disable-notifications')
-            
-            # Adiciona um user agent aleatório
-            user_agents = [
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36',
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36'
-            ]
-            options.add_argument(f'user-agent={random.choice(user_agents)}')
-            
-            # Iniciando Chrome sem modo headless
-            self.driver = uc.Chrome(options=options, version_main=135, headless=False)
+            if self.pool:
+                # Usa um navegador já aquecido do pool (ou o contexto da conta)
+                self.browser = self.pool.acquire(key=self.session_id)
+                self.driver = self.browser.driver
+                self.waits = WaitEngine(self.driver)
+                print("✅ Navegador obtido do pool!")
+                return True
+
+            self.driver = self.driver_factory()
+            self.waits = WaitEngine(self.driver)
             print("✅ Navegador iniciado com sucesso!")
             return True
         except Exception as e:
             print(f"❌ Erro ao configurar o navegador: {e}")
             return False
         
+    @timed_phase('inject_session')
     def inject_session(self):
         """Injeta os cookies de sessão para autenticação"""
         try:
             if not self.driver:
                 return False
                 
+            # Sessão validada recentemente: restaura os cookies salvos sem carregar a home
+            if self._restore_session():
+                return True
+
             # Primeiro acessa o TikTok para garantir que o domínio está correto
-            self.driver.get('https://www.tiktok.com')
-            time.sleep(5)  # Aumentado para 5 segundos
+            # (navegadores do pool já estão na home, então pulamos a navegação)
+            if not self.driver.current_url.startswith('https://www.tiktok.com'):
+                self.driver.get('https://www.tiktok.com')
+                self.waits.page_ready()
+                self._record_page_weight('home')
             
             # Adiciona cookies essenciais
             cookies = [
@@ -94,22 +438,18 @@ class TikTokBot:
             for cookie in cookies:
                 try:
                     self.driver.add_cookie(cookie)
-                    time.sleep(1)  # Pequena pausa entre cada cookie
                 except Exception as cookie_error:
                     print(f"⚠️ Aviso ao adicionar cookie {cookie['name']}: {cookie_error}")
             
-            # Aguarda mais tempo após adicionar os cookies
-            time.sleep(5)
+            # Aguarda os cookies ficarem visíveis para o navegador
+            self.waits.until('cookies', self._session_cookies)
             
             # Recarrega a página
             self.driver.refresh()
-            time.sleep(5)  # Aguarda a página recarregar completamente
+            self.waits.page_ready()  # Aguarda a página recarregar completamente
             
             # Verifica se os cookies foram adicionados corretamente
-            actual_cookies = self.driver.get_cookies()
-            session_cookies = [c for c in actual_cookies if c['name'] in ['sessionid', 'sessionid_ss', 'sid_tt']]
-            
-            if not session_cookies:
+            if not self._session_cookies():
                 print("❌ Cookies de sessão não foram encontrados após a injeção")
                 return False
                 
@@ -119,27 +459,33 @@ class TikTokBot:
             print(f"❌ Erro ao injetar sessão: {e}")
             return False
         
+    @timed_phase('test_login')
     def test_login(self):
         """Verifica se a sessão está funcionando"""
         try:
             if not self.driver:
                 return False
 
+            # Sessão restaurada do cache já foi validada dentro do TTL; se ela
+            # tiver expirado, post_video detecta o redirecionamento para o login
+            if self.session_restored:
+                print("✅ Sessão validada recentemente, pulando teste de login")
+                return True
+
             # Primeiro verifica se temos os cookies necessários
-            cookies = self.driver.get_cookies()
-            session_cookies = [c for c in cookies if c['name'] in ['sessionid', 'sessionid_ss', 'sid_tt']]
-            
-            if not session_cookies:
+            if not self._session_cookies():
                 print("❌ Cookies de sessão não encontrados")
                 return False
                 
             # Tenta acessar a página de upload do TikTok Studio (mais seguro que /upload)
-            self.driver.get('https://www.tiktok.com/tiktokstudio/upload')
-            time.sleep(5)  # Aguarda mais tempo para carregar
+            self.driver.get(UPLOAD_URL)
+
+            # Aguarda o input de upload aparecer ou o redirecionamento para o login
+            self.waits.until('login_check', lambda: self._on_login_page() or
+                             self.driver.find_elements(By.CSS_SELECTOR, 'input[type="file"]'))
             
             # Verifica se fomos redirecionados para a página de login
-            current_url = self.driver.current_url.lower()
-            if 'login' in current_url or 'sign-in' in current_url:
+            if self._on_login_page():
                 print("❌ Redirecionado para página de login")
                 return False
 
@@ -149,6 +495,7 @@ class TikTokBot:
                     EC.presence_of_element_located((By.CSS_SELECTOR, 'input[type="file"]'))
                 )
                 print("✅ Sessão válida e funcionando")
+                self._remember_session()
                 return True
             except:
                 print("❌ Não foi possível encontrar elementos da página de upload")
@@ -158,52 +505,100 @@ class TikTokBot:
             print(f"❌ Erro ao testar login: {e}")
             return False
 
+    def _session_cookies(self):
+        """Retorna os cookies de sessão presentes no navegador"""
+        return [c for c in self.driver.get_cookies() if c['name'] in SESSION_COOKIE_NAMES]
+
+    def _restore_session(self):
+        """Restaura via CDP os cookies de uma sessão validada dentro do TTL"""
+        if not self.sessions:
+            return False
+        cookies = self.sessions.get_valid_cookies(self.session_id)
+        if not cookies:
+            return False
+        try:
+            self.driver.execute_cdp_cmd('Network.setCookies', {
+                'cookies': [_to_cdp_cookie(cookie) for cookie in cookies]
+            })
+            self.session_restored = True
+            print("✅ Sessão restaurada do cache")
+            return True
+        except Exception as e:
+            print(f"⚠️ Erro ao restaurar sessão do cache: {e}")
+            return False
+
+    def _remember_session(self):
+        """Salva os cookies do TikTok após um teste de login bem-sucedido"""
+        if not self.sessions:
+            return
+        try:
+            cookies = [c for c in self.driver.get_cookies() if 'tiktok.com' in c.get('domain', '')]
+            self.sessions.mark_valid(self.session_id, cookies)
+        except Exception as e:
+            print(f"⚠️ Erro ao salvar sessão no cache: {e}")
+
+    def _forget_session(self):
+        """Sessão expirou no TikTok: descarta o cache e os cookies para refazer o login completo"""
+        print("⚠️ Sessão inválida, refazendo login")
+        if self.sessions:
+            self.sessions.invalidate(self.session_id)
+        self.session_restored = False
+        self.logged_in = False
+        self.driver.delete_all_cookies()
+
+    def _record_page_weight(self, page):
+        """Registra os bytes transferidos pela página atual (e a economia no modo leve)"""
+        try:
+            transferred = self.driver.execute_script(PAGE_WEIGHT_JS) or 0
+        except Exception:
+            return
+        tracing.record_page_timings(self.driver, page)
+        slim = getattr(self.driver, 'slim_mode', False)
+        page_weights.record(page, slim, transferred)
+        self.last_result['page_bytes'] = self.last_result.get('page_bytes', 0) + transferred
+        if slim:
+            saved = page_weights.bytes_saved(page, transferred)
+            if saved is not None:
+                self.last_result['bytes_saved'] = self.last_result.get('bytes_saved', 0) + saved
+
+    def _on_login_page(self):
+        """Verifica se o navegador foi redirecionado para a página de login"""
+        current_url = self.driver.current_url.lower()
+        return 'login' in current_url or 'sign-in' in current_url
+
+    @timed_phase('download_video')
     def download_video(self):
-        """Baixa o vídeo da URL fornecida"""
+        """Aguarda o download iniciado em background e retorna o caminho local do vídeo"""
         try:
-            response = requests.get(self.video_url, stream=True)
-            if response.status_code == 200:
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        temp_file.write(chunk)
-                temp_file.close()
-                return temp_file.name
-            else:
-                print(f"❌ Erro ao baixar vídeo. Status code: {response.status_code}")
-                return None
+            if not self.video_future.done():
+                print("⌛ Aguardando o download do vídeo...")
+            return self.video_future.result()
         except Exception as e:
             print(f"❌ Erro ao baixar vídeo: {e}")
             return None
 
+    @timed_phase('_clear_caption_field')
     def _clear_caption_field(self):
-        """Limpa o campo de legenda usando o XPath específico e uma abordagem mais robusta"""
+        """Limpa o campo de legenda (encontrado pelo registro de locators) de forma robusta"""
         try:
             # Espera o campo de legenda ficar visível e clicável
-            caption_field = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "/html/body/div[1]/div/div/div[2]/div[2]/div/div/div/div[3]/div[1]/div[2]/div[1]/div[2]/div[1]/div/div/div/div/div/div"))
-            )
-            
-            # Garante que o campo está interativo
-            WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "/html/body/div[1]/div/div/div[2]/div[2]/div/div/div/div[3]/div[1]/div[2]/div[1]/div[2]/div[1]/div/div/div/div/div/div"))
-            )
+            caption_field = locators.find(self.driver, 'caption_field', condition='clickable')
 
             # Primeiro clica no campo para garantir o foco
             caption_field.click()
-            time.sleep(1)
+            self.waits.settle(target=caption_field)
 
             # Digita um caractere temporário para garantir que o campo está ativo
             caption_field.send_keys(".")
-            time.sleep(0.5)
+            self.waits.settle(target=caption_field)
 
             # Seleciona todo o texto usando Ctrl+A
             ActionChains(self.driver).key_down(Keys.CONTROL).send_keys('a').key_up(Keys.CONTROL).perform()
-            time.sleep(0.5)
+            self.waits.settle(target=caption_field)
             
             # Apaga o texto selecionado
             caption_field.send_keys(Keys.BACKSPACE)
-            time.sleep(0.5)
+            self.waits.settle(target=caption_field)
 
             # Se ainda houver texto, tenta uma abordagem alternativa de limpeza caractere por caractere
             if caption_field.get_attribute("textContent"):
@@ -211,52 +606,89 @@ class TikTokBot:
                 for _ in range(50):  # Número suficiente de backspaces para garantir
                     actions.send_keys(Keys.BACKSPACE)
                 actions.perform()
-                time.sleep(0.5)
+                self.waits.settle(target=caption_field)
 
             return caption_field
         except Exception as e:
             print(f"❌ Erro ao limpar campo de legenda: {e}")
             return None
 
+    def _insert_text(self, text):
+        """Insere texto no elemento focado de uma vez via CDP (sem um evento de tecla por caractere)"""
+        self.driver.execute_cdp_cmd('Input.insertText', {'text': text})
+
+    @timed_phase('compose_caption')
+    def _compose_caption(self, caption_field):
+        """
+        Insere a legenda e as hashtags em bloco.
+        Hashtags já resolvidas antes (cache) são inseridas juntas, sem esperar
+        o dropdown; as demais passam por _insert_hashtag.
+        """
+        try:
+            if self.video_caption:
+                self._insert_text(self.video_caption)
+                caption_field.send_keys(Keys.ENTER)  # Pula uma linha após a legenda
+
+            pending = []
+
+            def flush():
+                if not pending:
+                    return
+                started = time.monotonic()
+                self._insert_text(''.join(pending))
+                elapsed = (time.monotonic() - started) / len(pending)
+                for _ in pending:
+                    hashtag_cache.observe(True, elapsed)
+                pending.clear()
+
+            for hashtag in self.hashtags:
+                tag = str(hashtag).strip().lstrip('#')
+                if not tag:
+                    continue
+                resolved = hashtag_cache.get(tag)
+                if resolved:
+                    pending.append(f"{resolved} ")
+                    continue
+                flush()
+                self._insert_hashtag(caption_field, tag)
+            flush()
+
+            self.waits.settle(target=caption_field)
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao inserir legenda: {e}")
+            return False
+
+    @timed_phase('_insert_hashtag')
     def _insert_hashtag(self, caption_field, hashtag):
-        """Insere uma hashtag usando uma abordagem simplificada com teclas de seta"""
+        """Insere uma hashtag e confirma a sugestão assim que a lista aparece"""
+        started = time.monotonic()
         try:
-            # Digite a hashtag sem espaço
-            caption_field.send_keys(f"#{hashtag}")
-            time.sleep(5)  # Aguarda as sugestões carregarem
-
-            # Primeiro tenta usar as teclas de seta
-            caption_field.send_keys(Keys.ARROW_DOWN)  # Seleciona a primeira sugestão
-            time.sleep(1)
-            caption_field.send_keys(Keys.ENTER)  # Confirma a seleção
-            time.sleep(1)
-
-            # Se a abordagem com teclas não funcionou, tenta clicar diretamente
-            if not f"#{hashtag}" in caption_field.get_attribute("textContent"):
-                try:
-                    # Procura pelo elemento mais provável de ser a hashtag
-                    hashtag_elements = self.driver.find_elements(By.XPATH, 
-                        f"//div[contains(text(), '#{hashtag}') or contains(., '#{hashtag}')]")
-                    
-                    for element in hashtag_elements:
-                        if element.is_displayed():
-                            try:
-                                self.driver.execute_script("arguments[0].click();", element)
-                                time.sleep(1)
-                                break
-                            except:
-                                continue
-
-                except Exception as e:
-                    print(f"⚠️ Erro ao tentar clicar na hashtag: {e}")
+            # Digita a hashtag sem espaço
+            self._insert_text(f"#{hashtag}")
+
+            # Aguarda a sugestão correspondente aparecer e clica nela
+            suggestion = self.waits.until('hashtag_suggestions', self.waits.js(HASHTAG_SUGGESTION_JS, hashtag))
+            resolved = None
+            if suggestion:
+                self.driver.execute_script("arguments[0].click();", suggestion)
+                self.waits.settle(target=caption_field)
+                resolved = self.driver.execute_script(LAST_HASHTAG_JS, caption_field)
 
             # Adiciona um espaço após a hashtag
-            caption_field.send_keys(" ")
-            time.sleep(0.5)
+            self._insert_text(" ")
+
+            # Sem sugestão confirmada a hashtag ficou como texto puro: não é
+            # guardada, para que a próxima postagem tente o dropdown de novo
+            if resolved:
+                hashtag_cache.put(hashtag, resolved)
+                hashtag_cache.observe(False, time.monotonic() - started)
+            return True
 
         except Exception as e:
             print(f"⚠️ Erro ao inserir hashtag #{hashtag}: {e}")
             caption_field.send_keys(" ")
+            return False
 
     def _force_hover_visibility(self):
         """Força todos os elementos hover a ficarem visíveis"""
@@ -291,80 +723,46 @@ class TikTokBot:
             style.innerHTML = `{css}`;
             document.head.appendChild(style);
         """)
-        time.sleep(1)
+        self.waits.settle()
 
+    @timed_phase('_select_music')
     def _select_music(self):
-        """Seleciona a música para o vídeo"""
+        """
+        Seleciona a música para o vídeo.
+        Músicas já resolvidas antes (cache) vão direto ao card e à estratégia
+        de clique conhecidos; as demais passam pelo fluxo completo de hover.
+        """
         try:
             # Clica no botão de editar música
-            edit_music_button = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "/html/body/div[1]/div/div/div[2]/div[2]/div/div/div/div[3]/div[2]/div/div[3]/div/button"))
-            )
+            edit_music_button = locators.find(self.driver, 'edit_music_button')
             edit_music_button.click()
-            time.sleep(2)
 
             # Pesquisa a música
-            search_field = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "//input[@placeholder='Pesquisar']"))
-            )
+            search_field = locators.find(self.driver, 'music_search_input')
             search_field.clear()
             search_field.send_keys(self.music_name)
             search_field.send_keys(Keys.ENTER)
-            time.sleep(3)
 
             try:
-                # Encontra o container da música (primeiro resultado)
-                music_container = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'search-result-list')]//div[contains(@class, 'music-card')]"))
-                )
-
-                # Rola até o container da música
-                self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", music_container)
-                time.sleep(1)
-
-                # Move o mouse sobre o container para revelar o botão
-                actions = ActionChains(self.driver)
-                actions.move_to_element(music_container).perform()
-                time.sleep(1)
-
-                # Força o estado de hover via JavaScript
-                self.driver.execute_script("""
-                    var element = arguments[0];
-                    var event = new MouseEvent('mouseover', {
-                        'view': window,
-                        'bubbles': true,
-                        'cancelable': true
-                    });
-                    element.dispatchEvent(event);
-                """, music_container)
-                time.sleep(1)
+                started = time.monotonic()
+                cached = music_cache.get(self.music_name)
+                if cached and self._use_cached_music(cached):
+                    music_cache.observe(True, time.monotonic() - started)
+                else:
+                    if cached:
+                        # A interface ou os resultados mudaram: resolve de novo
+                        music_cache.invalidate(self.music_name)
+                        started = time.monotonic()
+                    resolution = self._resolve_music()
+                    if not resolution:
+                        return False
+                    music_cache.put(self.music_name, resolution)
+                    music_cache.observe(False, time.monotonic() - started)
 
-                # Tenta clicar no botão "Usar" sem validações
-                try:
-                    use_button = music_container.find_element(By.XPATH, ".//button[contains(text(), 'Usar')]")
-                    use_button.click()
-                except:
-                    try:
-                        use_button = WebDriverWait(self.driver, 5).until(
-                            EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Usar')]"))
-                        )
-                        use_button.click()
-                    except:
-                        buttons = music_container.find_elements(By.TAG_NAME, "button")
-                        for button in buttons:
-                            try:
-                                if "usar" in button.get_attribute("textContent").lower():
-                                    self.driver.execute_script("arguments[0].click();", button)
-                                    break
-                            except:
-                                continue
-
-                time.sleep(2)
+                self.waits.settle()
                 
                 # Aguarda e encontra o container correto para scroll
-                music_modal = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "/html/body/div[6]/div/div/div[3]"))
-                )
+                music_modal = locators.find(self.driver, 'music_modal')
                 
                 # Rola dentro do container correto
                 self.driver.execute_script("""
@@ -373,7 +771,7 @@ class TikTokBot:
                         behavior: 'smooth'
                     });
                 """, music_modal)
-                time.sleep(1)
+                self.waits.settle(target=music_modal)
 
                 return self._configure_music_settings()
 
@@ -385,23 +783,128 @@ class TikTokBot:
             print(f"❌ Erro ao selecionar música: {e}")
             return False
 
+    def _resolve_music(self):
+        """
+        Fluxo completo: primeiro resultado da busca, hover forçado e as
+        estratégias de clique em "Usar" em ordem.
+        Retorna {'title', 'strategy'} para o cache ou None se nada funcionou.
+        """
+        # Encontra o container da música (primeiro resultado)
+        music_container = self.waits.until('music_search', self.waits.element(By.XPATH, MUSIC_CARD_XPATH))
+        if not music_container:
+            raise TimeoutException("Nenhum resultado de música encontrado")
+        title = self.driver.execute_script(MUSIC_CARD_TITLE_JS, music_container)
+
+        # Rola até o container da música
+        self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", music_container)
+        self.waits.settle(target=music_container)
+
+        # Move o mouse sobre o container para revelar o botão
+        actions = ActionChains(self.driver)
+        actions.move_to_element(music_container).perform()
+        self.waits.settle(target=music_container)
+
+        # Força o estado de hover via JavaScript
+        self.driver.execute_script("""
+            var element = arguments[0];
+            var event = new MouseEvent('mouseover', {
+                'view': window,
+                'bubbles': true,
+                'cancelable': true
+            });
+            element.dispatchEvent(event);
+        """, music_container)
+        self.waits.settle(target=music_container)
+
+        for strategy in MUSIC_CLICK_STRATEGIES:
+            if self._click_use_button(music_container, strategy):
+                return {'title': title, 'strategy': strategy}
+        print("⚠️ Botão 'Usar' não encontrado no card da música")
+        return None
+
+    def _use_cached_music(self, cached):
+        """Vai direto ao card conhecido e usa a estratégia de clique que funcionou antes"""
+        music_container = self.waits.until('music_search', self.waits.js(FIND_MUSIC_CARD_JS, cached['title']))
+        if not music_container:
+            return False
+        self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", music_container)
+        if cached['strategy'] != 'js_click':
+            # Cliques reais precisam do botão revelado pelo hover
+            ActionChains(self.driver).move_to_element(music_container).perform()
+        return self._click_use_button(music_container, cached['strategy'])
+
+    def _click_use_button(self, music_container, strategy):
+        """Clica em "Usar" com uma das estratégias; retorna True se o clique aconteceu"""
+        try:
+            if strategy == 'card_button':
+                music_container.find_element(By.XPATH, ".//button[contains(text(), 'Usar')]").click()
+                return True
+            if strategy == 'page_button':
+                WebDriverWait(self.driver, 5).until(
+                    EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Usar')]"))
+                ).click()
+                return True
+            if strategy == 'js_click':
+                for button in music_container.find_elements(By.TAG_NAME, "button"):
+                    if "usar" in (button.get_attribute("textContent") or "").lower():
+                        self.driver.execute_script("arguments[0].click();", button)
+                        return True
+        except Exception:
+            pass
+        return False
+
+    @timed_phase('set_music_volume')
+    def _set_volume(self, volume_input):
+        """
+        Define o valor do input range diretamente e dispara os eventos do React.
+        Lê o valor de volta e, se necessário, corrige com poucas setas.
+        """
+        min_value = float(volume_input.get_attribute("min") or "0")
+        max_value = float(volume_input.get_attribute("max") or "1")
+        step_attr = volume_input.get_attribute("step")
+        try:
+            step = float(step_attr)
+        except (TypeError, ValueError):
+            step = (max_value - min_value) / 100  # step="any" ou ausente
+
+        # Converte o volume desejado para a escala do input
+        target = min_value + (max_value - min_value) * self.music_volume / 100
+        target = min_value + round((target - min_value) / step) * step
+        tolerance = step / 2 + 1e-9
+
+        for attempt in range(VOLUME_SET_ATTEMPTS):
+            if attempt == 0:
+                self.driver.execute_script(SET_RANGE_VALUE_JS, volume_input, str(target))
+            else:
+                # Correção pontual: só as setas que faltam
+                missing_steps = round((target - current) / step)
+                key = Keys.RIGHT if missing_steps > 0 else Keys.LEFT
+                ActionChains(self.driver).click(volume_input).send_keys(key * abs(missing_steps)).perform()
+            self.waits.settle()
+
+            current = float(volume_input.get_attribute("value"))
+            if abs(current - target) <= tolerance:
+                return True
+
+        print(f"⚠️ Volume pode não ter sido ajustado precisamente.")
+        print(f"Valor atual: {(current - min_value) / (max_value - min_value) * 100:.0f}%")
+        print(f"Valor esperado: {self.music_volume}%")
+        return False
+
+    @timed_phase('_configure_music_settings')
     def _configure_music_settings(self):
         try:
             # Clica na imagem específica que ativa o controle de volume
-            volume_trigger = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "/html/body/div[6]/div/div/div[3]/div[2]/div/div[1]/div/div[1]/div[3]/img"))
-            )
+            volume_trigger = locators.find(self.driver, 'volume_trigger')
             actions = ActionChains(self.driver)
             actions.move_to_element(volume_trigger)
             actions.click()
             actions.perform()
-            time.sleep(2)
+            self.waits.settle()
 
             try:
                 # Encontra os containers de volume - deve haver dois
-                volume_containers = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.jsx-2057176669.volume-range"))
-                )
+                volume_containers = locators.find(self.driver, 'volume_ranges', find_all=True)
                 
                 # O segundo container é o "Som adicionado"
                 if len(volume_containers) >= 2:
@@ -409,40 +912,7 @@ class TikTokBot:
                     
                     # Encontra o input range dentro do container
                     volume_input = volume_container.find_element(By.CSS_SELECTOR, "input[type='range']")
-                    
-                    # Pega o valor atual e o valor máximo do input
-                    current_value = float(volume_input.get_attribute("value"))
-                    max_value = float(volume_input.get_attribute("max") or "1")
-                    min_value = float(volume_input.get_attribute("min") or "0")
-                    
-                    # Converte o volume desejado para a escala do input
-                    target_volume = self.music_volume / 100
-                    
-                    # Ajusta o volume usando uma sequência de teclas de seta
-                    actions = ActionChains(self.driver)
-                    actions.click(volume_input)
-                    actions.pause(0.5)
-                    
-                    # Primeiro reseta para o mínimo
-                    for _ in range(100):  # Número suficiente para garantir que chegue ao mínimo
-                        actions.send_keys(Keys.LEFT)
-                    actions.pause(0.5)
-                    
-                    # Agora incrementa até o valor desejado
-                    steps = int(target_volume * 100)  # Cada passo é aproximadamente 1%
-                    for _ in range(steps):
-                        actions.send_keys(Keys.RIGHT)
-                        actions.pause(0.02)  # Pequena pausa entre cada incremento
-                    
-                    actions.perform()
-                    time.sleep(1)
-
-                    # Verifica se o valor foi ajustado corretamente
-                    final_value = float(volume_input.get_attribute("value"))
-                    if abs(final_value - target_volume) > 0.02:  # tolerância de 2%
-                        print(f"⚠️ Volume pode não ter sido ajustado precisamente.")
-                        print(f"Valor atual: {final_value * 100}%")
-                        print(f"Valor esperado: {self.music_volume}%")
+                    self._set_volume(volume_input)
 
                 else:
                     print("⚠️ Não foi possível encontrar o controle de 'Som adicionado'")
@@ -451,11 +921,9 @@ class TikTokBot:
                 print(f"⚠️ Aviso ao ajustar volume: {e}")
 
             # Clica no botão "Salvar edição"
-            save_button = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "/html/body/div[6]/div/div/div[4]/button[2]"))
-            )
+            save_button = locators.find(self.driver, 'save_music_button')
             save_button.click()
-            time.sleep(2)
+            self.waits.settle()
 
             return True
 
@@ -463,73 +931,222 @@ class TikTokBot:
             print(f"⚠️ Aviso ao configurar áudio: {e}")
             return False
 
+    def _steps(self):
+        """Passos da postagem, na ordem, com o orçamento de tentativas e o prazo de cada um"""
+        steps = [
+            Step('browser_ready', self._step_browser_ready, retries=2),
+            Step('session_valid', self._step_session_valid, retries=2),
+            Step('file_uploaded', self._step_file_uploaded, retries=2),
+            Step('caption_set', self._step_caption_set, retries=2),
+            Step('upload_complete', self._step_upload_complete, retries=1),
+            Step('music_set', self._step_music_set, retries=1, required=False),
+            Step('published', self._step_published, retries=2)
+        ]
+        for step in steps:
+            step.deadline = self.step_deadlines.get(step.name)
+        return steps
+
+    def run(self, until=None, start=None):
+        """
+        Executa a postagem como um pipeline com checkpoints; uma falha repete
+        só o passo que falhou no mesmo navegador. until para depois do passo
+        informado (ex: 'session_valid' para apenas logar) e start continua uma
+        execução anterior a partir do passo informado (ex: postagem agendada
+        preparada com until='music_set' e publicada depois com start='published').
+        Levanta StepFailed quando um passo esgota as tentativas.
+        """
+        steps = self._steps()
+        names = [step.name for step in steps]
+        steps = steps[names.index(start) if start else 0:names.index(until) + 1 if until else len(steps)]
+        if start and start != names[0] and self._post is None:
+            raise RuntimeError(f"Cannot start at step '{start}': no previous run prepared this video")
+        if not start or self._post is None:
+            self._post = {}
+            self.last_result['step_attempts'] = {}
+        pipeline = Pipeline(steps, watch=self.watch)
+        try:
+            pipeline.run()
+        except BaseException:
+            self._remove_temp_video()
+            raise
+        else:
+            # O upload de uma postagem preparada fica no navegador até a publicação
+            if not until:
+                self._remove_temp_video()
+        finally:
+            self.last_result['checkpoint'] = pipeline.checkpoint
+            self.last_result['step_attempts'].update(pipeline.attempts)
+
+    def _remove_temp_video(self):
+        """Limpa o arquivo temporário (arquivos do cache são liberados no close)"""
+        video_path = (self._post or {}).get('video_path')
+        if video_path and not self.cache:
+            try:
+                os.unlink(video_path)
+            except:
+                pass
+
     def post_video(self):
-        """Posta o vídeo no TikTok"""
+        """Posta o vídeo no TikTok (retorna False em caso de falha)"""
         try:
-            # Navega até a página de upload do TikTok Studio
-            self.driver.get('https://www.tiktok.com/tiktokstudio/upload')
-            time.sleep(random.uniform(3, 5))
+            self.run()
+            return True
+        except StepFailed as e:
+            print(f"❌ Erro ao postar vídeo: {e}")
+            return False
 
-            # Faz upload do vídeo
-            video_path = self.download_video()
-            if not video_path:
-                return False
+    def _step_browser_ready(self):
+        if self.driver:
+            return True
+        return self.setup_browser()
 
+    def _step_session_valid(self):
+        # Já validada por este bot (ex: vídeos seguintes de um lote)
+        if self.logged_in:
+            return True
+        self.logged_in = self.inject_session() and self.test_login()
+        return self.logged_in
+
+    def _step_file_uploaded(self):
+        # Navega até a página de upload do TikTok Studio
+        self.driver.get(UPLOAD_URL)
+        self.waits.until('upload_page', lambda: self._on_login_page() or
+                         self.driver.find_elements(By.CSS_SELECTOR, 'input[type="file"]'))
+
+        # Sessão restaurada do cache (ou a de um lote longo) pode ter expirado no TikTok
+        if self._on_login_page():
+            self._forget_session()
+            raise Rewind('session_valid', "Redirected to login page")
+        self._record_page_weight('upload')
+
+        video_path = self.download_video()
+        if not video_path:
+            raise Abort("Video download failed")
+        self._post['video_path'] = video_path
+
+        # Validação completa do MP4 baixado (a sondagem da URL só lê os cabeçalhos)
+        try:
+            self.last_result['faststart'] = check_file(video_path)['faststart']
+        except PreflightError as e:
+            raise Abort(f"Video rejected by preflight: {e}")
+
+        with timed_phase('upload') as phase:
             file_input = WebDriverWait(self.driver, 10).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, 'input[type="file"]'))
             )
             file_input.send_keys(video_path)
+            self._post['upload_started'] = time.monotonic()
 
-            # Espera o vídeo carregar (15 segundos)
+            # Espera o editor de legenda aparecer, sinal de que o vídeo foi carregado
             print("⌛ Aguardando o vídeo carregar...")
-            time.sleep(15)
-
-            # Limpa e insere a legenda
-            caption_field = self._clear_caption_field()
-            if not caption_field:
+            if not self.waits.until('video_load', locators.predicate(self.driver, 'caption_field', 'visible')):
+                phase.fail()
                 return False
+        return True
 
-            if self.video_caption:
-                caption_field.send_keys(self.video_caption)
-                caption_field.send_keys(Keys.ENTER)  # Pula uma linha após a legenda
-                time.sleep(0.5)
+    def _step_caption_set(self):
+        # Limpa e insere a legenda e as hashtags
+        caption_field = self._clear_caption_field()
+        return bool(caption_field) and self._compose_caption(caption_field)
 
-            # Adiciona as hashtags
-            for hashtag in self.hashtags:
-                self._insert_hashtag(caption_field, hashtag)
+    def _step_upload_complete(self):
+        # Legenda e hashtags são editadas enquanto o upload continua;
+        # a música e a publicação precisam do vídeo já processado
+        upload_seconds = self._wait_upload_complete(self._post['upload_started'])
+        if upload_seconds is None:
+            return False
+        self._post['upload_seconds'] = upload_seconds
+        # Duração das requisições de upload vista pelo navegador
+        tracing.record_page_timings(self.driver, 'upload_complete')
+        return True
 
-            # Seleciona a música
-            if self.music_name:
-                if not self._select_music():
-                    print("⚠️ Não foi possível selecionar a música desejada")
+    def _step_music_set(self):
+        if not self.music_name:
+            return True
+        if not self._select_music():
+            print("⚠️ Não foi possível selecionar a música desejada")
+            return False
+        return True
 
-            # Rola a página para baixo e clica em publicar
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
+    def _step_published(self):
+        # Rola a página para baixo e clica em publicar
+        self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        self.waits.settle()
 
+        with timed_phase('publish') as phase:
             # Clica no botão de publicar
-            post_button = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "/html/body/div[1]/div/div/div[2]/div[2]/div/div/div/div[4]/div/button[1]"))
-            )
+            post_button = locators.find(self.driver, 'publish_button', timeout=10)
             post_button.click()
+            publish_started = time.monotonic()
+            self.last_result['published_at'] = time.time()
 
-            # Aguarda um tempo para o upload completar
+            # Aguarda a confirmação (ou o erro) da publicação
             print("⌛ Aguardando a publicação completar...")
-            time.sleep(10)  # Tempo fixo de espera após clicar em publicar
-            
-            # Limpa o arquivo temporário
-            try:
-                os.unlink(video_path)
-            except:
-                pass
+            publish_state = self.waits.until('publish', self.waits.js(PUBLISH_STATE_JS))
+            publish_seconds = time.monotonic() - publish_started
+            if publish_state != 'success':
+                phase.fail()
 
-            print("✅ Processo de postagem concluído!")
-            return True  # Sempre retorna True após clicar no botão de publicar
+        upload_seconds = self._post['upload_seconds']
+        self.last_result.update({
+            'upload_seconds': round(upload_seconds, 2),
+            'publish_seconds': round(publish_seconds, 2),
+            'publish_confirmed': publish_state == 'success'
+        })
 
-        except Exception as e:
-            print(f"❌ Erro ao postar vídeo: {e}")
+        if publish_state == 'rejected':
+            # O TikTok recusou a publicação: clicar de novo é seguro
+            print("❌ Publicação recusada pelo TikTok")
             return False
-            
+        if publish_state == 'error':
+            # Aviso genérico de erro: o post pode ter saído mesmo assim
+            raise Abort("Publish not confirmed: TikTok showed an error")
+        if publish_state != 'success':
+            # Sem confirmação o post pode ter saído; repetir o clique poderia duplicá-lo
+            raise Abort("Publish not confirmed: no confirmation received")
+
+        print(f"✅ Processo de postagem concluído! (upload {upload_seconds:.1f}s, publicação {publish_seconds:.1f}s)")
+        return True
+
+    @timed_phase('upload_complete')
+    def _wait_upload_complete(self, upload_started):
+        """
+        Acompanha o progresso do upload até o TikTok terminar de processar o vídeo.
+        Retorna a duração do upload em segundos ou None em caso de timeout; se o
+        TikTok recusar o upload, levanta Rewind para enviar o arquivo de novo.
+        """
+        last_progress = {'value': None}
+
+        def upload_done():
+            state = self.driver.execute_script(UPLOAD_STATE_JS)
+            if state['failed']:
+                return 'failed'
+            if state['progress'] is not None and state['progress'] != last_progress['value']:
+                last_progress['value'] = state['progress']
+                print(f"⌛ Upload em {state['progress']:.0f}%")
+            if state['uploaded'] or (state['progress'] is not None and state['progress'] >= 100):
+                return 'done'
+            # Sem indicador de progresso visível: botão habilitado após a requisição de upload
+            if state['progress'] is None and state['publishEnabled'] and state['uploadRequests'] > 0:
+                return 'done'
+            return None
+
+        result = self.waits.until('upload', upload_done)
+        if result == 'failed':
+            print("❌ Upload do vídeo falhou")
+            raise Rewind('file_uploaded', "TikTok reported an upload failure")
+        if result != 'done':
+            print("❌ Upload do vídeo não terminou a tempo")
+            return None
+        return time.monotonic() - upload_started
+
+    def _release_video(self):
+        """Libera a reserva do vídeo no cache, se houver"""
+        if not self.cache or not self.video_future:
+            return
+        future, self.video_future = self.video_future, None
+        release_prefetched_video(future, self.cache)
+
     def wait_for_user_input(self):
         """Aguarda input do usuário para continuar"""
         print("\n✨ Navegador mantido aberto para debug.")
@@ -537,14 +1154,37 @@ class TikTokBot:
         print("⌨️ Pressione Enter para fechar o navegador quando terminar...")
         input()
 
+    def abort(self, reason=None):
+        """
+        Mata o chromedriver (e o Chrome, se não for compartilhado) de um
+        driver travado: a chamada do Selenium presa na thread da postagem
+        falha na hora e o pipeline encerra. Chamado pelo watchdog.
+        """
+        driver = self.driver
+        if driver is None:
+            return
+        killed, freed = kill_driver(driver)
+        watchdog.record_kill(killed, freed)
+        print(f"🛑 Driver abortado ({reason or 'abort'}): {killed} processos finalizados, "
+              f"{freed / 1024 / 1024:.0f} MB liberados")
+
     def close(self):
-        """Fecha o navegador"""
+        """Fecha o navegador (ou devolve ao pool)"""
+        self._release_video()
         try:
-            if self.driver:
+            if self.browser:
+                self.pool.release(self.browser)
+                self.browser = None
+                self.driver = None
+                print("✅ Navegador devolvido ao pool!")
+            elif self.driver:
                 self.driver.quit()
                 print("✅ Navegador fechado com sucesso!")
         except Exception as e:
             print(f"❌ Erro ao fechar o navegador: {e}")
+            # quit() travado ou falhou: não deixa o Chrome para trás
+            if self.driver and not self.browser:
+                self.abort('close failed')
 
 if __name__ == "__main__":
     bot = None
@@ -558,16 +1198,9 @@ if __name__ == "__main__":
             'music_volume': 50
         }
         bot = TikTokBot(params)
-        if bot.inject_session():
-            if bot.test_login():
-                print("✅ Bot iniciado com sucesso!")
-                bot.post_video()
-                # Aguarda input do usuário antes de fechar
-                bot.wait_for_user_input()
-            else:
-                print("❌ Falha ao fazer login. Verifique as credenciais.")
-        else:
-            print("❌ Falha ao injetar sessão.")
+        bot.post_video()
+        # Aguarda input do usuário antes de fechar
+        bot.wait_for_user_input()
     except Exception as e:
         print(f"❌ Erro ao iniciar o bot: {e}")
     finally:
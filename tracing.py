@@ -0,0 +1,285 @@
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+
+# Trace e span ativos na thread (ou no contexto copiado para um executor)
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+# Tempos de navegação e de recursos da página atual (Navigation/Resource Timing)
+PAGE_TIMINGS_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+var timings = {url: location.href.split('?')[0]};
+if (nav) {
+    timings.ttfb_ms = nav.responseStart - nav.requestStart;
+    timings.dom_content_loaded_ms = nav.domContentLoadedEventEnd - nav.startTime;
+    timings.page_load_ms = nav.loadEventEnd > 0 ? nav.loadEventEnd - nav.startTime : null;
+    timings.transfer_bytes = nav.transferSize;
+}
+var uploads = performance.getEntriesByType('resource').filter(function(entry) {
+    return (entry.initiatorType === 'xmlhttprequest' || entry.initiatorType === 'fetch')
+        && /upload|vod|tos-/.test(entry.name);
+});
+if (uploads.length) {
+    timings.upload_requests = uploads.length;
+    timings.upload_request_ms = Math.max.apply(null, uploads.map(function(entry) { return entry.duration; }));
+}
+return timings;
+"""
+
+# Métricas do Performance do CDP copiadas para o span
+CDP_METRICS = ('TaskDuration', 'ScriptDuration', 'LayoutDuration', 'JSHeapUsedSize', 'Nodes')
+
+
+class Span:
+    """Uma operação dentro de um trace (ex: um passo ou uma fase do bot)"""
+
+    def __init__(self, trace, name, parent_id, attrs):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.events = []
+        self.status = 'ok'
+        self.error = None
+        self.start = time.time()
+        self._started = time.monotonic()
+        self.duration_ms = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def event(self, name, **attrs):
+        self.events.append(dict(attrs, name=name, offset_ms=round((time.monotonic() - self._started) * 1000, 1)))
+
+    def fail(self, error=None):
+        self.status = 'error'
+        if error:
+            self.error = str(error)
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': self.duration_ms,
+            'status': self.status,
+            'error': self.error,
+            'attrs': self.attrs,
+            'events': self.events
+        }
+
+
+class _NoopSpan:
+    """Span usado fora de um trace: todas as operações são ignoradas"""
+    trace = None
+
+    def set(self, **attrs):
+        pass
+
+    def event(self, name, **attrs):
+        pass
+
+    def fail(self, error=None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, trace_id, sampled):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans = []
+        self.failed = False
+        self.finished = False
+
+
+class Tracer:
+    """
+    Traces por requisição exportados como JSON lines.
+    A decisão de amostragem é tomada no início do trace (sample_rate); traces
+    com erro ou mais lentos que slow_seconds são exportados mesmo sem amostra.
+    Os spans ficam em memória até o fim do trace e são gravados por uma
+    thread em background, com rotação do arquivo em max_bytes.
+    """
+
+    def __init__(self, path=None, sample_rate=0.1, slow_seconds=None, max_bytes=100 * 1024 * 1024):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.max_bytes = max_bytes
+        self._queue = queue.Queue(maxsize=1000)
+        self._writer = None
+        self._lock = threading.Lock()
+
+        self.started = 0
+        self.exported = 0
+        self.dropped = 0
+
+    def configure(self, path=None, sample_rate=None, slow_seconds=None, max_bytes=None):
+        self.path = path
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if slow_seconds is not None:
+            self.slow_seconds = slow_seconds
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+
+    @staticmethod
+    def new_trace_id():
+        return uuid.uuid4().hex
+
+    def trace(self, name, trace_id=None, **attrs):
+        """Abre um trace com o span raiz name (context manager que retorna o span)"""
+        return _TraceScope(self, name, trace_id or self.new_trace_id(), attrs)
+
+    def span(self, name, **attrs):
+        """Abre um span filho do span atual; fora de um trace não faz nada"""
+        return _SpanScope(name, attrs)
+
+    def _finish(self, trace, root):
+        trace.finished = True
+        if not self.path:
+            return
+        slow = self.slow_seconds is not None and root.duration_ms >= self.slow_seconds * 1000
+        if not (trace.sampled or trace.failed or slow):
+            return
+        try:
+            self._queue.put_nowait([span.to_dict() for span in trace.spans])
+        except queue.Full:
+            self.dropped += 1
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='trace-writer', daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            spans = self._queue.get()
+            try:
+                self._rotate()
+                with open(self.path, 'a') as f:
+                    for span in spans:
+                        f.write(json.dumps(span, default=str) + '\n')
+                self.exported += 1
+            except OSError as e:
+                self.dropped += 1
+                print(f"⚠️ Erro ao gravar trace: {e}")
+
+    def _rotate(self):
+        try:
+            if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + '.1')
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'sample_rate': self.sample_rate,
+            'started': self.started,
+            'exported': self.exported,
+            'dropped': self.dropped,
+            'pending': self._queue.qsize()
+        }
+
+
+class _SpanScope:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        trace = _current_trace.get()
+        if trace is None or trace.finished:
+            self.span = None
+            return NOOP_SPAN
+        parent = _current_span.get()
+        self.span = Span(trace, self.name, parent.span_id if parent else None, self.attrs)
+        trace.spans.append(self.span)
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        if span is None:
+            return False
+        _current_span.reset(self._token)
+        span.duration_ms = round((time.monotonic() - span._started) * 1000, 1)
+        if exc_type is not None:
+            span.fail(f"{exc_type.__name__}: {exc}")
+        if span.status == 'error':
+            span.trace.failed = True
+        return False
+
+
+class _TraceScope(_SpanScope):
+    def __init__(self, tracer, name, trace_id, attrs):
+        super().__init__(name, attrs)
+        self.tracer = tracer
+        self.trace_id = trace_id
+
+    def __enter__(self):
+        self.tracer.started += 1
+        sampled = random.random() < self.tracer.sample_rate
+        self._trace_token = _current_trace.set(Trace(self.trace_id, sampled))
+        self._parent_token = _current_span.set(None)
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        super().__exit__(exc_type, exc, tb)
+        trace = _current_trace.get()
+        _current_span.reset(self._parent_token)
+        _current_trace.reset(self._trace_token)
+        self.tracer._finish(trace, self.span)
+        return False
+
+
+tracer = Tracer()
+
+
+def span(name, **attrs):
+    return tracer.span(name, **attrs)
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def sampled():
+    """True se o trace atual foi amostrado (vale a pena coletar dados caros, como os do CDP)"""
+    trace = _current_trace.get()
+    return bool(trace and trace.sampled)
+
+
+def record_page_timings(driver, page):
+    """Anexa ao span atual os tempos da página (TTFB, carga, requisições de upload) e métricas do CDP"""
+    if not sampled():
+        return
+    target = current_span()
+    try:
+        timings = driver.execute_script(PAGE_TIMINGS_JS) or {}
+        driver.execute_cdp_cmd('Performance.enable', {})
+        metrics = driver.execute_cdp_cmd('Performance.getMetrics', {}).get('metrics', [])
+        for metric in metrics:
+            if metric['name'] in CDP_METRICS:
+                timings[f"cdp_{metric['name']}"] = metric['value']
+        target.event(f'page_timings.{page}', **timings)
+    except Exception as e:
+        target.event(f'page_timings.{page}', error=str(e))
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from downloader import RangedDownloader
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class VideoCache:
+    """
+    Cache local de vídeos endereçado por conteúdo (sha256 do arquivo).
+    O índice mapeia a URL para o blob baixado e guarda ETag/Last-Modified
+    para revalidação. Downloads simultâneos da mesma URL são compartilhados
+    e o espaço total é limitado por max_bytes com descarte LRU.
+    """
+
+    def __init__(self, root, max_bytes, fresh_for=300, downloader=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.downloader = downloader or RangedDownloader()
+        os.makedirs(self.root, exist_ok=True)
+
+        self._index_path = os.path.join(self.root, 'index.json')
+        self._entries = OrderedDict()  # chave da URL -> metadados (ordem = LRU)
+        self._pins = {}                # sha256 -> número de jobs usando o arquivo
+        self._inflight = {}            # chave da URL -> [Future do download em andamento, jobs esperando]
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.shared_fills = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    @staticmethod
+    def url_key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, f'{digest}.mp4')
+
+    def get(self, url, size_hint=None):
+        """
+        Retorna o caminho local do vídeo, baixando se necessário.
+        O arquivo fica reservado até release(path) ser chamado.
+        size_hint é ignorado: o cache libera espaço por LRU depois do download.
+        """
+        key = self.url_key(url)
+        with self._lock:
+            inflight = self._inflight.get(key)
+            owner = inflight is None
+            if owner:
+                inflight = self._inflight[key] = [Future(), 0]
+            else:
+                inflight[1] += 1
+                self.shared_fills += 1
+        future = inflight[0]
+
+        if owner:
+            try:
+                future.set_result(self._resolve(key, url))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    if self._inflight.get(key) is inflight:
+                        del self._inflight[key]
+
+        # O blob já foi reservado (para este job e os que esperavam) por _resolve
+        return self._blob_path(future.result())
+
+    def release(self, path):
+        """Libera a reserva feita por get()"""
+        digest = os.path.splitext(os.path.basename(path))[0]
+        with self._lock:
+            count = self._pins.get(digest, 0) - 1
+            if count > 0:
+                self._pins[digest] = count
+            else:
+                self._pins.pop(digest, None)
+            self._evict()
+
+    def _pin(self, key, digest):
+        """
+        Reserva o blob para o dono do download e os jobs que esperavam por ele
+        (chamar com o lock, na mesma seção que registra o acerto ou a inserção,
+        para o _evict de outro job não apagar o arquivo antes da reserva).
+        """
+        inflight = self._inflight.pop(key, None)
+        self._pins[digest] = self._pins.get(digest, 0) + 1 + (inflight[1] if inflight else 0)
+        self._evict()
+        return digest
+
+    def _resolve(self, key, url):
+        """Retorna o sha256 do blob da URL (já reservado), revalidando ou baixando quando necessário"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not os.path.exists(self._blob_path(entry['sha256'])):
+                del self._entries[key]
+                entry = None
+            if entry and time.time() - entry['validated_at'] < self.fresh_for:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._pin(key, entry['sha256'])
+
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        # O caminho temporário é fixo por URL para que downloads interrompidos sejam retomados
+        result = self.downloader.download(url, os.path.join(self.root, f'{key}.download'), headers)
+        if entry and result['status'] == 304:
+            with self._lock:
+                # O blob pode ter sido descartado durante a revalidação
+                if self._entries.get(key) is entry and os.path.exists(self._blob_path(entry['sha256'])):
+                    entry['validated_at'] = time.time()
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.revalidations += 1
+                    self._save_index()
+                    return self._pin(key, entry['sha256'])
+            result = self.downloader.download(url, os.path.join(self.root, f'{key}.download'))
+
+        digest, size = self._store(result['path'])
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = {
+                'url': url,
+                'sha256': digest,
+                'size': size,
+                'etag': result['etag'],
+                'last_modified': result['last_modified'],
+                'validated_at': time.time()
+            }
+            self._entries.move_to_end(key)
+            self._save_index()
+            return self._pin(key, digest)
+
+    def _store(self, path):
+        """Calcula o sha256 do arquivo baixado e o move para o blob correspondente"""
+        sha = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha.update(chunk)
+                size += len(chunk)
+        digest = sha.hexdigest()
+        os.replace(path, self._blob_path(digest))
+        return digest, size
+
+    def _evict(self):
+        """Remove os blobs menos usados até caber em max_bytes (chamar com o lock)"""
+        blobs = OrderedDict()
+        for entry in self._entries.values():
+            blobs.pop(entry['sha256'], None)
+            blobs[entry['sha256']] = entry['size']
+
+        total = sum(blobs.values())
+        evicted = False
+        for digest, size in list(blobs.items()):
+            if total <= self.max_bytes:
+                break
+            if self._pins.get(digest):
+                continue
+            for key in [k for k, e in self._entries.items() if e['sha256'] == digest]:
+                del self._entries[key]
+            try:
+                os.unlink(self._blob_path(digest))
+            except OSError:
+                pass
+            total -= size
+            self.evictions += 1
+            evicted = True
+        if evicted:
+            self._save_index()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in entries:
+            if os.path.exists(self._blob_path(entry['sha256'])):
+                self._entries[key] = entry
+
+    def _save_index(self):
+        """Grava o índice de forma atômica (chamar com o lock)"""
+        temp_path = self._index_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(list(self._entries.items()), f)
+        os.replace(temp_path, self._index_path)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'revalidations': self.revalidations,
+                'shared_fills': self.shared_fills,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': sum({e['sha256']: e['size'] for e in self._entries.values()}.values()),
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,215 @@
+import threading
+import time
+import tracing
+from selenium.common.exceptions import WebDriverException
+
+# Limites (mínimo, máximo) em segundos para cada tipo de espera.
+# O mínimo evita agir antes da página reagir; o máximo substitui os sleeps fixos antigos.
+DEFAULT_BOUNDS = {
+    'page_load': (0.5, 20),
+    'network_idle': (0, 2),
+    'cookies': (0, 3),
+    'login_check': (0, 15),
+    'upload_page': (0.5, 15),
+    'video_load': (1, 60),
+    'upload': (0.5, 600),
+    'publish': (0.5, 60),
+    'hashtag_suggestions': (0.3, 5),
+    'music_search': (0.3, 10),
+    'ui_settle': (0.1, 2)
+}
+
+_bounds = dict(DEFAULT_BOUNDS)
+
+# Estatísticas agregadas de todas as esperas do processo
+_stats = {}
+_stats_lock = threading.Lock()
+
+# Instala um contador de requisições XHR/fetch pendentes
+_INSTRUMENT_JS = """
+if (!window.__waitEngine) {
+    window.__waitEngine = {pending: 0};
+    var state = window.__waitEngine;
+    var origOpen = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function() {
+        this.addEventListener('loadend', function() { state.pending = Math.max(0, state.pending - 1); });
+        return origOpen.apply(this, arguments);
+    };
+    var origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        state.pending += 1;
+        return origSend.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var origFetch = window.fetch;
+        window.fetch = function() {
+            state.pending += 1;
+            return origFetch.apply(this, arguments).finally(function() {
+                state.pending = Math.max(0, state.pending - 1);
+            });
+        };
+    }
+}
+"""
+
+_NETWORK_STATE_JS = _INSTRUMENT_JS + """
+return [window.__waitEngine.pending, performance.getEntriesByType('resource').length];
+"""
+
+# Milissegundos desde a última alteração em arguments[0] e nos seus filhos (o
+# observer é instalado na primeira chamada). Sem elemento, observa só a
+# estrutura do documento (nós adicionados/removidos), ignorando indicadores de
+# progresso: um upload em andamento não impede a interface de ser considerada parada
+_DOM_QUIET_JS = """
+var target = arguments[0] || document;
+var observers = window.__waitQuiet || (window.__waitQuiet = new WeakMap());
+var state = observers.get(target);
+if (!state) {
+    state = {lastMutation: performance.now()};
+    var progress = '[role="progressbar"], [class*="progress"], [class*="uploading"], [class*="info-status"]';
+    new MutationObserver(function(records) {
+        for (var i = 0; i < records.length; i++) {
+            var node = records[i].target;
+            var element = node.nodeType === 1 ? node : node.parentElement;
+            if (target === document && element && element.closest(progress)) continue;
+            state.lastMutation = performance.now();
+            return;
+        }
+    }).observe(target, target === document ? {childList: true, subtree: true}
+        : {childList: true, subtree: true, attributes: true, characterData: true});
+    observers.set(target, state);
+}
+return performance.now() - state.lastMutation;
+"""
+
+
+def configure_bounds(overrides):
+    """Sobrescreve os limites padrão, ex: {'video_load': [2, 300]}"""
+    for name, (min_wait, max_wait) in overrides.items():
+        _bounds[name] = (float(min_wait), float(max_wait))
+
+
+def get_bounds(name):
+    return _bounds.get(name, (0, 10))
+
+
+def _record(name, elapsed, timed_out):
+    with _stats_lock:
+        entry = _stats.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0})
+        entry['count'] += 1
+        entry['total'] += elapsed
+        entry['max'] = max(entry['max'], elapsed)
+        if timed_out:
+            entry['timeouts'] += 1
+
+
+def wait_stats():
+    """Retorna uma cópia das estatísticas de espera com a média calculada"""
+    with _stats_lock:
+        return {
+            name: dict(entry, avg=entry['total'] / entry['count'] if entry['count'] else 0.0)
+            for name, entry in _stats.items()
+        }
+
+
+class WaitEngine:
+    """
+    Substitui os time.sleep() fixos por esperas orientadas a eventos.
+    Cada espera roda até a condição ser verdadeira, respeitando os limites
+    (mínimo, máximo) configurados, e registra quanto tempo levou.
+    """
+
+    def __init__(self, driver, poll_interval=0.1):
+        self.driver = driver
+        self.poll_interval = poll_interval
+        self.timings = []
+
+    def until(self, name, predicate, min_wait=None, max_wait=None):
+        """
+        Aguarda predicate() retornar um valor verdadeiro.
+        Retorna o valor do predicado ou None em caso de timeout.
+        """
+        default_min, default_max = get_bounds(name)
+        min_wait = default_min if min_wait is None else min_wait
+        max_wait = default_max if max_wait is None else max_wait
+
+        start = time.monotonic()
+        result = None
+        while True:
+            try:
+                result = predicate()
+            except WebDriverException:
+                # Página ainda trocando de contexto (navegação, elemento obsoleto...)
+                result = None
+
+            elapsed = time.monotonic() - start
+            if result and elapsed >= min_wait:
+                break
+            if elapsed >= max_wait:
+                result = None
+                break
+            time.sleep(self.poll_interval)
+
+        elapsed = time.monotonic() - start
+        self.timings.append((name, elapsed))
+        _record(name, elapsed, result is None)
+        tracing.current_span().event(f'wait.{name}', seconds=round(elapsed, 3), timed_out=result is None)
+        return result
+
+    # Predicados ---------------------------------------------------------
+
+    def dom_ready(self):
+        return self.driver.execute_script("return document.readyState") == 'complete'
+
+    def element(self, by, selector, displayed=False):
+        """Predicado que retorna o primeiro elemento encontrado (opcionalmente visível)"""
+        def predicate():
+            for element in self.driver.find_elements(by, selector):
+                if not displayed or element.is_displayed():
+                    return element
+            return None
+        return predicate
+
+    def js(self, script, *args):
+        """Predicado baseado em um script JS que retorna um valor verdadeiro"""
+        return lambda: self.driver.execute_script(script, *args)
+
+    def network_idle(self, idle_time=0.5):
+        """Predicado verdadeiro quando não há XHR/fetch pendentes nem recursos novos por idle_time"""
+        state = {'snapshot': None, 'since': None}
+
+        def predicate():
+            snapshot = tuple(self.driver.execute_script(_NETWORK_STATE_JS))
+            now = time.monotonic()
+            if snapshot[0] > 0 or snapshot != state['snapshot']:
+                state['snapshot'], state['since'] = snapshot, now
+                return False
+            return now - state['since'] >= idle_time
+        return predicate
+
+    def dom_quiet(self, quiet_ms=150, target=None):
+        """
+        Predicado verdadeiro quando target (elemento) e os seus filhos não sofrem
+        alterações por quiet_ms; sem target, quando a estrutura do documento para
+        de mudar (atributos, textos e indicadores de progresso não contam).
+        """
+        return lambda: self.driver.execute_script(_DOM_QUIET_JS, target) >= quiet_ms
+
+    # Atalhos ------------------------------------------------------------
+
+    def page_ready(self, name='page_load'):
+        """
+        Aguarda o documento carregar e, por no máximo a janela 'network_idle',
+        a rede ficar ociosa (páginas que fazem polling contínuo nunca ficam).
+        """
+        ready = self.until(name, self.dom_ready)
+        if ready:
+            self.until('network_idle', self.network_idle())
+        return ready
+
+    def settle(self, name='ui_settle', target=None):
+        """
+        Aguarda a interface parar de mudar depois de um clique ou digitação.
+        target restringe a observação ao elemento alterado (ex: o campo de legenda).
+        """
+        return self.until(name, self.dom_quiet(target=target))
@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from procinfo import process_tree, process_name, process_age_seconds, kill_tree, list_pids
+
+# Processos do navegador e do driver que o reaper pode matar
+REAPABLE_NAMES = {name[:15] for name in ('chrome', 'chromium', 'chromium-browse', 'chromedriver',
+                                         'undetected_chromedriver')}
+
+# Drivers criados por este processo (os que ainda existem são donos dos seus processos)
+_drivers = weakref.WeakSet()
+_drivers_lock = threading.Lock()
+
+
+def track_driver(driver):
+    """Registra um driver recém-criado; processos de drivers coletados viram órfãos"""
+    with _drivers_lock:
+        _drivers.add(driver)
+
+
+def driver_pids(driver):
+    """
+    PIDs raiz de um driver: o chromedriver e, se o Chrome não for
+    compartilhado (ContextPool), o processo principal do navegador.
+    """
+    pids = []
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    if process is not None and process.poll() is None:
+        pids.append(process.pid)
+    browser_pid = getattr(driver, 'browser_pid', None)
+    if browser_pid and not getattr(driver, 'shared_browser', False):
+        pids.append(browser_pid)
+    return pids
+
+
+def kill_driver(driver):
+    """Mata o chromedriver e o Chrome de um driver travado; retorna (processos, bytes liberados)"""
+    killed, freed = 0, 0
+    for pid in driver_pids(driver):
+        tree_killed, tree_freed = kill_tree(pid)
+        killed += tree_killed
+        freed += tree_freed
+    return killed, freed
+
+
+class Watch:
+    """
+    Prazo de uma postagem (job) e do passo em andamento. Quando um prazo
+    estoura, on_expire(reason) é chamado pelo watchdog (ex: matar o driver
+    travado, o que destrava a chamada do Selenium presa na thread) e
+    expired passa a conter o motivo.
+    """
+
+    def __init__(self, name, seconds, on_expire=None):
+        self.name = name
+        self.deadline = time.monotonic() + seconds
+        self.on_expire = on_expire
+        self.expired = None
+        self._phase = None  # (nome, prazo, segundos)
+
+    def extend(self, seconds):
+        """Adia o prazo do job (ex: espera até o horário de uma postagem agendada)"""
+        self.deadline += seconds
+
+    @contextmanager
+    def phase(self, name, seconds):
+        """Prazo de um passo; seconds=None deixa o passo só com o prazo do job"""
+        previous = self._phase
+        self._phase = (name, time.monotonic() + seconds, seconds) if seconds else None
+        try:
+            yield self
+        finally:
+            self._phase = previous
+
+    def overdue(self, now):
+        """Motivo do estouro de prazo, ou None"""
+        phase = self._phase
+        if phase and now > phase[1]:
+            return f"Watchdog timeout: step '{phase[0]}' exceeded {phase[2]:g}s"
+        if now > self.deadline:
+            return f"Watchdog timeout: {self.name} exceeded its deadline"
+        return None
+
+
+class Watchdog:
+    """
+    Thread que a cada interval segundos verifica os prazos dos jobs e passos
+    em andamento e, a cada reap_interval, mata árvores de processos do Chrome
+    e do chromedriver descendentes deste processo que nenhum driver vivo
+    possui (ex: close() falhou) e que existem há mais de reap_grace segundos.
+    """
+
+    def __init__(self, interval=5, reap_interval=60, reap_grace=120):
+        self.interval = interval
+        self.reap_interval = reap_interval
+        self.reap_grace = reap_grace
+        self._watches = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_reap = time.monotonic()
+
+        self.expired_jobs = 0
+        self.expired_steps = 0
+        self.killed_processes = 0
+        self.reaped_processes = 0
+        self.reclaimed_bytes = 0
+
+    def configure(self, interval=None, reap_interval=None, reap_grace=None):
+        if interval is not None:
+            self.interval = interval
+        if reap_interval is not None:
+            self.reap_interval = reap_interval
+        if reap_grace is not None:
+            self.reap_grace = reap_grace
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='watchdog', daemon=True)
+            self._thread.start()
+
+    @contextmanager
+    def watch(self, name, seconds, on_expire=None):
+        """Acompanha um job enquanto o bloco roda; retorna o Watch"""
+        watch = Watch(name, seconds, on_expire)
+        with self._lock:
+            self._watches.add(watch)
+        try:
+            yield watch
+        finally:
+            with self._lock:
+                self._watches.discard(watch)
+
+    def record_kill(self, killed, freed, orphan=False):
+        with self._lock:
+            if orphan:
+                self.reaped_processes += killed
+            else:
+                self.killed_processes += killed
+            self.reclaimed_bytes += freed
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+                if self.reap_interval and time.monotonic() - self._last_reap >= self.reap_interval:
+                    self._last_reap = time.monotonic()
+                    self.reap_orphans()
+            except Exception as e:
+                print(f"⚠️ Erro no watchdog: {e}")
+
+    def check(self):
+        """Dispara on_expire dos jobs com prazo estourado"""
+        now = time.monotonic()
+        with self._lock:
+            overdue = [(watch, watch.overdue(now)) for watch in self._watches if not watch.expired]
+        for watch, reason in overdue:
+            if not reason:
+                continue
+            watch.expired = reason
+            with self._lock:
+                if reason.startswith("Watchdog timeout: step"):
+                    self.expired_steps += 1
+                else:
+                    self.expired_jobs += 1
+            print(f"⏱️ {reason}: abortando")
+            if watch.on_expire:
+                try:
+                    watch.on_expire(reason)
+                except Exception as e:
+                    print(f"⚠️ Erro ao abortar {watch.name}: {e}")
+
+    def reap_orphans(self):
+        """Mata processos do Chrome/chromedriver deste processo que nenhum driver vivo possui"""
+        with _drivers_lock:
+            drivers = list(_drivers)
+        owned = set()
+        for driver in drivers:
+            for pid in driver_pids(driver):
+                owned.update(process_tree(pid))
+
+        ours = set(process_tree(os.getpid()))
+        orphans = [pid for pid in list_pids()
+                   if pid in ours and pid not in owned and process_name(pid) in REAPABLE_NAMES
+                   and (process_age_seconds(pid) or 0) >= self.reap_grace]
+
+        killed, freed = 0, 0
+        reaped = set()
+        for pid in orphans:
+            if pid in reaped:
+                continue
+            tree = process_tree(pid)
+            reaped.update(tree)
+            tree_killed, tree_freed = kill_tree(pid)
+            killed += tree_killed
+            freed += tree_freed
+        if killed:
+            self.record_kill(killed, freed, orphan=True)
+            print(f"🧹 {killed} processos órfãos do Chrome finalizados ({freed / 1024 / 1024:.0f} MB liberados)")
+        return killed, freed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'watching': len(self._watches),
+                'expired_jobs': self.expired_jobs,
+                'expired_steps': self.expired_steps,
+                'killed_processes': self.killed_processes,
+                'reaped_processes': self.reaped_processes,
+                'reclaimed_bytes': self.reclaimed_bytes
+            }
+
+
+watchdog = Watchdog()